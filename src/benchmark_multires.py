@@ -0,0 +1,87 @@
+"""
+This script compares the coarse to fine CA (create_map_with_ca(..., downsample = 2 or 4)) against
+running every iteration at full size: how much faster it is, and how close the caves it makes are,
+by their floor fraction, number of rooms, room sizes, and how rough the walls are.
+"""
+
+
+import argparse # for program args
+import time # for timing the CA
+import numpy as np # for averaging the stats
+from helpers import map_helpers as maps # helpers for map gen
+from helpers import labeling # for counting rooms
+
+
+# function to measure the stats of a smoothed map
+def get_cave_stats(grid):
+    """
+    This function measures the stats that describe what a cave map looks like.
+
+    Args:
+        grid: np matrix, map after CA smoothing
+
+    Returns:
+        dict with the floor fraction, number of rooms (and rooms bigger than 35 cells), mean room area,
+        share of the floor in the largest room, and edge density (fraction of neighboring cell pairs that differ,
+        so rougher walls give higher values)
+    """
+    room_labels, areas, bboxes, centroids = labeling.label_rooms(grid == 0)
+    edges = (grid[1:, :] != grid[:-1, :]).sum() + (grid[:, 1:] != grid[:, :-1]).sum()
+    num_pairs = grid[1:, :].size + grid[:, 1:].size
+
+    return {
+        "floor_fraction": float((grid == 0).mean()),
+        "rooms": int(areas.size),
+        "rooms_over_35": int((areas > 35).sum()),
+        "mean_room_area": float(areas.mean()) if areas.size > 0 else 0.0,
+        "largest_share": float(areas.max() / areas.sum()) if areas.size > 0 else 0.0,
+        "edge_density": float(edges / num_pairs),
+    }
+
+
+def main():
+    # add arguments for program to parse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--height", type = int, default = 2000, help = "height of the maps")
+    parser.add_argument("--width", type = int, default = 2000, help = "width of the maps")
+    parser.add_argument("--density", type = int, default = 63, help = "noise density (0 - 100)")
+    parser.add_argument("--iterations", type = int, default = 15, help = "number of smoothing iterations")
+    parser.add_argument("--refine_iterations", type = int, default = 2, help = "number of full size iterations in the coarse to fine CA")
+    parser.add_argument("--num_seeds", type = int, default = 5, help = "number of maps to average over")
+    parser.add_argument("--engine", type = str, default = "numpy", help = "CA engine, see create_map_with_ca()")
+    args = parser.parse_args()
+
+    results = {}
+    for downsample in (1, 2, 4):
+        times = []
+        stats = []
+        agreement = []
+
+        for seed in range(args.num_seeds):
+            grid = maps.create_noise_grid(args.height, args.width, args.density, seed)
+
+            # the full size result to compare against
+            start_time = time.perf_counter()
+            new_map = maps.create_map_with_ca(grid, args.iterations, engine = args.engine, downsample = downsample, refine_iterations = args.refine_iterations)
+            times.append(time.perf_counter() - start_time)
+            stats.append(get_cave_stats(new_map))
+
+            if downsample == 1:
+                results[("map", seed)] = new_map
+            agreement.append(float((new_map == results[("map", seed)]).mean()))
+
+        results[downsample] = [np.median(times), {name: np.mean([s[name] for s in stats]) for name in stats[0]}, np.mean(agreement)]
+
+    # print a table, with the speedup and each stat relative to the full size CA
+    base_time, base_stats, _ = results[1]
+    print(f"{args.height} x {args.width}, density {args.density}, {args.iterations} iterations, {args.num_seeds} seeds, engine '{args.engine}'")
+    print(f"{'':>16}" + "".join(f"{'downsample ' + str(d):>16}" for d in (1, 2, 4)))
+    print(f"{'time (s)':>16}" + "".join(f"{results[d][0]:>16.3f}" for d in (1, 2, 4)))
+    print(f"{'speedup':>16}" + "".join(f"{base_time / results[d][0]:>15.2f}x" for d in (1, 2, 4)))
+    print(f"{'same cells':>16}" + "".join(f"{results[d][2]:>16.3f}" for d in (1, 2, 4)))
+    for name in base_stats:
+        print(f"{name:>16}" + "".join(f"{results[d][1][name]:>16.3f}" for d in (1, 2, 4)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+This script fills in the param table (see helpers/param_cache.py) offline, by making a batch of maps
+for every density and iteration count in a range and recording how each one turned out.
+"""
+
+
+import argparse # for program args
+import time # for timing each map
+from helpers import map_helpers as maps # helpers for map gen
+from helpers import param_cache # the param table
+
+
+def main():
+    # add arguments for program to parse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--height", type = int, help = "height of the maps")
+    parser.add_argument("--width", type = int, help = "width of the maps")
+    parser.add_argument("--min_density", type = int, help = "lowest noise density (0 - 100) to try")
+    parser.add_argument("--max_density", type = int, help = "highest noise density (0 - 100) to try")
+    parser.add_argument("--min_iterations", type = int, help = "fewest smoothing iterations to try")
+    parser.add_argument("--max_iterations", type = int, help = "most smoothing iterations to try")
+    parser.add_argument("--num_seeds", type = int, default = 20, help = "number of maps to make for each set of params")
+    parser.add_argument("--first_seed", type = int, default = 0, help = "seed of the first map, the rest count up from it")
+    parser.add_argument("--prob_item", type = float, default = 0.3, help = "probability of spawning an item")
+    parser.add_argument("--prob_enemy", type = float, default = 0.01, help = "probability of spawning an enemy")
+    parser.add_argument("--connect_mode", type = str, default = "mst", help = "'nearest' or 'mst', should match how maps are made in the game")
+    parser.add_argument("--output", type = str, default = "param_table.json", help = "JSON file to add the results to")
+    args = parser.parse_args()
+
+    # add to the existing table, if there is one
+    param_table = param_cache.load_param_table(args.output)
+
+    for density in range(args.min_density, args.max_density + 1):
+        for iterations in range(args.min_iterations, args.max_iterations + 1):
+            for seed in range(args.first_seed, args.first_seed + args.num_seeds):
+
+                # one attempt per map, with no retries, so failures are counted against these params
+                start_time = time.perf_counter()
+                complete_map = maps.try_complete_map(args.height, args.width, density, seed, iterations, args.prob_item, args.prob_enemy, args.connect_mode)
+                gen_time = time.perf_counter() - start_time
+
+                param_cache.record_generation(
+                    param_table, args.height, args.width, density, iterations, complete_map is not None,
+                    len(complete_map[7]) if complete_map is not None else None, gen_time
+                )
+
+            stats = param_cache.get_param_stats(param_table, args.height, args.width, density, iterations)
+            print(f"density {density}, iterations {iterations}: success rate {stats['success_rate']:.2f}, average time {stats['avg_time']:.4f}s")
+
+    param_cache.save_param_table(param_table, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+This file contains a bit-packed (bitboard) version of the wall layer and the
+Cellular Automata (CA) step, for maps that are too big to store as one
+number per cell.
+
+Each row of the map is stored as 64-bit words, with one bit per cell:
+    bit (col % 64) of word (col // 64) is 1 if the cell is a wall, else 0.
+Any padding bits past the last column are kept as 1s (walls), which is the same
+as the out of bounds rule in map_helpers.create_map_with_ca().
+"""
+
+
+import numpy as np # for packing bits and whole-array bit operations.
+
+
+WORD_BITS = 64
+ALL_WALLS = np.uint64(0xFFFFFFFFFFFFFFFF)
+ONE = np.uint64(1)
+TOP_BIT = np.uint64(63)
+
+# how many rows to update at a time, so temporary arrays stay small on huge maps
+ROW_BLOCK = 4096
+
+
+# ------------------------------------------------------- PACKING AND UNPACKING ------------------------------------------------------- #
+
+
+# function to get the number of 64-bit words needed to store a row
+def words_per_row(num_cols):
+    """
+    This function finds how many 64-bit words are needed to store one row of the map.
+
+    Args:
+        num_cols: int, number of columns in the map
+
+    Returns:
+        int, number of words per packed row
+    """
+    return (num_cols + WORD_BITS - 1) // WORD_BITS
+
+
+# function to pack a dense 0/1 grid into bitboard rows
+def pack_grid(grid):
+    """
+    This function packs a dense map (like the one returned by create_noise_grid() or
+    create_map_with_ca()) into bitboard rows. Cells equal to 1 are walls, anything else is floor.
+
+    Args:
+        grid: np matrix, with 0s / 1s to represent floors / walls.
+
+    Returns:
+        np matrix of uint64 with shape (num_rows, words_per_row(num_cols))
+    """
+    num_rows = grid.shape[0]
+    num_cols = grid.shape[1]
+    num_words = words_per_row(num_cols)
+
+    # pad columns out to a whole number of words with walls, then pack 8 cells per byte
+    walls = np.ones(shape = (num_rows, num_words * WORD_BITS), dtype = bool)
+    walls[:, :num_cols] = grid == 1
+    packed_bytes = np.packbits(walls, axis = 1, bitorder = "little")
+
+    # view every 8 bytes as one little-endian word, then convert to native uint64
+    return packed_bytes.view("<u8").astype(np.uint64)
+
+
+# function to unpack bitboard rows back into a dense grid
+def unpack_grid(packed, num_cols, dtype=np.int64):
+    """
+    This function converts bitboard rows back into a dense map of 0s and 1s.
+
+    Args:
+        packed: np matrix of uint64, from pack_grid() or bitboard_ca_step()
+        num_cols: int, number of columns in the original map (drops the padding bits)
+        dtype: numpy dtype, defaults to int64 to match create_noise_grid()
+
+    Returns:
+        np matrix with shape (num_rows, num_cols) of 0s / 1s
+    """
+    packed_bytes = packed.astype("<u8").view(np.uint8)
+    walls = np.unpackbits(packed_bytes, axis = 1, bitorder = "little")[:, :num_cols]
+    return walls.astype(dtype)
+
+
+# function to get a mask of the padding bits in the last word of each row
+def padding_mask(num_cols):
+    """
+    This function creates a word with 1s in the padding bits of a row's last word,
+    so that they can be kept as walls after each CA step.
+
+    Args:
+        num_cols: int, number of columns in the map
+
+    Returns:
+        np.uint64, the mask of padding bits (0 if num_cols is a multiple of 64)
+    """
+    used_bits = num_cols % WORD_BITS
+    if used_bits == 0:
+        return np.uint64(0)
+    return ALL_WALLS << np.uint64(used_bits)
+
+
+# function to create a packed noise grid without ever building the dense grid
+def create_packed_noise_grid(num_rows, num_cols, desired_density, rng_seed, rows_per_chunk=1024, rng=None):
+    """
+    This function makes the same random noise grid as map_helpers.create_noise_grid(),
+    but generates it a chunk of rows at a time and packs each chunk right away, so the
+    full dense grid never has to fit in memory.
+
+    Args:
+        num_rows: int, how many rows to include in matrix
+        num_cols: int, how many columns to include in matrix
+        desired_density: int, a number between 0 - 100, how densely filled with walls the map should be.
+        rng_seed: int, controls random number generation.
+        rows_per_chunk: int, how many dense rows to generate at a time.
+        rng: np.random.Generator, defaults to None to seed numpy's global random state with rng_seed.
+            Pass the same generator as create_noise_grid(..., rng = rng) gets to make the same grid.
+
+    Returns:
+        np matrix of uint64 bitboard rows.
+
+    Note:
+        choice() with probabilities draws one uniform number per cell in order (for np.random and a Generator),
+        so drawing the rows in chunks gives exactly the same cells as one big draw.
+    """
+    desired_density = min(max(desired_density, 0), 100)
+    prob_one = desired_density / 100
+
+    # a generator that was passed in has its own state, so there's nothing global to seed
+    if rng is None:
+        np.random.seed(rng_seed)
+        rng = np.random
+
+    packed = np.empty(shape = (num_rows, words_per_row(num_cols)), dtype = np.uint64)
+    for start in range(0, num_rows, rows_per_chunk):
+        stop = min(start + rows_per_chunk, num_rows)
+        chunk = rng.choice([0, 1], size = (stop - start, num_cols), p = [1 - prob_one, prob_one])
+        packed[start:stop] = pack_grid(chunk)
+
+    return packed
+
+
+# ------------------------------------------------------------ CA STEP ON BITBOARDS ------------------------------------------------------------ #
+
+
+# helper to line up each cell with its west neighbor (col - 1)
+def shift_from_west(rows):
+    """
+    This function shifts bitboard rows so that each bit holds the value of the cell
+    one column to its left. The cell left of column 0 is out of bounds, so it is a wall.
+
+    Args:
+        rows: np matrix of uint64 bitboard rows
+
+    Returns:
+        np matrix of uint64 with the shifted rows
+    """
+    shifted = rows << ONE
+    shifted[:, 1:] |= rows[:, :-1] >> TOP_BIT
+    shifted[:, 0] |= ONE
+    return shifted
+
+
+# helper to line up each cell with its east neighbor (col + 1)
+def shift_from_east(rows):
+    """
+    This function shifts bitboard rows so that each bit holds the value of the cell
+    one column to its right. Past the last word is out of bounds, so it is a wall.
+
+    Args:
+        rows: np matrix of uint64 bitboard rows
+
+    Returns:
+        np matrix of uint64 with the shifted rows
+    """
+    shifted = rows >> ONE
+    shifted[:, :-1] |= rows[:, 1:] << TOP_BIT
+    shifted[:, -1] |= ONE << TOP_BIT
+    return shifted
+
+
+# helper for bit-sliced addition
+def full_adder(a, b, c):
+    """
+    This function adds three bitboards bit by bit, 64 cells per word at a time.
+
+    Args:
+        a, b, c: np matrices of uint64
+
+    Returns:
+        List, [sum bits, carry bits]
+    """
+    a_xor_b = a ^ b
+    return [a_xor_b ^ c, (a & b) | (c & a_xor_b)]
+
+
+# function to count neighbors as 4 bit-planes of a binary number
+def count_neighbor_bits(above, middle, below):
+    """
+    This function counts the walls in every cell's Moore neighborhood. Instead of storing
+    a count per cell, the count (0 - 8) is stored as 4 bitboards holding its binary digits.
+
+    Args:
+        above: np matrix of uint64, the row above each row being updated (walls past the top edge)
+        middle: np matrix of uint64, the rows being updated
+        below: np matrix of uint64, the row below each row being updated (walls past the bottom edge)
+
+    Returns:
+        List, [bit 0 (1s), bit 1 (2s), bit 2 (4s), bit 3 (8s)] bitboards of the neighbor counts
+    """
+    neighbors = [
+        shift_from_west(above), above, shift_from_east(above),
+        shift_from_west(middle), shift_from_east(middle),
+        shift_from_west(below), below, shift_from_east(below),
+    ]
+
+    # add the 8 one-bit inputs in groups of three, then add up the carries
+    sum_a, carry_a = full_adder(neighbors[0], neighbors[1], neighbors[2])
+    sum_b, carry_b = full_adder(neighbors[3], neighbors[4], neighbors[5])
+    sum_c = neighbors[6] ^ neighbors[7]
+    carry_c = neighbors[6] & neighbors[7]
+
+    bit_0, carry_1 = full_adder(sum_a, sum_b, sum_c)
+    twos_sum, fours_a = full_adder(carry_a, carry_b, carry_c)
+    bit_1 = twos_sum ^ carry_1
+    fours_b = twos_sum & carry_1
+    bit_2 = fours_a ^ fours_b
+    bit_3 = fours_a & fours_b
+
+    return [bit_0, bit_1, bit_2, bit_3]
+
+
+# helper to find the cells whose neighbor count equals a given number
+def count_equals(count_bits, count):
+    """
+    This function finds the cells whose neighbor count equals count, by checking each 
+    binary digit of the count against the matching bit-plane.
+
+    Args:
+        count_bits: List of 4 bitboards from count_neighbor_bits()
+        count: int, the neighbor count to match (0 - 8)
+
+    Returns:
+        np matrix of uint64 with 1 bits where the count matches
+    """
+    matches = np.full(shape = count_bits[0].shape, fill_value = ALL_WALLS, dtype = np.uint64)
+    for digit in range(4):
+        if (count >> digit) & 1:
+            matches &= count_bits[digit]
+        else:
+            matches &= ~count_bits[digit]
+    return matches
+
+
+# function to apply a birth / survive rule to the neighbor count bit-planes
+def apply_birth_survive(alive, count_bits, birth, survive):
+    """
+    This function applies a 2 state birth / survive rule (see ca_rules.py) with bit masks.
+
+    Args:
+        alive: np matrix of uint64, the current walls
+        count_bits: List of 4 bitboards from count_neighbor_bits()
+        birth: list of neighbor counts where a floor becomes a wall
+        survive: list of neighbor counts where a wall stays a wall
+
+    Returns:
+        np matrix of uint64 with the next walls
+    """
+    born = np.zeros(shape = alive.shape, dtype = np.uint64)
+    survived = np.zeros(shape = alive.shape, dtype = np.uint64)
+
+    # only build the equality mask for each count once, even if it's in both lists
+    for count in set(birth) | set(survive):
+        matches = count_equals(count_bits, count)
+        if count in birth:
+            born |= matches
+        if count in survive:
+            survived |= matches
+
+    return (~alive & born) | (alive & survived)
+
+
+# function to apply one CA step to bitboard rows
+def bitboard_ca_step(packed, num_cols, birth=None, survive=None):
+    """
+    This function applies one step of the CA rule directly to the bitboard rows, 64 cells 
+    per word at a time. By default this is the original map rule (a cell becomes a wall if 
+    more than 4 neighbors are walls), but any 2 state birth / survive rule can be passed in.
+
+    Args:
+        packed: np matrix of uint64 bitboard rows
+        num_cols: int, number of columns in the map (to keep the padding bits as walls)
+        birth: list of ints, defaults to None for the original rule, neighbor counts where a floor becomes a wall
+        survive: list of ints, defaults to None for the original rule, neighbor counts where a wall stays a wall
+
+    Returns:
+        np matrix of uint64 bitboard rows after one step
+    """
+    # the original rule (B5678/S5678) has a faster shortcut below
+    if birth is not None and sorted(birth) == [5, 6, 7, 8] and sorted(survive) == [5, 6, 7, 8]:
+        birth = None
+
+    num_rows = packed.shape[0]
+    pad_bits = padding_mask(num_cols)
+    new_packed = np.empty_like(packed)
+    wall_row = np.full(shape = (1, packed.shape[1]), fill_value = ALL_WALLS, dtype = np.uint64)
+
+    # update a block of rows at a time, using the rows just outside the block as the halo
+    for start in range(0, num_rows, ROW_BLOCK):
+        stop = min(start + ROW_BLOCK, num_rows)
+        middle = packed[start:stop]
+
+        above_halo = packed[start - 1:start] if start > 0 else wall_row
+        below_halo = packed[stop:stop + 1] if stop < num_rows else wall_row
+        above = np.concatenate([above_halo, packed[start:stop - 1]])
+        below = np.concatenate([packed[start + 1:stop], below_halo])
+
+        count_bits = count_neighbor_bits(above, middle, below)
+        if birth is None:
+            # more than 4 walls means the count is 8 or more, or at least 4 plus 1 or 2
+            bit_0, bit_1, bit_2, bit_3 = count_bits
+            new_block = bit_3 | (bit_2 & (bit_1 | bit_0))
+        else:
+            new_block = apply_birth_survive(middle, count_bits, birth, survive)
+        new_block[:, -1] |= pad_bits
+        new_packed[start:stop] = new_block
+
+    return new_packed
@@ -0,0 +1,176 @@
+"""
+This file contains functions to declare Cellular Automata (CA) rules in
+birth / survival (B/S) notation, and compile them into lookup tables.
+
+For our maps, 1s are walls and count as "alive" cells, and 0s are floors.
+For example, the original map rule "a cell becomes a wall if more than 4
+neighbors are walls" is written as B5678/S5678:
+    B5678: a floor becomes a wall with 5, 6, 7, or 8 neighboring walls
+    S5678: a wall stays a wall with 5, 6, 7, or 8 neighboring walls
+
+Multi-state rules add a C (number of states) part, e.g. B5678/S45678/C4.
+A wall that doesn't survive does not become floor right away, it decays
+through states 2, 3, ... C - 1 and then becomes floor (0). Only state 1
+counts as a wall when counting neighbors.
+"""
+
+
+import numpy as np # for building and indexing the lookup tables.
+
+
+# the rule used by the original map generation code
+DEFAULT_RULE = "B5678/S5678"
+
+# compiled lookup tables, so each rule string is only compiled once
+COMPILED_RULES = {}
+
+
+# function to parse a rule string into its parts
+def parse_rule(rule_string):
+    """
+    This function reads a rule in B/S notation, with an optional C part for multi-state rules.
+
+    Args:
+        rule_string: string, e.g. "B5678/S5678" or "B5678/S45678/C3" (case does not matter)
+
+    Returns:
+        dict, with keys:
+            "birth": set of neighbor counts (0 - 8) where a floor becomes a wall
+            "survive": set of neighbor counts (0 - 8) where a wall stays a wall
+            "states": int, number of cell states (2 for a regular wall / floor rule)
+
+    Examples:
+        parse_rule("B5678/S45678") # {"birth": {5, 6, 7, 8}, "survive": {4, 5, 6, 7, 8}, "states": 2}
+    """
+    rule = {"birth": set(), "survive": set(), "states": 2}
+    seen = set()
+
+    for part in rule_string.strip().upper().split("/"):
+        if part == "" or part[0] not in "BSC" or part[0] in seen:
+            raise Exception(f"Unable to parse CA rule '{rule_string}': expected parts like B5678/S5678 or B5678/S5678/C3.")
+        seen.add(part[0])
+        digits = part[1:]
+
+        if not digits.isdigit() and digits != "":
+            raise Exception(f"Unable to parse CA rule '{rule_string}': '{part}' should only contain digits after {part[0]}.")
+
+        if part[0] == "C":
+            rule["states"] = int(digits) if digits != "" else 2
+            if rule["states"] < 2:
+                raise Exception(f"Unable to parse CA rule '{rule_string}': a rule needs at least 2 states.")
+        else:
+            counts = set(int(d) for d in digits)
+            if any(c > 8 for c in counts):
+                raise Exception(f"Unable to parse CA rule '{rule_string}': neighbor counts must be between 0 - 8.")
+            rule["birth" if part[0] == "B" else "survive"] = counts
+
+    if "B" not in seen or "S" not in seen:
+        raise Exception(f"Unable to parse CA rule '{rule_string}': both a B and an S part are required.")
+
+    return rule
+
+
+# function to compile a rule into a lookup table
+def compile_rule(rule):
+    """
+    This function turns a rule into a lookup table indexed by [current state, neighbor count],
+    so that a CA step is a single table lookup for the whole grid instead of if/else per cell.
+    Rule strings are compiled once and then reused from COMPILED_RULES. Those shared tables are
+    read-only, so a caller can't change the rule for every later CA run by writing to one.
+
+    Args:
+        rule: string in B/S notation, a dict from parse_rule(), or an already compiled table (returned as is).
+
+    Returns:
+        np matrix of uint8 with shape (states, 9), holding the next state for each [state, count].
+    """
+    if isinstance(rule, np.ndarray):
+        return rule
+
+    if isinstance(rule, str):
+        key = rule.strip().upper()
+        if key not in COMPILED_RULES:
+            lut = compile_rule(parse_rule(key))
+            lut.flags.writeable = False
+            COMPILED_RULES[key] = lut
+        return COMPILED_RULES[key]
+
+    num_states = rule["states"]
+    lut = np.zeros(shape = (num_states, 9), dtype = np.uint8)
+
+    # state 1 (wall) becomes state 2 when it doesn't survive, or floor for a 2 state rule
+    decayed_state = 2 if num_states > 2 else 0
+
+    for count in range(9):
+        lut[0, count] = 1 if count in rule["birth"] else 0
+        lut[1, count] = 1 if count in rule["survive"] else decayed_state
+
+    # decaying states move to the next state, and the last one becomes floor
+    for state in range(2, num_states):
+        lut[state, :] = state + 1 if state + 1 < num_states else 0
+
+    return lut
+
+
+# function to check if a compiled rule is a plain wall / floor rule
+def is_two_state(lut):
+    """
+    This function checks whether a compiled rule only has wall / floor states.
+
+    Args:
+        lut: np matrix from compile_rule()
+
+    Returns:
+        bool, True if the rule has 2 states, else False.
+    """
+    return lut.shape[0] == 2
+
+
+# function to get the state index of each cell for a table lookup
+def get_cell_states(grid, lut):
+    """
+    This function converts the values in a map into row indices for the lookup table.
+    For 2 state rules only 1s are walls (like the neighbor counting), everything else is floor.
+    For multi-state rules the values are used as states directly.
+
+    Args:
+        grid: np matrix of the map
+        lut: np matrix from compile_rule()
+
+    Returns:
+        np matrix of state indices with the same shape as grid
+    """
+    if is_two_state(lut):
+        return (grid == 1).astype(np.uint8)
+    return np.clip(grid, 0, lut.shape[0] - 1).astype(np.intp)
+
+
+# function to apply a compiled rule to a whole grid at once
+def apply_rule(grid, neighbor_counts, lut):
+    """
+    This function applies one CA step using a compiled lookup table.
+
+    Args:
+        grid: np matrix of the current map
+        neighbor_counts: np matrix with the number of neighboring walls (state 1) of each cell
+        lut: np matrix from compile_rule()
+
+    Returns:
+        np matrix of uint8 with the next state of each cell
+    """
+    return lut[get_cell_states(grid, lut), neighbor_counts]
+
+
+# function to get the birth and survive counts back out of a 2 state table
+def get_birth_survive_counts(lut):
+    """
+    This function reads the birth and survive neighbor counts from a compiled 2 state rule.
+    The bitboard engine uses these because it evaluates the rule with bit masks instead of a table lookup.
+
+    Args:
+        lut: np matrix from compile_rule() with 2 states
+
+    Returns:
+        List, [birth counts (list of ints), survive counts (list of ints)]
+    """
+    return [list(np.nonzero(lut[0] == 1)[0]), list(np.nonzero(lut[1] == 1)[0])]
@@ -0,0 +1,164 @@
+"""
+This file contains functions to generate an infinite world one chunk at a time.
+
+Instead of one fixed height x width map whose edges are forced to be walls, the
+world's noise is defined for every cell by its world seed: the noise is split into
+tiles, and each tile gets its own random generator seeded from (world seed, tile row,
+tile col). Any piece of the noise can then be made without making the rest.
+
+After k CA iterations, a cell only depends on the noise within k cells of it. So to
+make a chunk, we smooth the chunk plus a margin of k cells on every side, and keep the
+middle. The margin's edges get the usual out of bounds walls, but that error only moves
+inward 1 cell per iteration, so it never reaches the chunk. Every chunk is then exactly
+the matching piece of one big smoothed world, and chunks line up with their neighbors
+no matter what order they're made in.
+"""
+
+
+import numpy as np # for random number generation and stitching tiles together.
+from . import map_helpers as maps # for CA smoothing.
+from . import ca_rules # default CA rule.
+
+
+# function to turn any int into a non-negative int for seeding
+def zigzag(value):
+    """
+    This function maps ints to non-negative ints without collisions
+    (0, -1, 1, -2, 2, ... become 0, 1, 2, 3, 4, ...), because numpy seeds can't be negative.
+
+    Args:
+        value: int
+
+    Returns:
+        int, >= 0
+    """
+    return 2 * value if value >= 0 else -2 * value - 1
+
+
+# function to make one tile of the world's noise
+def get_noise_tile(world_seed, tile_row, tile_col, tile_size, density):
+    """
+    This function creates the noise for one tile of the world. The same arguments always
+    give the same tile.
+
+    Args:
+        world_seed: int, the seed for the whole world
+        tile_row: int, row of the tile (can be negative)
+        tile_col: int, col of the tile (can be negative)
+        tile_size: int, number of rows and cols in a tile
+        density: int, between 0 - 100 for density of walls.
+
+    Returns:
+        np matrix of uint8, with 0s / 1s for floors / walls
+    """
+    rng = np.random.default_rng([zigzag(world_seed), zigzag(tile_row), zigzag(tile_col), tile_size])
+    return (rng.random(size = (tile_size, tile_size)) < density / 100).astype(np.uint8)
+
+
+# function to get any rectangle of the world's noise
+def get_world_noise(world_seed, first_row, first_col, num_rows, num_cols, tile_size, density):
+    """
+    This function creates the world's noise for a rectangle, stitched together from every tile it overlaps.
+
+    Args:
+        world_seed: int, the seed for the whole world
+        first_row: int, world row of the rectangle's top left cell (can be negative)
+        first_col: int, world col of the rectangle's top left cell (can be negative)
+        num_rows: int, number of rows in the rectangle
+        num_cols: int, number of cols in the rectangle
+        tile_size: int, number of rows and cols in a noise tile
+        density: int, between 0 - 100 for density of walls.
+
+    Returns:
+        np matrix of uint8 with shape (num_rows, num_cols)
+    """
+    noise = np.empty(shape = (num_rows, num_cols), dtype = np.uint8)
+
+    # floor division also works for negative world coordinates
+    for tile_row in range(first_row // tile_size, (first_row + num_rows - 1) // tile_size + 1):
+        for tile_col in range(first_col // tile_size, (first_col + num_cols - 1) // tile_size + 1):
+            tile = get_noise_tile(world_seed, tile_row, tile_col, tile_size, density)
+
+            # the part of this tile inside the rectangle, in world coordinates
+            row_start = max(first_row, tile_row * tile_size)
+            row_stop = min(first_row + num_rows, (tile_row + 1) * tile_size)
+            col_start = max(first_col, tile_col * tile_size)
+            col_stop = min(first_col + num_cols, (tile_col + 1) * tile_size)
+
+            noise[row_start - first_row:row_stop - first_row, col_start - first_col:col_stop - first_col] = tile[
+                row_start - tile_row * tile_size:row_stop - tile_row * tile_size,
+                col_start - tile_col * tile_size:col_stop - tile_col * tile_size
+            ]
+
+    return noise
+
+
+# function to create one chunk of the world
+def create_chunk(world_seed, chunk_row, chunk_col, chunk_size, density, iterations, rule=ca_rules.DEFAULT_RULE):
+    """
+    This function creates one smoothed chunk of the world. Chunks can be made independently and
+    in any order, and neighboring chunks match along their borders.
+
+    Args:
+        world_seed: int, the seed for the whole world
+        chunk_row: int, row of the chunk (can be negative)
+        chunk_col: int, col of the chunk (can be negative)
+        chunk_size: int, number of rows and cols in a chunk (also used as the noise tile size)
+        density: int, between 0 - 100 for density of walls.
+        iterations: int, number of iterations over which to apply Cellular Automata (CA) rules.
+        rule: string in B/S notation or a table from ca_rules.compile_rule(), defaults to the original map rule.
+
+    Returns:
+        np matrix of uint8 with shape (chunk_size, chunk_size), covering world rows
+        chunk_row * chunk_size up to (chunk_row + 1) * chunk_size, and the same for cols.
+    """
+    # the margin needs to be as wide as the number of iterations, see the note at the top of the file
+    margin = iterations
+    noise = get_world_noise(
+        world_seed, chunk_row * chunk_size - margin, chunk_col * chunk_size - margin,
+        chunk_size + 2 * margin, chunk_size + 2 * margin, chunk_size, density
+    )
+    smoothed = maps.create_map_with_ca(noise, iterations, rule = rule)
+
+    # copy the middle out, so the chunk doesn't keep the whole padded grid alive
+    return smoothed[margin:margin + chunk_size, margin:margin + chunk_size].copy()
+
+
+# function to get a chunk, reusing it if it has already been made
+def get_chunk(chunk_cache, world_seed, chunk_row, chunk_col, chunk_size, density, iterations, rule=ca_rules.DEFAULT_RULE, max_chunks=256):
+    """
+    This function returns a chunk from chunk_cache if it's there, otherwise it creates the chunk
+    with create_chunk() and stores it. When the cache holds more than max_chunks, the least
+    recently used chunk is dropped (it can always be made again, identically). Cached chunks are
+    read-only, so an edit can't change what later calls get back; copy a chunk to change its tiles.
+
+    Args:
+        chunk_cache: dict, used to store chunks between calls (start with an empty dict)
+        world_seed: int, the seed for the whole world
+        chunk_row: int, row of the chunk (can be negative)
+        chunk_col: int, col of the chunk (can be negative)
+        chunk_size: int, number of rows and cols in a chunk
+        density: int, between 0 - 100 for density of walls.
+        iterations: int, number of iterations over which to apply Cellular Automata (CA) rules.
+        rule: string in B/S notation or a table from ca_rules.compile_rule(), defaults to the original map rule.
+        max_chunks: int, defaults to 256, the most chunks to keep in chunk_cache
+
+    Returns:
+        np matrix of uint8, the chunk from create_chunk(), read-only
+    """
+    # key the rule by its compiled table, so tables (which can't be hashed) work, and equal rules share chunks
+    lut = ca_rules.compile_rule(rule)
+    key = (world_seed, chunk_row, chunk_col, chunk_size, density, iterations, lut.shape, lut.tobytes())
+
+    # dicts keep insertion order, so re-inserting a chunk marks it as the most recently used
+    if key in chunk_cache:
+        chunk = chunk_cache.pop(key)
+    else:
+        chunk = create_chunk(world_seed, chunk_row, chunk_col, chunk_size, density, iterations, rule)
+        chunk.flags.writeable = False
+    chunk_cache[key] = chunk
+
+    while len(chunk_cache) > max_chunks:
+        chunk_cache.pop(next(iter(chunk_cache)))
+
+    return chunk
@@ -0,0 +1,201 @@
+"""
+This file contains functions for distance fields (sometimes called Dijkstra maps): for every
+cell of the map, the number of steps it takes to walk there from a source cell.
+
+Moves go through the von Neumann neighborhood over floors (0) and enemies (3), like
+verify_path(). Every step costs the same, so a breadth first search finds the shortest
+distances. Here it expands a whole frontier of cells per step with array operations,
+instead of one cell at a time.
+
+Fields are stored in a cache made for each map. One field answers many questions: whether
+spawn and exit are connected and how far apart they are, or which way an enemy should step
+to get closer to the player. When a tile changes, only the fields that could be affected
+are dropped, and only if the tile changed between walkable and not walkable.
+"""
+
+
+import numpy as np # for the frontier search over flat indices.
+from . import reachability # the walkable states.
+
+
+# function to create the distance field cache for a map
+def create_distance_cache(grid):
+    """
+    This function sets up the cache for a map. The cache keeps its own reference to grid,
+    so tiles should be changed with set_tile() to keep cached fields up to date.
+
+    Args:
+        grid: np matrix w/ game map
+
+    Returns:
+        dict with:
+            "grid": the map,
+            "walkable": np matrix of bools, the walkable cells with a border of non-walkable cells around the map,
+            "fields": dict mapping a tuple of source cells to their distance field
+    """
+    walkable = np.zeros(shape = (grid.shape[0] + 2, grid.shape[1] + 2), dtype = bool)
+    walkable[1:-1, 1:-1] = reachability.get_walkable_mask(grid)
+    return {"grid": grid, "walkable": walkable, "fields": {}}
+
+
+# function to compute the distance from a set of sources to every cell
+def compute_distance_field(walkable, sources):
+    """
+    This function runs a breadth first search from every source at once, one frontier per step.
+
+    Args:
+        walkable: np matrix of bools from create_distance_cache(), with a non-walkable border
+        sources: list of [x, y] cells (in map coordinates) to measure distances from. They're
+            always given distance 0, even if they can't be walked on, like the start of verify_path().
+
+    Returns:
+        np matrix of int32 the size of the map, the number of steps from the nearest source, or -1 if unreachable
+    """
+    padded_cols = walkable.shape[1]
+    flat_walkable = walkable.ravel()
+    distances = np.full(shape = flat_walkable.shape, fill_value = -1, dtype = np.int32)
+    offsets = np.array([-padded_cols, -1, 1, padded_cols])
+
+    sources = np.asarray(sources, dtype = np.int64).reshape(-1, 2)
+    frontier = np.unique((sources[:, 0] + 1) * padded_cols + (sources[:, 1] + 1))
+    distances[frontier] = 0
+    step = 0
+
+    while frontier.size > 0:
+        step += 1
+
+        # every unvisited walkable neighbor of the frontier is one step further away
+        neighbors = (frontier[:, None] + offsets[None, :]).ravel()
+        neighbors = neighbors[flat_walkable[neighbors] & (distances[neighbors] < 0)]
+        frontier = np.unique(neighbors)
+        distances[frontier] = step
+
+    return distances.reshape(walkable.shape)[1:-1, 1:-1]
+
+
+# function to get a distance field, computing it only if it isn't cached
+def get_distance_field(cache, sources):
+    """
+    This function returns the distance field for a source cell (or several source cells).
+
+    Args:
+        cache: dict from create_distance_cache()
+        sources: [x, y] of one source cell, or a list of them
+
+    Returns:
+        np matrix of int32 from compute_distance_field(). Don't modify it, since it's shared through the cache.
+    """
+    sources = np.asarray(sources, dtype = np.int64).reshape(-1, 2)
+    key = tuple(sorted(map(tuple, sources.tolist())))
+
+    if key not in cache["fields"]:
+        cache["fields"][key] = compute_distance_field(cache["walkable"], sources)
+
+    return cache["fields"][key]
+
+
+# function to change a tile and drop any cached fields it affects
+def set_tile(cache, x, y, state):
+    """
+    This function sets one tile of the map. If the tile changes between walkable and not walkable,
+    the cached fields that could change are dropped: if it's blocked, the fields that reached it,
+    and if it's opened, the fields that reached one of its neighbors.
+
+    Args:
+        cache: dict from create_distance_cache()
+        x: int, row of the tile
+        y: int, col of the tile
+        state: int, the tile's new state
+
+    Returns:
+        None, the grid and cache are updated in place
+    """
+    cache["grid"][x, y] = state
+    was_walkable = cache["walkable"][x + 1, y + 1]
+    is_walkable = state in reachability.WALKABLE_STATES
+
+    # items, enemies, etc. that don't change walkability don't change any distances
+    if was_walkable == is_walkable:
+        return
+
+    cache["walkable"][x + 1, y + 1] = is_walkable
+    neighbors = [(n_x, n_y) for n_x, n_y in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+                 if 0 <= n_x < cache["grid"].shape[0] and 0 <= n_y < cache["grid"].shape[1]]
+
+    for key in list(cache["fields"].keys()):
+        field = cache["fields"][key]
+        if is_walkable:
+            affected = any(field[n_x, n_y] >= 0 for n_x, n_y in neighbors)
+        else:
+            affected = field[x, y] >= 0
+        if affected:
+            del cache["fields"][key]
+
+
+# function to pick a connected spawn and exit that are a certain distance apart
+def find_spawn_exit(cache, candidates, target_length=None):
+    """
+    This function picks a spawn and level exit from a list of candidate cells. Spawn candidates are tried
+    in order, and for the first one that can reach another candidate, the exit is the reachable candidate whose
+    walking distance is closest to target_length (or the farthest one, if target_length is None).
+    Since every distance comes from a distance field, the pair is always connected, so there's no separate path check.
+
+    Args:
+        cache: dict from create_distance_cache()
+        candidates: list of [x, y] cells, in the order to try them as the spawn
+        target_length: int, defaults to None, the desired number of steps from spawn to exit
+
+    Returns:
+        List: [spawn [x, y], exit [x, y], distance (int)], or None if no two different candidates are connected
+    """
+    candidates = np.asarray(candidates, dtype = np.int64).reshape(-1, 2)
+
+    for spawn in candidates.tolist():
+        field = get_distance_field(cache, spawn)
+        distances = field[candidates[:, 0], candidates[:, 1]].astype(np.int64)
+
+        # the exit has to be reachable and somewhere other than the spawn
+        valid = distances > 0
+        if not valid.any():
+            continue
+
+        if target_length is None:
+            score = np.where(valid, -distances, np.iinfo(np.int64).max)
+        else:
+            score = np.where(valid, np.abs(distances - target_length), np.iinfo(np.int64).max)
+
+        # argmin picks the first candidate if there's a tie
+        exit_idx = int(np.argmin(score))
+        return [spawn, candidates[exit_idx].tolist(), int(distances[exit_idx])]
+
+    return None
+
+
+# function to find the next step along the shortest path to a source
+def get_step_toward(cache, source, position):
+    """
+    This function finds which neighboring cell to move to from position, to get one step closer
+    to source, e.g. for an enemy chasing the player (source = the player's position).
+    The source's field is cached, so every enemy chasing the same player shares one search.
+
+    Args:
+        cache: dict from create_distance_cache()
+        source: [x, y] of the cell to move toward
+        position: [x, y] of the cell to move from
+
+    Returns:
+        List, [x, y] of the next cell, or position itself if source can't be reached (or it's already there)
+    """
+    field = get_distance_field(cache, source)
+    best = [position[0], position[1]]
+    best_distance = field[position[0], position[1]]
+
+    if best_distance <= 0:
+        return best
+
+    for n_x, n_y in ((position[0] - 1, position[1]), (position[0] + 1, position[1]), (position[0], position[1] - 1), (position[0], position[1] + 1)):
+        if 0 <= n_x < field.shape[0] and 0 <= n_y < field.shape[1] and 0 <= field[n_x, n_y] < best_distance:
+            best = [n_x, n_y]
+            best_distance = field[n_x, n_y]
+
+    return best
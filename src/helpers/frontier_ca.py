@@ -0,0 +1,190 @@
+"""
+This file contains an incremental "active frontier" version of the Cellular
+Automata (CA). After the first few iterations, only a thin band of cells along
+the cave walls still changes. A cell can only change if it, or one of its
+neighbors, changed in the step before, so each step here only re-checks the
+cells that changed last step plus their neighbors. Late iterations then cost
+time proportional to that band instead of the whole map.
+"""
+
+
+import numpy as np # for gathering neighbor values by index.
+from . import ca_rules # lookup tables for CA rules.
+
+
+# while more than this fraction of the map is active, a full-grid step is faster than gathering by index
+DENSE_FRACTION = 0.1
+
+
+# function to get the flat offsets of a cell's Moore neighborhood in a padded grid
+def get_neighbor_offsets(padded_cols):
+    """
+    This function finds how far away (in flat index) each neighbor of a cell is
+    in a padded grid that has been flattened row by row.
+
+    Args:
+        padded_cols: int, number of columns in the padded grid
+
+    Returns:
+        np array of the 8 neighbor offsets (not including the cell itself)
+    """
+    return np.array([
+        row_offset * padded_cols + col_offset
+        for row_offset in range(-1, 2)
+        for col_offset in range(-1, 2)
+        if row_offset != 0 or col_offset != 0
+    ])
+
+
+# function to apply the CA rule to a set of cells in the padded grid
+def update_cells(flat_states, cells, neighbor_offsets, lut):
+    """
+    This function computes the next state of the given cells, using the current states
+    of their neighbors. Nothing is written back, so all cells update at the same time.
+
+    Args:
+        flat_states: np array, the flattened padded grid of states (border cells are walls)
+        cells: np array of flat indices to update
+        neighbor_offsets: np array from get_neighbor_offsets()
+        lut: np matrix from ca_rules.compile_rule()
+
+    Returns:
+        np array with the next state of each cell in cells
+    """
+    num_neighboring_walls = np.zeros(shape = cells.shape, dtype = np.uint8)
+    for offset in neighbor_offsets:
+        num_neighboring_walls += flat_states[cells + offset] == 1
+    return lut[flat_states[cells], num_neighboring_walls]
+
+
+# function to apply the CA rule to every cell in the padded grid at once
+def update_all_cells(padded, lut):
+    """
+    This function computes the next state of every (non-border) cell with whole-array
+    operations, for the early iterations where most of the map is still changing.
+
+    Args:
+        padded: np matrix of states, with a border of walls around the map
+        lut: np matrix from ca_rules.compile_rule()
+
+    Returns:
+        np matrix with the next state of each cell, without the border
+    """
+    num_rows = padded.shape[0] - 2
+    num_cols = padded.shape[1] - 2
+    walls = padded == 1
+    num_neighboring_walls = np.zeros(shape = (num_rows, num_cols), dtype = np.uint8)
+
+    for row_offset in range(3):
+        for col_offset in range(3):
+            if row_offset == 1 and col_offset == 1:
+                continue
+            num_neighboring_walls += walls[row_offset:row_offset + num_rows, col_offset:col_offset + num_cols]
+
+    return lut[padded[1:-1, 1:-1], num_neighboring_walls]
+
+
+# function to find which cells need to be checked in the next step
+def get_active_cells(changed_cells, neighbor_offsets, is_border, seen_at):
+    """
+    This function finds the cells that changed plus all of their neighbors,
+    leaving out the padding border around the grid.
+
+    Args:
+        changed_cells: np array of flat indices (in the padded grid) that changed last step
+        neighbor_offsets: np array from get_neighbor_offsets()
+        is_border: np array of bools, True for flat indices on the padding border
+        seen_at: np array of ints the size of the padded grid, scratch space for removing duplicates
+
+    Returns:
+        np array of unique flat indices to update next step
+    """
+    all_offsets = np.append(neighbor_offsets, 0)
+    candidates = (changed_cells[:, None] + all_offsets[None, :]).ravel()
+    candidates = candidates[~is_border[candidates]]
+
+    # remove duplicates without sorting: each cell remembers one position it was seen at,
+    # and only the candidate at that position is kept
+    positions = np.arange(candidates.size)
+    seen_at[candidates] = positions
+    return candidates[seen_at[candidates] == positions]
+
+
+# function to run the CA only on cells near the last changes
+def create_map_with_ca_frontier(starting_grid, num_iterations, rule=ca_rules.DEFAULT_RULE):
+    """
+    This function applies the same CA rules as map_helpers.create_map_with_ca(), but it only 
+    recomputes the active cells: those that changed in the previous step and their neighbors.
+    The first steps, where most of the map is active, update the whole grid at once.
+    If nothing changed, the grid is stable and we stop early.
+
+    Args:
+        starting_grid: np matrix, with 0s / 1s to represent floors / walls.
+        num_iterations: int, how many time steps over which to apply the CA rules.
+        rule: string in B/S notation or a table from ca_rules.compile_rule(), defaults to the original map rule.
+
+    Returns:
+        List: with elements [
+            modified_grid (idx 0): np matrix after the CA rules are applied, same dtype as starting_grid,
+            iterations_run (idx 1): int, number of CA steps actually computed,
+            cycle_length (idx 2): int, 1 if the grid became stable, else 0
+        ]
+    """
+    lut = ca_rules.compile_rule(rule)
+    num_rows = starting_grid.shape[0]
+    num_cols = starting_grid.shape[1]
+    padded_cols = num_cols + 2
+
+    # store states in a grid padded with a border of walls, so neighbors never go out of bounds
+    padded = np.ones(shape = (num_rows + 2, num_cols + 2), dtype = np.uint8)
+    padded[1:-1, 1:-1] = ca_rules.get_cell_states(starting_grid, lut)
+    flat_states = padded.ravel()
+    neighbor_offsets = get_neighbor_offsets(padded_cols)
+
+    # flat indices of every cell in the map, and a mask of the padding border
+    rows, cols = np.indices((num_rows, num_cols))
+    all_cells = ((rows + 1) * padded_cols + (cols + 1)).ravel()
+    is_border = np.ones(shape = flat_states.shape, dtype = bool)
+    is_border[all_cells] = False
+    seen_at = np.zeros(shape = flat_states.shape, dtype = np.int64)
+
+    # every cell is active for the first step
+    active = all_cells
+    iterations_run = 0
+    cycle_length = 0
+
+    for i in range(1, num_iterations + 1):
+
+        # once nothing changes, every remaining step would leave the grid the same
+        if active.size == 0:
+            cycle_length = 1
+            break
+
+        print(f"Starting iteration {i}... ({active.size} active cells)")
+        iterations_run = i
+
+        # compute all new values first, then write back only the cells that changed.
+        # while most of the map is active, updating the whole grid at once is faster.
+        if active.size > DENSE_FRACTION * all_cells.size:
+            new_states = update_all_cells(padded, lut)
+            did_change = (new_states != padded[1:-1, 1:-1]).ravel()
+            changed_cells = all_cells[did_change]
+            flat_states[changed_cells] = new_states.ravel()[did_change]
+
+            # if the changes could still make a large active set, stay with full-grid steps
+            if changed_cells.size * 9 > DENSE_FRACTION * all_cells.size:
+                active = all_cells
+                continue
+        else:
+            new_states = update_cells(flat_states, active, neighbor_offsets, lut)
+            did_change = new_states != flat_states[active]
+            changed_cells = active[did_change]
+            flat_states[changed_cells] = new_states[did_change]
+
+        active = get_active_cells(changed_cells, neighbor_offsets, is_border, seen_at)
+
+    # with no iterations the grid is returned unchanged, like the other engines
+    if iterations_run == 0 and cycle_length == 0:
+        return [starting_grid.copy(), 0, 0]
+
+    return [padded[1:-1, 1:-1].astype(starting_grid.dtype), iterations_run, cycle_length]
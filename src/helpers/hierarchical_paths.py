@@ -0,0 +1,419 @@
+"""
+This file contains a hierarchical path planner, for long paths across very large maps.
+
+Instead of searching cell by cell across the whole map, the walkable cells are split into
+regions: the rooms found before connect_map() (from the room labels of create_complete_map()),
+and the corridors it carved between them. Each region is connected through the von Neumann
+neighborhood, so any two of its cells can always be walked between without leaving it.
+The regions and the pairs of regions that touch make a small abstract graph, where each edge
+costs the distance between the two regions' centroids. Those costs are worked out once per map.
+
+A path query first finds a route of regions with A* over the abstract graph, then finds the
+actual path with pathfinding.find_path_astar(), only searching cells inside the regions on the
+route. Rooms off to the side of the route are never searched. The path is the cheapest one inside
+those regions, which is usually, but not always, the cheapest path on the whole map.
+This helps most on maps with many separate rooms. If one open cave covers most of the map,
+it's one region, and the query is just A* over that region.
+
+When a tile changes between walkable and not walkable, only the regions around it are updated:
+an opened tile joins a neighboring region, and a blocked tile can split its region, so just that
+region is labeled again. Carving a corridor is a set_tile() for each of its cells.
+"""
+
+
+import heapq # priority queue for the search over regions.
+from array import array # compact region id per cell, fast to read one at a time.
+import numpy as np # for labeling regions and finding which regions touch.
+from . import labeling # 4-connected labeling of the regions.
+from . import pathfinding # A* on the grid, and the shared walkable cells.
+from . import reachability # the walkable states.
+
+
+# function to label the 4-connected components of a mask
+def label_components(mask):
+    """
+    This function labels each group of cells in mask that are connected through the von Neumann neighborhood.
+
+    Args:
+        mask: np matrix of bools
+
+    Returns:
+        List: with elements [
+            labels (idx 0): np matrix of int32, component index of each cell in mask, and -1 for every other cell,
+            num_components (idx 1): int, number of components
+        ]
+    """
+    runs, run_components, num_components = labeling.label_runs(mask, connectivity = 4)
+    return [labeling.paint_labels(mask, runs, run_components) - 1, num_components]
+
+
+# function to find every pair of regions that touch
+def find_touching_regions(regions):
+    """
+    This function finds every pair of different regions with cells side by side (up, down, left, right).
+
+    Args:
+        regions: np matrix of ints, region id of each cell, or -1 for cells that can't be walked on
+
+    Returns:
+        np matrix of ints with a [region_a, region_b] row for each touching pair, region_a < region_b
+    """
+    pairs = []
+    for a, b in ((regions[:-1, :], regions[1:, :]), (regions[:, :-1], regions[:, 1:])):
+        touching = (a >= 0) & (b >= 0) & (a != b)
+        pairs.append(np.stack([np.minimum(a[touching], b[touching]), np.maximum(a[touching], b[touching])], axis = 1))
+
+    pairs = np.concatenate(pairs).astype(np.int64)
+    if pairs.size == 0:
+        return pairs.reshape(0, 2)
+    return np.unique(pairs, axis = 0)
+
+
+# function to create the hierarchical planner for a map
+def create_region_planner(grid, room_labels, connectivity=4):
+    """
+    This function splits the walkable cells of the map into room and corridor regions,
+    and works out the abstract graph between them.
+
+    Args:
+        grid: np matrix w/ game map (after the rooms were connected)
+        room_labels: np matrix, room id + 1 of each cell (0 if not in a room), from create_complete_map() (idx 8)
+            or create_room_table() on the map from before connect_map()
+        connectivity: int, defaults to 4, see pathfinding.create_path_finder()
+
+    Returns:
+        dict with:
+            "finder": path finder from pathfinding.create_path_finder(), which shares the grid,
+            "room_labels": the room labels,
+            "regions": np matrix of int32, region id of each cell, or -1 if it can't be walked on,
+            "region_flat": array, region id for each flat index of the finder,
+            "is_room": list, True for room regions and False for corridor regions,
+            "sizes", "sum_x", "sum_y": lists, number of cells and sums of their coordinates for each region,
+            "bboxes": lists [min_x, max_x, min_y, max_y] that hold every cell of each region,
+            "edges": list, dict for each region mapping each touching region to the cost between them
+    """
+    finder = pathfinding.create_path_finder(grid, connectivity)
+    walkable = reachability.get_walkable_mask(grid)
+    in_room = room_labels > 0
+
+    # room regions first, then corridor regions
+    room_regions, num_room_regions = label_components(walkable & in_room)
+    corridor_regions, num_corridor_regions = label_components(walkable & ~in_room)
+    regions = np.where(corridor_regions >= 0, corridor_regions + num_room_regions, room_regions).astype(np.int32)
+    num_regions = num_room_regions + num_corridor_regions
+
+    # stats for each region, to find its centroid and where its cells are
+    cell_x, cell_y = np.nonzero(regions >= 0)
+    cell_regions = regions[cell_x, cell_y]
+    bboxes = np.zeros(shape = (num_regions, 4), dtype = np.int64)
+    bboxes[:, 0] = grid.shape[0]
+    bboxes[:, 2] = grid.shape[1]
+    np.minimum.at(bboxes[:, 0], cell_regions, cell_x)
+    np.maximum.at(bboxes[:, 1], cell_regions, cell_x)
+    np.minimum.at(bboxes[:, 2], cell_regions, cell_y)
+    np.maximum.at(bboxes[:, 3], cell_regions, cell_y)
+
+    padded = np.full(shape = (grid.shape[0] + 2, grid.shape[1] + 2), fill_value = -1, dtype = np.int32)
+    padded[1:-1, 1:-1] = regions
+    region_flat = array("i")
+    region_flat.frombytes(padded.tobytes())
+
+    planner = {
+        "finder": finder,
+        "room_labels": room_labels,
+        "regions": regions,
+        "region_flat": region_flat,
+        "is_room": [r < num_room_regions for r in range(num_regions)],
+        "sizes": np.bincount(cell_regions, minlength = num_regions).tolist(),
+        "sum_x": np.bincount(cell_regions, weights = cell_x, minlength = num_regions).astype(np.int64).tolist(),
+        "sum_y": np.bincount(cell_regions, weights = cell_y, minlength = num_regions).astype(np.int64).tolist(),
+        "bboxes": bboxes.tolist(),
+        "edges": [{} for r in range(num_regions)],
+    }
+
+    for region_a, region_b in find_touching_regions(regions).tolist():
+        add_region_edge(planner, region_a, region_b)
+
+    return planner
+
+
+# function to get the cost of the abstract edge between two regions
+def get_region_cost(planner, region_a, region_b):
+    """
+    This function estimates the cost of walking from one region to another as the distance between their
+    centroids (manhattan with 4 directions, octile with 8), like pathfinding.get_line_cost().
+
+    Args:
+        planner: dict from create_region_planner()
+        region_a: int, id of the first region
+        region_b: int, id of the second region
+
+    Returns:
+        float, the cost
+    """
+    dx = abs(planner["sum_x"][region_a] / planner["sizes"][region_a] - planner["sum_x"][region_b] / planner["sizes"][region_b])
+    dy = abs(planner["sum_y"][region_a] / planner["sizes"][region_a] - planner["sum_y"][region_b] / planner["sizes"][region_b])
+
+    if planner["finder"]["connectivity"] == 4:
+        return dx + dy
+    return max(dx, dy) + (pathfinding.DIAGONAL_COST - 1) * min(dx, dy)
+
+
+# function to add an abstract edge between two touching regions
+def add_region_edge(planner, region_a, region_b):
+    """
+    This function adds (or updates the cost of) the edge between two regions, in both directions.
+
+    Args:
+        planner: dict from create_region_planner()
+        region_a: int, id of the first region
+        region_b: int, id of the second region
+
+    Returns:
+        None, the planner is updated in place
+    """
+    cost = get_region_cost(planner, region_a, region_b)
+    planner["edges"][region_a][region_b] = cost
+    planner["edges"][region_b][region_a] = cost
+
+
+# function to update the costs of every edge of a region
+def update_region_costs(planner, region):
+    """
+    This function works out the costs of a region's edges again, after its centroid moved.
+
+    Args:
+        planner: dict from create_region_planner()
+        region: int, id of the region
+
+    Returns:
+        None, the planner is updated in place
+    """
+    for neighbor in list(planner["edges"][region].keys()):
+        add_region_edge(planner, region, neighbor)
+
+
+# function to find the route of regions between two regions
+def find_region_route(planner, start_region, goal_region):
+    """
+    This function runs A* over the abstract graph, with the distance between centroids as the heuristic.
+
+    Args:
+        planner: dict from create_region_planner()
+        start_region: int, id of the start region
+        goal_region: int, id of the goal region
+
+    Returns:
+        List of region ids from start_region to goal_region, or None if they aren't connected
+    """
+    edges = planner["edges"]
+    best_cost = {start_region: 0.0}
+    parent = {start_region: -1}
+    open_list = [(get_region_cost(planner, start_region, goal_region), start_region)]
+    closed = set()
+
+    while open_list:
+        f, region = heapq.heappop(open_list)
+        if region in closed:
+            continue
+        if region == goal_region:
+            route = [region]
+            while parent[route[-1]] >= 0:
+                route.append(parent[route[-1]])
+            return route[::-1]
+        closed.add(region)
+
+        for neighbor, cost in edges[region].items():
+            new_cost = best_cost[region] + cost
+            if neighbor not in closed and new_cost < best_cost.get(neighbor, float("inf")):
+                best_cost[neighbor] = new_cost
+                parent[neighbor] = region
+                heapq.heappush(open_list, (new_cost + get_region_cost(planner, neighbor, goal_region), neighbor))
+
+    return None
+
+
+# function to find a path with the hierarchical planner
+def find_path(planner, start, goal):
+    """
+    This function finds a path from start to goal: first a route of regions, then the cells
+    along it, only searching inside the regions on the route.
+
+    Args:
+        planner: dict from create_region_planner()
+        start: [x, y] of the start cell
+        goal: [x, y] of the goal cell
+
+    Returns:
+        List, [x, y] of every cell on the path from start to goal, or None if there isn't one
+        (including when start or goal can't be walked on)
+    """
+    start_region = int(planner["regions"][start[0], start[1]])
+    goal_region = int(planner["regions"][goal[0], goal[1]])
+    if start_region < 0 or goal_region < 0:
+        return None
+
+    route = find_region_route(planner, start_region, goal_region)
+    if route is None:
+        return None
+
+    # each region is connected inside itself and touches the next one, so this always finds a path
+    return pathfinding.find_path_astar(planner["finder"], start, goal, regions = planner["region_flat"], allowed_regions = set(route))
+
+
+# function to put a cell into a region
+def set_cell_region(planner, x, y, region):
+    """
+    This function records which region a cell is in, in both the region grid and the flat region ids.
+
+    Args:
+        planner: dict from create_region_planner()
+        x: int, row of the cell
+        y: int, col of the cell
+        region: int, id of the region, or -1 if the cell can't be walked on
+
+    Returns:
+        None, the planner is updated in place
+    """
+    planner["regions"][x, y] = region
+    planner["region_flat"][(x + 1) * planner["finder"]["cols"] + y + 1] = region
+
+
+# function to add a new, empty region
+def add_region(planner, is_room):
+    """
+    This function adds a new region with no cells and no edges.
+
+    Args:
+        planner: dict from create_region_planner()
+        is_room: bool, True for a room region, False for a corridor region
+
+    Returns:
+        int, id of the new region
+    """
+    planner["is_room"].append(is_room)
+    planner["sizes"].append(0)
+    planner["sum_x"].append(0)
+    planner["sum_y"].append(0)
+    planner["bboxes"].append([planner["regions"].shape[0], 0, planner["regions"].shape[1], 0])
+    planner["edges"].append({})
+    return len(planner["sizes"]) - 1
+
+
+# function to add an opened cell to a region
+def open_cell(planner, x, y):
+    """
+    This function adds a cell that just became walkable to a touching region of the same kind (room or
+    corridor), or to a new region if there isn't one. Every other region it touches gets an edge.
+
+    Args:
+        planner: dict from create_region_planner()
+        x: int, row of the cell
+        y: int, col of the cell
+
+    Returns:
+        None, the planner is updated in place
+    """
+    regions = planner["regions"]
+    is_room = bool(planner["room_labels"][x, y] > 0)
+    touching = [int(regions[n_x, n_y]) for n_x, n_y in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+                if 0 <= n_x < regions.shape[0] and 0 <= n_y < regions.shape[1] and regions[n_x, n_y] >= 0]
+
+    same_kind = [r for r in touching if planner["is_room"][r] == is_room]
+    region = same_kind[0] if len(same_kind) > 0 else add_region(planner, is_room)
+
+    set_cell_region(planner, x, y, region)
+    planner["sizes"][region] += 1
+    planner["sum_x"][region] += x
+    planner["sum_y"][region] += y
+    bbox = planner["bboxes"][region]
+    planner["bboxes"][region] = [min(bbox[0], x), max(bbox[1], x), min(bbox[2], y), max(bbox[3], y)]
+
+    for neighbor in touching:
+        if neighbor != region:
+            add_region_edge(planner, region, neighbor)
+    update_region_costs(planner, region)
+
+
+# function to remove a blocked cell from its region
+def block_cell(planner, x, y):
+    """
+    This function removes a cell that can no longer be walked on from its region. The region might
+    split into pieces, so it's labeled again (only inside its bounding box): the first piece keeps
+    the region's id and the rest get new ones. Then the edges of every piece are found again.
+
+    Args:
+        planner: dict from create_region_planner()
+        x: int, row of the cell
+        y: int, col of the cell
+
+    Returns:
+        None, the planner is updated in place
+    """
+    regions = planner["regions"]
+    region = int(regions[x, y])
+    set_cell_region(planner, x, y, -1)
+
+    # drop the old region's edges, the pieces get theirs again at the end
+    for neighbor in planner["edges"][region]:
+        del planner["edges"][neighbor][region]
+    planner["edges"][region] = {}
+
+    min_x, max_x, min_y, max_y = planner["bboxes"][region]
+    pieces, num_pieces = label_components(regions[min_x:max_x + 1, min_y:max_y + 1] == region)
+
+    # that was the region's last cell
+    if num_pieces == 0:
+        planner["sizes"][region] = 0
+        planner["sum_x"][region] = 0
+        planner["sum_y"][region] = 0
+        return
+
+    piece_ids = [region] + [add_region(planner, planner["is_room"][region]) for p in range(1, num_pieces)]
+
+    # move the cells of every other piece into its new region, and update every piece's stats
+    piece_x, piece_y = np.nonzero(pieces >= 0)
+    piece_of_cell = pieces[piece_x, piece_y]
+    for p, piece_region in enumerate(piece_ids):
+        cells = piece_of_cell == p
+        cells_x = piece_x[cells] + min_x
+        cells_y = piece_y[cells] + min_y
+        if piece_region != region:
+            for c_x, c_y in zip(cells_x.tolist(), cells_y.tolist()):
+                set_cell_region(planner, c_x, c_y, piece_region)
+        planner["sizes"][piece_region] = int(cells_x.size)
+        planner["sum_x"][piece_region] = int(cells_x.sum())
+        planner["sum_y"][piece_region] = int(cells_y.sum())
+        planner["bboxes"][piece_region] = [int(cells_x.min()), int(cells_x.max()), int(cells_y.min()), int(cells_y.max())]
+
+    # find the edges of every piece from the area around the old bounding box
+    window = regions[max(min_x - 1, 0):max_x + 2, max(min_y - 1, 0):max_y + 2]
+    changed = set(piece_ids)
+    for region_a, region_b in find_touching_regions(window).tolist():
+        if region_a in changed or region_b in changed:
+            add_region_edge(planner, region_a, region_b)
+
+
+# function to change a tile and keep the planner up to date
+def set_tile(planner, x, y, state):
+    """
+    This function sets one tile of the map. If the tile changes between walkable and not walkable,
+    the regions and abstract edges around it are updated (see open_cell() and block_cell()).
+
+    Args:
+        planner: dict from create_region_planner()
+        x: int, row of the tile
+        y: int, col of the tile
+        state: int, the tile's new state
+
+    Returns:
+        None, the grid and planner are updated in place
+    """
+    pathfinding.set_tile(planner["finder"], x, y, state)
+    was_walkable = planner["regions"][x, y] >= 0
+    is_walkable = state in reachability.WALKABLE_STATES
+
+    if is_walkable and not was_walkable:
+        open_cell(planner, x, y)
+    elif was_walkable and not is_walkable:
+        block_cell(planner, x, y)
@@ -0,0 +1,224 @@
+"""
+This file contains functions to label the rooms (connected floor areas) of a map
+in linear time, without a BFS queue.
+
+Instead of visiting cells one at a time, each row is split into runs of floor cells.
+Runs in neighboring rows that touch (including diagonally, like the Moore neighborhood
+used in find_room_coordinates()) are joined with a union-find, and every cell of a run
+gets its room's label. Rooms are numbered in the order of their first cell, row by row,
+which is the same order the original BFS room search found them in.
+"""
+
+
+import numpy as np # for finding runs and merging labels with whole-array operations.
+
+
+# function to find the runs of floor cells in every row
+def find_runs(floor_mask):
+    """
+    This function finds every horizontal run of floor cells in the map.
+
+    Args:
+        floor_mask: np matrix of bools, True for floor cells
+
+    Returns:
+        List: with elements [
+            run_rows (idx 0): np array, row of each run,
+            run_starts (idx 1): np array, first column of each run,
+            run_stops (idx 2): np array, one past the last column of each run
+        ]
+        Runs are in row-major order.
+    """
+    num_rows = floor_mask.shape[0]
+
+    # pad each row with a wall on both sides, then look for floor / wall changes
+    padded = np.zeros(shape = (num_rows, floor_mask.shape[1] + 2), dtype = np.int8)
+    padded[:, 1:-1] = floor_mask
+    changes = np.diff(padded, axis = 1)
+
+    start_rows, run_starts = np.nonzero(changes == 1)
+    stop_rows, run_stops = np.nonzero(changes == -1)
+    return [start_rows, run_starts, run_stops]
+
+
+# function to find which runs in neighboring rows touch each other
+def find_run_edges(run_rows, run_starts, run_stops, num_cols, connectivity=8):
+    """
+    This function finds every pair of runs in neighboring rows that touch, including
+    diagonally. A run in the next row touches run a if it starts at or before a's stop
+    and stops at or after a's start. With connectivity = 4, runs only touch if they
+    share at least one column (start before a's stop and stop after a's start).
+
+    Args:
+        run_rows, run_starts, run_stops: np arrays from find_runs()
+        num_cols: int, number of columns in the map
+        connectivity: int, defaults to 8 for the Moore neighborhood, or 4 for the von Neumann neighborhood
+
+    Returns:
+        List, [first run index of each edge, second run index of each edge]
+    """
+    # combine row and column into one sortable key per run (runs are sorted by both)
+    key_size = num_cols + 2
+    start_keys = run_rows * key_size + run_starts
+    stop_keys = run_rows * key_size + run_stops
+
+    # in the next row, runs that touch run a are a contiguous block between first_idx and last_idx
+    next_row = (run_rows + 1) * key_size
+    if connectivity == 8:
+        first_idx = np.searchsorted(stop_keys, next_row + run_starts, side = "left")
+        last_idx = np.searchsorted(start_keys, next_row + run_stops, side = "right")
+    else:
+        first_idx = np.searchsorted(stop_keys, next_row + run_starts, side = "right")
+        last_idx = np.searchsorted(start_keys, next_row + run_stops, side = "left")
+    num_edges = np.maximum(last_idx - first_idx, 0)
+
+    # expand every [first_idx, last_idx) block into individual edges
+    edge_a = np.repeat(np.arange(run_rows.size), num_edges)
+    block_offsets = np.arange(edge_a.size) - np.repeat(np.cumsum(num_edges) - num_edges, num_edges)
+    edge_b = np.repeat(first_idx, num_edges) + block_offsets
+    return [edge_a, edge_b]
+
+
+# function to merge connected nodes with a vectorized union-find
+def merge_labels(num_nodes, edge_a, edge_b):
+    """
+    This function finds connected components of a graph given as a list of edges.
+    Every node ends up pointing to the smallest node index in its component.
+
+    Args:
+        num_nodes: int, number of nodes
+        edge_a: np array, first node of each edge
+        edge_b: np array, second node of each edge
+
+    Returns:
+        np array, for each node the smallest node index in its component
+
+    Note:
+        Each round hooks the larger root of every edge onto the smaller root, then
+        shortcuts every node to its root. This usually finishes in a handful of rounds.
+    """
+    parent = np.arange(num_nodes)
+
+    while True:
+        root_a = parent[edge_a]
+        root_b = parent[edge_b]
+        unmerged = root_a != root_b
+        if not unmerged.any():
+            return parent
+
+        # hook larger roots onto smaller ones, then point every node straight at its root
+        np.minimum.at(parent, np.maximum(root_a[unmerged], root_b[unmerged]), np.minimum(root_a[unmerged], root_b[unmerged]))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+        # only edges that weren't merged yet need checking again
+        edge_a = edge_a[unmerged]
+        edge_b = edge_b[unmerged]
+
+
+# function to label the runs of a map with room numbers
+def label_runs(floor_mask, connectivity=8):
+    """
+    This function finds the floor runs of a map and which room each run belongs to.
+
+    Args:
+        floor_mask: np matrix of bools, True for floor cells
+        connectivity: int, defaults to 8 for the Moore neighborhood, or 4 for the von Neumann neighborhood
+
+    Returns:
+        List: with elements [
+            runs (idx 0): List [run_rows, run_starts, run_stops] from find_runs(),
+            run_rooms (idx 1): np array, room index (starting at 0) of each run,
+            num_rooms (idx 2): int, number of rooms
+        ]
+    """
+    runs = find_runs(floor_mask)
+    edge_a, edge_b = find_run_edges(runs[0], runs[1], runs[2], floor_mask.shape[1], connectivity)
+    roots = merge_labels(runs[0].size, edge_a, edge_b)
+
+    # number the rooms by their first run, which is also their first cell in row-major order
+    is_root = roots == np.arange(roots.size)
+    room_of_root = np.cumsum(is_root) - 1
+    return [runs, room_of_root[roots], int(is_root.sum())]
+
+
+# function to add up room stats from the runs
+def summarize_runs(runs, run_rooms, num_rooms):
+    """
+    This function adds up the area, bounding box, and coordinate sums of each room from its runs.
+    The sums (instead of averages) make it easy to merge rooms that were split across bands.
+
+    Args:
+        runs: List [run_rows, run_starts, run_stops] from find_runs()
+        run_rooms: np array, room index of each run
+        num_rooms: int, number of rooms
+
+    Returns:
+        dict of np arrays, each with one value per room:
+            "area", "min_row", "max_row", "min_col", "max_col", "row_sum", "col_sum"
+    """
+    run_rows, run_starts, run_stops = runs
+    run_lengths = run_stops - run_starts
+
+    stats = {
+        "area": np.bincount(run_rooms, weights = run_lengths, minlength = num_rooms).astype(np.int64),
+        "min_row": np.full(num_rooms, np.iinfo(np.int64).max),
+        "max_row": np.full(num_rooms, -1),
+        "min_col": np.full(num_rooms, np.iinfo(np.int64).max),
+        "max_col": np.full(num_rooms, -1),
+        "row_sum": np.bincount(run_rooms, weights = run_rows * run_lengths, minlength = num_rooms),
+        # sum of the columns start, start + 1, ... stop - 1
+        "col_sum": np.bincount(run_rooms, weights = (run_starts + run_stops - 1) * run_lengths / 2, minlength = num_rooms),
+    }
+    np.minimum.at(stats["min_row"], run_rooms, run_rows)
+    np.maximum.at(stats["max_row"], run_rooms, run_rows)
+    np.minimum.at(stats["min_col"], run_rooms, run_starts)
+    np.maximum.at(stats["max_col"], run_rooms, run_stops - 1)
+    return stats
+
+
+# function to paint each floor cell with its room label
+def paint_labels(floor_mask, runs, run_rooms):
+    """
+    This function creates the label image for a map. Floor cells, read in row-major order,
+    line up exactly with the cells of the runs in order, so the labels can be filled in one step.
+
+    Args:
+        floor_mask: np matrix of bools, True for floor cells
+        runs: List [run_rows, run_starts, run_stops] from find_runs()
+        run_rooms: np array, room index of each run
+
+    Returns:
+        np matrix of int32, 0 for non-floor cells, and room index + 1 for floor cells
+    """
+    labels = np.zeros(shape = floor_mask.shape, dtype = np.int32)
+    labels.ravel()[np.flatnonzero(floor_mask)] = np.repeat(run_rooms + 1, runs[2] - runs[1])
+    return labels
+
+
+# function to label every room of a map in one pass
+def label_rooms(floor_mask):
+    """
+    This function labels the rooms of a map and measures each one, in time linear in the map size.
+    Works for maps of any shape.
+
+    Args:
+        floor_mask: np matrix of bools, True for floor cells
+
+    Returns:
+        List: with elements [
+            labels (idx 0): np matrix of int32 from paint_labels(), 0 for non-floor cells and room index + 1 for floor cells,
+            areas (idx 1): np array, number of cells in each room,
+            bboxes (idx 2): np matrix with a [min_row, max_row, min_col, max_col] row for each room,
+            centroids (idx 3): np matrix with the average [row, col] of each room's cells
+        ]
+    """
+    runs, run_rooms, num_rooms = label_runs(floor_mask)
+    stats = summarize_runs(runs, run_rooms, num_rooms)
+
+    bboxes = np.stack([stats["min_row"], stats["max_row"], stats["min_col"], stats["max_col"]], axis = 1)
+    centroids = np.stack([stats["row_sum"], stats["col_sum"]], axis = 1) / np.maximum(stats["area"], 1)[:, None]
+    return [paint_labels(floor_mask, runs, run_rooms), stats["area"], bboxes, centroids]
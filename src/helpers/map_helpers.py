@@ -8,15 +8,28 @@ game maps with Cellular Automata.
 
 import numpy as np # for various matrix functions, and random number generation.
 import math # for floor() method.
-import queue # using queue data structure in BFS.
+import hashlib # for hashing grid states when checking if the CA has stopped changing.
+import os # for the number of CPUs when making candidate maps in parallel.
+import time # for keeping map creation within a deadline.
+from concurrent.futures import ProcessPoolExecutor # for making candidate maps in parallel.
 import matplotlib.pyplot as plt # for plotting before map moved into Pygame.
 from matplotlib import colors # used in plotting custom pixel color scales.
+from . import bitboard # bit-packed wall layer for the bitboard CA engine.
+from . import ca_rules # birth / survival rules compiled to lookup tables.
+from . import distance_fields # cached walking distances from source cells.
+from . import frontier_ca # incremental CA engine that only updates cells near changes.
+from . import labeling # linear time room labeling.
+from . import map_quality # cheap scores for rejecting maps early.
+from . import parallel_ca # multi-core CA engine using shared memory.
+from . import param_cache # recording which params give valid maps.
+from . import reachability # finding which cells can be walked to.
+from . import room_graph # choosing which rooms to connect.
 
 
 # --------------------------------------------- FINAL FUNCTION TO CREATE COMPLETE MAP FOR PYGAME ---------------------------------------------- #
 
 
-def create_complete_map(height, width, density, seed, iterations, prob_item, prob_enemy):
+def create_complete_map(height, width, density, seed, iterations, prob_item, prob_enemy, connect_mode="nearest", extra_edges=0, target_path_length=None, param_table=None, quality_bounds=None, quality_downsample=1, max_attempts=100):
     """
     This function creates a complete game map with floors, walls, items, and enemies. 
     Modified forms of Breadth First Search (BFS) are used to classify rooms, connect rooms
@@ -31,6 +44,19 @@ def create_complete_map(height, width, density, seed, iterations, prob_item, pro
         iterations: int, number of iterations over which to apply Cellular Automata (CA) rules.
         prob_item: float, probability of spawning a gold-node
         prob_enemy: float, probability of spawning an enemy. 
+        connect_mode: string, defaults to "nearest" to connect each room to its 3 nearest rooms. "mst" connects
+            every room with a minimum spanning tree (see room_graph.py), so a single pass always gives a valid path.
+        extra_edges: int, defaults to 0, number of extra loops to add to the tree with connect_mode = "mst"
+        target_path_length: int, defaults to None to put spawn and exit in the rooms closest to opposite corners.
+            Otherwise spawn and exit are a connected pair of rooms whose walking distance is closest to this, see find_spawn_exit_pair().
+        param_table: dict from param_cache.load_param_table(), defaults to None. If given, every attempt (including retries)
+            is recorded in it. Use param_cache.suggest_parameters() on it to pick density and iterations before calling this.
+        quality_bounds: dict, defaults to None. If given (e.g. map_quality.DEFAULT_QUALITY_BOUNDS), each map is scored right
+            after CA smoothing with map_quality.score_map_quality(), and maps outside the bounds are retried with new params
+            without running the later stages. The retry raises the density if the map had too much floor, and lowers it
+            if it had too little (see map_quality.get_density_step()).
+        quality_downsample: int, defaults to 1, block size to downsample the map by before scoring it
+        max_attempts: int, defaults to 100, the most sets of params to try before giving up
     
     Returns:
         List, a python list containing the following elements:
@@ -40,42 +66,467 @@ def create_complete_map(height, width, density, seed, iterations, prob_item, pro
             exit_point (idx 2): a List containing [x coord, y coord] of the level exit,
             density (idx 3): int, density of final map,
             seed (idx 4): int, seed used in RNG of final map,
-            iterations (idx 5): final number of iterations used for CA rules
+            iterations (idx 5): final number of iterations used for CA rules,
+            iterations_run (idx 6): int, number of CA steps actually computed before the map stopped changing,
+            room_table (idx 7): np structured array of the map's rooms from create_room_table(),
+            room_labels (idx 8): np matrix, room id + 1 of each cell (0 if not in a room), from before the rooms were connected
         ]
+
+    Note:
+        Every random stage draws from its own np.random.Generator, spawned from the seed by spawn_map_rngs(),
+        so maps don't share numpy's global random state and can be made at the same time in threads or processes.
     """
-    # get base noise grid as starting point
-    grid = create_noise_grid(height, width, density, seed)
+    for attempt in range(max_attempts):
+        start_time = time.perf_counter()
+
+        # get separate random number generators for each stage of this map
+        rngs = spawn_map_rngs(seed)
+
+        # get base noise grid as starting point
+        grid = create_noise_grid(height, width, density, seed, rng = rngs["noise"])
+
+        # smooth map with cellular automata, keeping track of how many iterations were needed
+        new_map, iterations_run, cycle_length = create_map_with_ca(grid, iterations, return_info = True)
+
+        # skip the expensive stages for maps that can't turn out well, otherwise find rooms, 
+        # connect them, add details, and check for a valid path from spawn to exit
+        density_step = -1
+        scores = map_quality.score_map_quality(new_map, quality_downsample) if quality_bounds is not None else None
+        if scores is not None and not map_quality.check_map_quality(scores, quality_bounds):
+            complete_map = None
+            density_step = map_quality.get_density_step(scores, quality_bounds)
+        else:
+            complete_map = finish_complete_map(new_map, density, seed, iterations, iterations_run, prob_item, prob_enemy, rngs, connect_mode, extra_edges, target_path_length)
+
+        # keep track of how well these params worked
+        if param_table is not None:
+            param_cache.record_generation(
+                param_table, height, width, density, iterations, complete_map is not None,
+                len(complete_map[7]) if complete_map is not None else None, time.perf_counter() - start_time
+            )
+
+        if complete_map is not None:
+            return complete_map
+
+        # if there's no valid path on this set of params, try again w/ new density, seed, and iteration amount
+        # (with connect_mode = "mst" there's always a valid path, so this only happens for "nearest", or rejected maps).
+        # create_complete_map_speculative() tries the same kind of retries in parallel instead of one at a time.
+        density, seed, iterations = density + density_step, seed + 1, max(iterations - 1, 1)
+
+    raise Exception(f"Unable to create map: none of the {max_attempts} sets of params gave a valid map.")
 
-    # smooth map with cellular automata
-    new_map = create_map_with_ca(grid, iterations)
 
-    # find and store the rooms
-    midpoints_dict = get_room_midpoints(find_room_coordinates(new_map, -1, density, seed, animate_flag = False)[0])
-    all_rooms = list(midpoints_dict.values())
+# function for the stages of create_complete_map() that come after CA smoothing
+def finish_complete_map(new_map, density, seed, iterations, iterations_run, prob_item, prob_enemy, rngs, connect_mode="nearest", extra_edges=0, target_path_length=None, diamonds=True):
+    """
+    This function takes a map that has been smoothed with CA, then classifies and connects its rooms,
+    adds items and enemies, and picks the spawn and level exit points. 
+
+    Args:
+        new_map: np matrix, the map after create_map_with_ca() (rooms are connected in place)
+        density: int, density used for the noise grid
+        seed: int, seed used for the noise grid
+        iterations: int, number of CA iterations asked for
+        iterations_run: int, number of CA iterations actually computed
+        prob_item: float, probability of spawning a gold-node
+        prob_enemy: float, probability of spawning an enemy. 
+        rngs: dict of np.random.Generators from spawn_map_rngs()
+        connect_mode: string, defaults to "nearest", also accepts "mst", see create_complete_map()
+        extra_edges: int, defaults to 0, number of extra loops with connect_mode = "mst"
+        target_path_length: int, defaults to None, see create_complete_map()
+        diamonds: bool, defaults to True, set to False to skip placing diamonds, see add_detail()
+    
+    Returns:
+        List, in the same format as create_complete_map(), or None if there's no valid path from spawn to exit.
+    
+    Note:
+        With connect_mode = "mst", the paths connect every room midpoint (including spawn and exit) side to side,
+        and gold-nodes / diamonds aren't placed on them, so the path check can't fail.
+    """
+    # find and store the rooms, along with which room each cell is in
+    room_table, room_labels = create_room_table(new_map)
 
-    # connect the rooms on the map
-    connect_map(new_map, all_rooms, 3, -1, density, seed, animate_flag = False)
+    # connect the rooms on the map, keeping track of the path cells in "mst" mode so they stay clear
+    carved = np.zeros(shape = new_map.shape, dtype = bool) if connect_mode == "mst" else None
+    connect_map(new_map, room_table, 3, -1, density, seed, animate_flag = False, rng = rngs["connect"], connect_mode = connect_mode, extra_edges = extra_edges, carved = carved)
 
     # add items and enemies to map
-    modified_map = add_detail(new_map, prob_item, prob_enemy, 0, density, seed, animate_flag=False)
+    modified_map = add_detail(new_map, prob_item, prob_enemy, 0, density, seed, animate_flag=False, rng = rngs["detail"], protected = carved, diamonds = diamonds)
 
     # find and add spawn and exit point
-    spawn_point = find_specific_room(all_rooms, 35, new_map.shape, "high", "low")
-    exit_point = find_specific_room(all_rooms, 35, new_map.shape, "low", "high")
+    if target_path_length is None:
+        spawn_point = find_specific_room(room_table, 35, new_map.shape, "high", "low")
+        exit_point = find_specific_room(room_table, 35, new_map.shape, "low", "high")
 
-    # check if valid path from spawn to level exit using BFS
-    valid_points = verify_path(modified_map[0], [spawn_point[0], spawn_point[1]], [exit_point[0], exit_point[1]])
+        # check if valid path from spawn to level exit
+        valid_points = verify_path(modified_map[0], [spawn_point[0], spawn_point[1]], [exit_point[0], exit_point[1]])
 
-    # if there's no valid path on this set of params, recursively call w/ new density, seed, and iteration amount
-    if valid_points == False:
-        return create_complete_map(height, width, density - 1, seed + 1, iterations - 1, prob_item, prob_enemy)
+        if valid_points == False:
+            return None
+    else:
+        # the pair comes from a distance field, so it's always connected if one is found
+        spawn_exit = find_spawn_exit_pair(modified_map[0], room_table, 35, target_path_length)
+
+        if spawn_exit is None:
+            return None
+        spawn_point, exit_point = spawn_exit[0], spawn_exit[1]
 
     # once we are sure there's a valid path, set the states for spawn and exit point on the map
     modified_map[0][spawn_point[0], spawn_point[1]] = 69
     modified_map[0][exit_point[0], exit_point[1]] = 400
 
     # return map and other info. for PyGame
-    return [modified_map[0], [spawn_point[0], spawn_point[1]], [exit_point[0], exit_point[1]], density, seed, iterations]
+    return [modified_map[0], [spawn_point[0], spawn_point[1]], [exit_point[0], exit_point[1]], density, seed, iterations, iterations_run, room_table, room_labels]
+
+
+# function to create many complete maps at once
+def create_complete_maps_batch(height, width, densities, seeds, iterations, prob_item, prob_enemy, connect_mode="nearest", extra_edges=0, target_path_length=None, param_table=None, quality_bounds=None, quality_downsample=1):
+    """
+    This function creates a complete map for each (density, seed) pair, giving the same results as
+    calling create_complete_map() on each one separately. The noise grids are stacked into one
+    (batch, height, width) array, and the whole-map stages run over every map at once with array 
+    operations, instead of paying Python overhead per map:
+        1. CA smoothing runs on the whole stack.
+        2. After the rooms are connected, the neighbor counts that decide where details go are counted for the whole stack.
+        3. The paths from spawn to exit are checked for every map with one labeling of the stack.
+
+    Args:
+        height: int, the height of the desired maps
+        width: int, the width of the desired maps
+        densities: list of ints, between 0 - 100, the density for each map
+        seeds: list of ints, the seed for each map
+        iterations: int, number of iterations over which to apply Cellular Automata (CA) rules.
+        prob_item: float, probability of spawning a gold-node
+        prob_enemy: float, probability of spawning an enemy. 
+        connect_mode: string, defaults to "nearest", also accepts "mst", see create_complete_map()
+        extra_edges: int, defaults to 0, number of extra loops with connect_mode = "mst"
+        target_path_length: int, defaults to None, see create_complete_map()
+        param_table, quality_bounds, quality_downsample: defaults to None, None and 1, see create_complete_map().
+            Maps in the batch are recorded in param_table without times, since they're made together.
+    
+    Returns:
+        List, with one element per seed in the same format that create_complete_map() returns.
+    
+    Note:
+        Each map gets its own random number generators from spawn_map_rngs(), so making the
+        maps together doesn't change what any of them look like. That's also why some stages still 
+        run one map at a time: finding and connecting rooms depends on each map's own rooms, and the 
+        random draws for details and paths have to come from each map's own generators, in order.
+        Spawn / exit pairs picked by walking distance (target_path_length) come from each map's own 
+        distance field, so they're found one map at a time too. Maps that aren't valid are retried 
+        one at a time with create_complete_map().
+    """
+    if len(densities) != len(seeds):
+        raise Exception("Unable to create batch: densities and seeds need to be the same length.")
+
+    # make each noise grid into one stack, keeping each map's generators for its later stages
+    noise_grids = np.empty(shape = (len(seeds), height, width), dtype = int)
+    all_rngs = []
+    for i in range(len(seeds)):
+        all_rngs.append(spawn_map_rngs(seeds[i]))
+        noise_grids[i] = create_noise_grid(height, width, densities[i], seeds[i], rng = all_rngs[i]["noise"])
+
+    # smooth every map at once, each map keeps track of its own iterations
+    new_maps, iterations_run, cycle_lengths = create_map_with_ca(noise_grids, iterations, return_info = True)
+
+    # reject maps that can't turn out well, and move their retry's density the same way create_complete_map() would
+    density_steps = [-1] * len(seeds)
+    valid = [True] * len(seeds)
+    if quality_bounds is not None:
+        for i in range(len(seeds)):
+            scores = map_quality.score_map_quality(new_maps[i], quality_downsample)
+            if not map_quality.check_map_quality(scores, quality_bounds):
+                valid[i] = False
+                density_steps[i] = map_quality.get_density_step(scores, quality_bounds)
+
+    # find and connect each map's rooms (paths are carved into the stack in place)
+    room_tables = [None] * len(seeds)
+    room_labels = [None] * len(seeds)
+    carved = np.zeros(shape = new_maps.shape, dtype = bool) if connect_mode == "mst" else None
+    for i in range(len(seeds)):
+        if valid[i]:
+            room_tables[i], room_labels[i] = create_room_table(new_maps[i])
+            connect_map(
+                new_maps[i], room_tables[i], 3, -1, densities[i], seeds[i], animate_flag = False, rng = all_rngs[i]["connect"],
+                connect_mode = connect_mode, extra_edges = extra_edges, carved = carved[i] if carved is not None else None
+            )
+
+    # count neighboring walls for every connected map at once, then add each map's items and enemies from its own generator
+    wall_counts = count_neighboring_walls(new_maps)
+    detailed_maps = list(new_maps)
+    spawn_points = np.zeros(shape = (len(seeds), 2), dtype = np.int64)
+    exit_points = np.zeros(shape = (len(seeds), 2), dtype = np.int64)
+    for i in range(len(seeds)):
+        if not valid[i]:
+            continue
+        detailed_maps[i] = add_detail(
+            new_maps[i], prob_item, prob_enemy, 0, densities[i], seeds[i], animate_flag = False, rng = all_rngs[i]["detail"],
+            wall_counts = wall_counts[i], protected = carved[i] if carved is not None else None
+        )[0]
+
+        # find spawn and exit, either in the rooms closest to opposite corners, or by walking distance
+        if target_path_length is None:
+            spawn_points[i] = find_specific_room(room_tables[i], 35, (height, width), "high", "low")[:2]
+            exit_points[i] = find_specific_room(room_tables[i], 35, (height, width), "low", "high")[:2]
+        else:
+            spawn_exit = find_spawn_exit_pair(detailed_maps[i], room_tables[i], 35, target_path_length)
+            if spawn_exit is None:
+                valid[i] = False
+            else:
+                spawn_points[i], exit_points[i] = spawn_exit[0], spawn_exit[1]
+
+    # check the path from spawn to exit on every map at once (pairs from a distance field are always connected)
+    if target_path_length is None:
+        reachable = reachability.find_reachable_pairs(np.stack(detailed_maps), spawn_points, exit_points)
+        valid = [v and bool(r) for v, r in zip(valid, reachable)]
+
+    # finish each map, falling back to the same retry as create_complete_map() if it's not valid
+    complete_maps = []
+    for i in range(len(seeds)):
+        if param_table is not None:
+            param_cache.record_generation(param_table, height, width, densities[i], iterations, valid[i], len(room_tables[i]) if valid[i] else None)
+
+        if not valid[i]:
+            complete_maps.append(create_complete_map(
+                height, width, densities[i] + density_steps[i], seeds[i] + 1, max(iterations - 1, 1), prob_item, prob_enemy,
+                connect_mode, extra_edges, target_path_length, param_table, quality_bounds, quality_downsample
+            ))
+            continue
+
+        spawn_point = spawn_points[i].tolist()
+        exit_point = exit_points[i].tolist()
+        detailed_maps[i][spawn_point[0], spawn_point[1]] = 69
+        detailed_maps[i][exit_point[0], exit_point[1]] = 400
+        complete_maps.append([detailed_maps[i], spawn_point, exit_point, densities[i], seeds[i], iterations, int(iterations_run[i]), room_tables[i], room_labels[i]])
+
+    return complete_maps
+
+
+# function to make a single attempt at a complete map, without any retries
+def try_complete_map(height, width, density, seed, iterations, prob_item, prob_enemy, connect_mode="nearest", extra_edges=0, target_path_length=None, quality_bounds=None, quality_downsample=1):
+    """
+    This function runs every stage of create_complete_map() once, for one set of params. Instead of retrying
+    with new params, it just reports whether the map can be played. It's a module level function so it can be
+    sent to worker processes.
+
+    Args:
+        same as create_complete_map()
+    
+    Returns:
+        List, in the same format as create_complete_map(), or None if the map isn't valid: there's no path
+        from spawn to exit, spawn and exit are the same cell, there aren't enough rooms to make the map at all,
+        or (with quality_bounds) the smoothed map's scores are out of bounds.
+    """
+    rngs = spawn_map_rngs(seed)
+    grid = create_noise_grid(height, width, density, seed, rng = rngs["noise"])
+    new_map, iterations_run, cycle_length = create_map_with_ca(grid, iterations, return_info = True)
+
+    if quality_bounds is not None and not map_quality.check_map_quality(map_quality.score_map_quality(new_map, quality_downsample), quality_bounds):
+        return None
+
+    # maps that are too sparse or too dense can fail to find or connect rooms
+    try:
+        complete_map = finish_complete_map(new_map, density, seed, iterations, iterations_run, prob_item, prob_enemy, rngs, connect_mode, extra_edges, target_path_length)
+    except Exception:
+        return None
+
+    if complete_map is None or complete_map[1] == complete_map[2]:
+        return None
+    return complete_map
+
+
+# function to shut down a process pool without waiting for its running tasks
+def terminate_executor(executor):
+    """
+    This function cancels every task in a process pool that hasn't started, and terminates its worker
+    processes, stopping the tasks that are running instead of waiting for them to finish. Before python 3.14
+    that relies on a private attribute of the pool; if it's missing, running tasks finish in the background.
+
+    Args:
+        executor: concurrent.futures.ProcessPoolExecutor, the pool to shut down (it can't be used afterwards)
+    
+    Returns:
+        None
+    """
+    # python 3.14 and later can do this directly
+    if hasattr(executor, "terminate_workers"):
+        executor.terminate_workers()
+        return
+
+    # older versions have no public way to stop a running task. The worker processes are only listed in the
+    # private _processes dict, so read it (if it's there) before the shutdown below starts clearing it out
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+
+    # cancel everything that hasn't started, and stop the pool from taking new work
+    executor.shutdown(wait = False, cancel_futures = True)
+
+    # then stop the tasks that are already running (without the private dict, they finish in the background)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+# function to try several sets of params at once in worker processes, keeping the first valid map
+def create_complete_map_speculative(height, width, density, seed, iterations, prob_item, prob_enemy, connect_mode="nearest", extra_edges=0, target_path_length=None, density_step=-1, num_workers=None, max_candidates=64, executor=None, param_table=None, quality_bounds=None, quality_downsample=1):
+    """
+    This function makes the same kind of map as create_complete_map(), but instead of trying one set of params
+    after another until one works, it tries num_workers sets of params at the same time in a process pool. 
+    Candidate k uses density + k * density_step, seed + k and iterations - k (at least 1), so with the default
+    density_step = -1, candidate k is the k-th retry that create_complete_map() would have made.
+
+    Args:
+        height, width, density, seed, iterations, prob_item, prob_enemy, connect_mode, extra_edges, target_path_length: 
+            same as create_complete_map(), for candidate 0
+        density_step: int, defaults to -1, how much density changes from one candidate to the next 
+            (e.g. +1 to make denser maps when they're coming out too sparse for separate spawn and exit rooms)
+        num_workers: int, defaults to None for one worker per CPU, number of candidates to make at the same time
+        max_candidates: int, defaults to 64, the most candidates to try before giving up
+        executor: concurrent.futures.Executor, defaults to None to start a process pool just for this call.
+            Passing one in (and reusing it for every level) saves starting new processes each time, but
+            candidates that are already running in it can't be stopped (see the note).
+        param_table: dict from param_cache.load_param_table(), defaults to None. If given, every candidate up to
+            the one returned is recorded in it (without times, since they ran in other processes).
+        quality_bounds, quality_downsample: defaults to None and 1, see create_complete_map()
+    
+    Returns:
+        List, in the same format as create_complete_map(), from the valid candidate with the lowest index
+    
+    Note:
+        Results are checked in candidate order, and a candidate is only returned once every candidate before 
+        it is known to be invalid. So the same params always give the same map, no matter how many workers
+        there are or which worker finishes first. Once a valid map is found, candidates that haven't started
+        are cancelled. If the pool was started for this call, its worker processes are then terminated, so
+        candidates that are still running stop right away. In a pool that was passed in, running candidates
+        finish in the background and their results are ignored, since the pool might be shared.
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, num_workers)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers = num_workers)
+
+    try:
+        # submit candidates a round at a time, so at most num_workers are waiting to start
+        for first in range(0, max_candidates, num_workers):
+            futures = []
+            for k in range(first, min(first + num_workers, max_candidates)):
+                futures.append(executor.submit(
+                    try_complete_map, height, width, density + k * density_step, seed + k, max(iterations - k, 1),
+                    prob_item, prob_enemy, connect_mode, extra_edges, target_path_length, quality_bounds, quality_downsample
+                ))
+
+            # keep the lowest index valid candidate, and cancel everything after it
+            for i, future in enumerate(futures):
+                complete_map = future.result()
+
+                if param_table is not None:
+                    k = first + i
+                    param_cache.record_generation(
+                        param_table, height, width, density + k * density_step, max(iterations - k, 1), complete_map is not None,
+                        len(complete_map[7]) if complete_map is not None else None
+                    )
+
+                if complete_map is not None:
+                    for later in futures[i + 1:]:
+                        later.cancel()
+                    return complete_map
+
+    finally:
+        if own_executor:
+            terminate_executor(executor)
+
+    raise Exception(f"Unable to create map: none of the {max_candidates} candidates had a valid path from spawn to exit.")
+
+
+# function to make a complete map within a time budget
+def create_complete_map_with_deadline(height, width, density, seed, iterations, prob_item, prob_enemy, deadline, connect_mode="mst", extra_edges=0, engines=("numpy", "bitboard"), finish_cell_time=5e-7):
+    """
+    This function makes a complete map like create_complete_map(), but fits the work into deadline seconds,
+    cutting corners (and saying so) instead of running over. It returns the first valid map it makes:
+        1. On the first attempt, one CA step is timed with each engine in engines, and the fastest one is used from then on.
+        2. The CA runs every iteration (or until the map stops changing). Cutting it short doesn't save time: a map
+           that hasn't settled has more, smaller rooms, and the later stages slow down by more than the CA saves.
+        3. If the time left after smoothing looks too short for the later stages (rooms, paths, details), the
+           optional passes are skipped: the extra loop edges between rooms, and diamond placement.
+        4. If a map isn't valid (no valid path, spawn and exit in the same cell, or not enough rooms to make the
+           map at all), it's retried with a new seed while there's time, moving the density the way
+           map_quality.get_density_step() suggests. Once time runs out, the rooms of the last smoothed map are
+           connected with a spanning tree instead, which always gives a valid path if the map has rooms big enough
+           for spawn and exit.
+
+    Args:
+        height, width, density, seed, iterations, prob_item, prob_enemy, extra_edges: same as create_complete_map()
+        deadline: float, time budget in seconds for the whole map
+        connect_mode: string, defaults to "mst" (which never needs a retry), also accepts "nearest"
+        engines: tuple of CA engine names to time and choose from, see create_map_with_ca()
+        finish_cell_time: float, defaults to 5e-7, seconds per cell the later stages are estimated to take on the first
+            attempt (they measure about 2e-7 - 5e-7 on settled maps from 100 x 100 up to 1000 x 1000). Retries use the
+            time the first attempt's later stages actually took instead.
+    
+    Returns:
+        List, in the same format as create_complete_map(), with one more element:
+            degraded (idx 9): bool, True if any corner was cut: skipped extra edges or diamonds, or the spanning tree fallback
+        or None if time ran out and the spanning tree fallback couldn't make a valid map either.
+    
+    Note:
+        The deadline is a target, not a hard limit: a map that was started is always finished.
+    """
+    start_time = time.perf_counter()
+    finish_time = finish_cell_time * height * width
+    engine = None
+
+    def time_left():
+        return deadline - (time.perf_counter() - start_time)
+
+    while True:
+        rngs = spawn_map_rngs(seed)
+        grid = create_noise_grid(height, width, density, seed, rng = rngs["noise"])
+
+        # on the first attempt, time one CA step with each engine and keep going from the fastest one's result
+        if engine is None:
+            step_times = {}
+            for option in engines:
+                step_start = time.perf_counter()
+                stepped = create_map_with_ca(grid, 1, engine = option)
+                step_times[option] = time.perf_counter() - step_start
+                if step_times[option] == min(step_times.values()):
+                    first_step = stepped
+            engine = min(step_times, key = step_times.get)
+            new_map, iterations_run, cycle_length = create_map_with_ca(first_step, iterations - 1, engine = engine, return_info = True)
+            iterations_run += 1
+        else:
+            new_map, iterations_run, cycle_length = create_map_with_ca(grid, iterations, engine = engine, return_info = True)
+
+        # skip the optional passes if the later stages might not fit
+        optional_passes = time_left() >= finish_time
+
+        smoothed_map = new_map.copy()
+        finish_start = time.perf_counter()
+        try:
+            complete_map = finish_complete_map(new_map, density, seed, iterations, iterations_run, prob_item, prob_enemy, rngs, connect_mode, extra_edges if optional_passes else 0, diamonds = optional_passes)
+        except Exception:
+            complete_map = None
+        finish_time = time.perf_counter() - finish_start
+
+        if complete_map is not None and complete_map[1] != complete_map[2]:
+            return complete_map + [not optional_passes]
+
+        # not valid: retry with new params if there's time, otherwise fall back to a spanning tree
+        if time_left() <= 0:
+            try:
+                complete_map = finish_complete_map(smoothed_map, density, seed, iterations, iterations_run, prob_item, prob_enemy, rngs, "mst", 0, diamonds = False)
+            except Exception:
+                complete_map = None
+
+            if complete_map is None or complete_map[1] == complete_map[2]:
+                return None
+            return complete_map + [True]
+
+        density_step = map_quality.get_density_step(map_quality.score_map_quality(smoothed_map))
+        density, seed, iterations = density + density_step, seed + 1, max(iterations - 1, 1)
 
 
 # ------------------------------------------ GRID AND MAP CREATION FUNCTIONS, WITH CELLULAR AUTOMATA ------------------------------------------ #
@@ -95,8 +546,31 @@ def create_blank_grid(num_rows, num_cols):
     return np.zeros(shape=(num_rows, num_cols), dtype = float)
 
 
+# function to create independent random number generators for each stage of a map
+def spawn_map_rngs(seed):
+    """
+    This function spawns one np.random.Generator per random stage of map creation from a
+    SeedSequence. The streams are independent of each other and of numpy's global random state,
+    so the same seed always gives the same map, no matter what was generated before or alongside it.
+
+    Args:
+        seed: int or np.random.SeedSequence. To give parallel workers their own streams, 
+            pass each one a child from np.random.SeedSequence(seed).spawn(num_workers).
+    
+    Returns:
+        dict of np.random.Generators, with keys "noise", "connect", and "detail"
+    """
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    noise_seq, connect_seq, detail_seq = seed_sequence.spawn(3)
+    return {
+        "noise": np.random.default_rng(noise_seq),
+        "connect": np.random.default_rng(connect_seq),
+        "detail": np.random.default_rng(detail_seq),
+    }
+
+
 # function to create a random noise grid that the CA will use to make a map
-def create_noise_grid(num_rows, num_cols, desired_density, rng_seed):
+def create_noise_grid(num_rows, num_cols, desired_density, rng_seed, rng=None):
     """
     This function makes a random noise grid with the specified
     dimensions and density of black pixels / walls. 
@@ -107,6 +581,7 @@ def create_noise_grid(num_rows, num_cols, desired_density, rng_seed):
         desired_density: int, a number between 0 - 100, how densely
             filled with walls the map should be. E.g., 50 would result in 50% black, 50% white pixels.
         rng_seed: int, controls random number generation.
+        rng: np.random.Generator, defaults to None to seed and use numpy's global random state with rng_seed.
     
     Returns:
         np matrix randomly populated w/ 0s and 1s according to parameters.
@@ -122,6 +597,10 @@ def create_noise_grid(num_rows, num_cols, desired_density, rng_seed):
     prob_one = desired_density / 100
     prob_zero = 1 - prob_one
 
+    # a generator that was passed in has its own state, so there's nothing global to seed
+    if rng is not None:
+        return rng.choice([0, 1], size=(num_rows, num_cols), p = [prob_zero, prob_one])
+
     # set seed for random number generation
     np.random.seed(rng_seed)
 
@@ -175,11 +654,369 @@ def in_bounds(row, col, shape):
         return True
 
 
+# function to count the walls in every cell's Moore neighborhood at once
+def count_neighboring_walls(grid):
+    """
+    This function counts the number of neighboring walls for every cell in the grid
+    at the same time, using whole-array operations instead of looping over each cell.
+    It follows the same rules as the loop in create_map_with_ca_loop(): only cells equal 
+    to 1 are walls, the cell itself is not counted, and out of bounds cells count as walls.
+
+    Args:
+        grid: np matrix, with 0s / 1s to represent floors / walls. A stack of maps with shape 
+            (batch, num_rows, num_cols) also works, each map is counted separately.
+    
+    Returns:
+        np matrix (uint8) with the same shape as grid, where each cell holds its number of neighboring walls (0 - 8).
+    
+    Note:
+        We pad the wall mask with a border of walls (True), then add up the 8 shifted
+        views of the padded matrix. Each view lines up one neighbor direction with every cell.
+    """
+    num_rows = grid.shape[-2]
+    num_cols = grid.shape[-1]
+
+    # pad the last two axes with walls so out of bounds neighbors are counted automatically
+    pad_width = [(0, 0)] * (grid.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(grid == 1, pad_width, mode = "constant", constant_values = True)
+    counts = np.zeros(shape = grid.shape, dtype = np.uint8)
+
+    # add the shifted view for each of the 8 neighbor directions (skip the center)
+    for row_offset in range(3):
+        for col_offset in range(3):
+            if row_offset == 1 and col_offset == 1:
+                continue
+            counts += padded[..., row_offset:row_offset + num_rows, col_offset:col_offset + num_cols]
+
+    return counts
+
+
+# function to run CA steps, stopping early once the grid stops changing or starts repeating
+def run_ca_iterations(state, ca_step, num_iterations, stop_early=True, max_cycle_length=2):
+    """
+    This function applies a CA step function over a number of iterations. If stop_early is set, 
+    it keeps a hash of the last few states, and stops as soon as the grid is stable (a fixed point) 
+    or repeats a short cycle. Since the rest of the iterations would just repeat that cycle, we can 
+    pick out the exact state the full number of iterations would have ended on.
+
+    Args:
+        state: np matrix, the starting state (a dense grid or packed bitboard rows)
+        ca_step: function, takes a state and returns the next state as a new array
+        num_iterations: int, the max number of iterations to run
+        stop_early: bool, defaults to True, whether to check for stable grids and cycles
+        max_cycle_length: int, defaults to 2, longest cycle to look for (1 only checks for stable grids). 
+            This many recent states are kept in memory.
+    
+    Returns:
+        List: with elements [
+            np matrix (idx 0): the state after num_iterations,
+            iterations_run (idx 1): int, number of CA steps actually computed,
+            cycle_length (idx 2): int, 0 if all iterations ran, 1 if a stable grid was found, else the cycle length
+        ]
+    """
+    # recent states and their hashes, the most recent at the end
+    recent_states = [state]
+    recent_hashes = [hash_state(state)] if stop_early else []
+
+    for i in range(1, num_iterations + 1):
+
+        print(f"Starting iteration {i}...")
+        state = ca_step(state)
+
+        if not stop_early:
+            continue
+
+        # compare against recent states, checking the hash first and the full grid only if it matches
+        state_hash = hash_state(state)
+        for cycle_length in range(1, len(recent_states) + 1):
+            if recent_hashes[-cycle_length] == state_hash and np.array_equal(recent_states[-cycle_length], state):
+
+                # the states now repeat every cycle_length steps, so find where the last iteration lands
+                remaining = (num_iterations - i) % cycle_length
+                if remaining > 0:
+                    state = recent_states[-cycle_length + remaining]
+                return [state, i, cycle_length]
+
+        recent_states.append(state)
+        recent_hashes.append(state_hash)
+        if len(recent_states) > max_cycle_length:
+            recent_states.pop(0)
+            recent_hashes.pop(0)
+
+    return [state, num_iterations, 0]
+
+
+# function to run CA steps over a stack of maps, stopping each map early on its own
+def run_ca_iterations_batch(states, ca_step, num_iterations, stop_early=True, max_cycle_length=2):
+    """
+    This function is the batch version of run_ca_iterations(), for a stack of maps with shape 
+    (batch, num_rows, num_cols). Each map is checked for a stable grid or a cycle separately,
+    and once a map is done it is dropped from the stack, so every map gets the same result and
+    the same iteration count as running it alone.
+
+    Args:
+        states: np matrix, the stack of starting states
+        ca_step: function, takes a stack of states and returns the next states as a new array
+        num_iterations: int, the max number of iterations to run
+        stop_early: bool, defaults to True, whether to check for stable grids and cycles
+        max_cycle_length: int, defaults to 2, longest cycle to look for.
+    
+    Returns:
+        List: with elements [
+            np matrix (idx 0): the stack of states after num_iterations,
+            iterations_run (idx 1): np array, number of CA steps actually computed for each map,
+            cycle_length (idx 2): np array, the cycle length found for each map (0 if all iterations ran)
+        ]
+    """
+    num_maps = states.shape[0]
+    final_states = None
+    iterations_run = np.full(num_maps, num_iterations)
+    cycle_lengths = np.zeros(num_maps, dtype = int)
+
+    # which maps are still running, and their recent states / hashes (most recent at the end)
+    active = np.arange(num_maps)
+    recent_states = [states]
+    recent_hashes = [[hash_state(state) for state in states]] if stop_early else []
+
+    for i in range(1, num_iterations + 1):
+
+        if active.size == 0:
+            break
+
+        print(f"Starting iteration {i}... ({active.size} maps)")
+        states = ca_step(states)
+        if final_states is None:
+            final_states = np.empty(shape = (num_maps,) + states.shape[1:], dtype = states.dtype)
+
+        if not stop_early:
+            continue
+
+        # check each map against its own recent states
+        state_hashes = [hash_state(state) for state in states]
+        done = np.zeros(active.size, dtype = bool)
+        for j in range(active.size):
+            for cycle_length in range(1, len(recent_states) + 1):
+                if recent_hashes[-cycle_length][j] == state_hashes[j] and np.array_equal(recent_states[-cycle_length][j], states[j]):
+                    remaining = (num_iterations - i) % cycle_length
+                    final_states[active[j]] = recent_states[-cycle_length + remaining][j] if remaining > 0 else states[j]
+                    iterations_run[active[j]] = i
+                    cycle_lengths[active[j]] = cycle_length
+                    done[j] = True
+                    break
+
+        # keep going with only the maps that aren't done
+        recent_states.append(states)
+        recent_hashes.append(state_hashes)
+        if len(recent_states) > max_cycle_length:
+            recent_states.pop(0)
+            recent_hashes.pop(0)
+
+        if done.any():
+            keep = ~done
+            active = active[keep]
+            states = states[keep]
+            recent_states = [s[keep] for s in recent_states]
+            recent_hashes = [[h for h, k in zip(hashes, keep) if k] for hashes in recent_hashes]
+
+    # with no iterations the stack comes back as it was
+    if final_states is None:
+        return [states, iterations_run, cycle_lengths]
+
+    final_states[active] = states
+    return [final_states, iterations_run, cycle_lengths]
+
+
+# helper function to hash a grid state for cycle detection
+def hash_state(state):
+    """
+    This function creates a short hash of a grid state's contents.
+
+    Args:
+        state: np matrix to hash
+    
+    Returns:
+        bytes, the hash digest
+    """
+    return hashlib.blake2b(np.ascontiguousarray(state), digest_size = 16).digest()
+
+
 # function to use Cellular Automata to make our matrix more map like
-def create_map_with_ca(starting_grid, num_iterations):
+def create_map_with_ca(starting_grid, num_iterations, engine="numpy", rule=ca_rules.DEFAULT_RULE, stop_early=True, max_cycle_length=2, return_info=False, num_workers=None, downsample=1, refine_iterations=2):
+    """
+    This function uses Cellular Atomata (CA) rules to create a
+    more natural looking game map. By default a cell becomes a wall if more than 4 of its
+    neighbors are walls, otherwise it becomes a floor (B5678/S5678 in B/S notation).
+
+    Cave rules usually settle after 5 - 8 steps, so by default the iterations stop early
+    once the grid is stable or repeating (see run_ca_iterations()). The result is still 
+    exactly what running all num_iterations would give.
+
+    Args:
+        starting_grid: np matrix, with 0s / 1s to represent floors / walls. With the "numpy" engine
+            this can also be a (batch, rows, cols) stack of maps, see create_complete_maps_batch().
+        num_iterations: int, how many time steps over which to apply the CA rules.
+        engine: string, defaults to "numpy" which updates the whole grid with array operations, 
+            "bitboard" packs the walls 64 cells per word (see bitboard.py) for very large maps, 
+            "frontier" only recomputes cells next to last step's changes (see frontier_ca.py), 
+            best for large maps that are mostly settled, 
+            "parallel" splits the rows into bands across worker processes (see parallel_ca.py), for 8k x 8k maps and up,
+            "loop" uses the original cell by cell loop (much slower, kept for reference, never stops early).
+        rule: string in B/S notation (see ca_rules.py) or a table from ca_rules.compile_rule(),
+            defaults to the original map rule.
+        stop_early: bool, defaults to True, whether to stop once the grid is stable or cycling.
+        max_cycle_length: int, defaults to 2, the longest cycle to check for when stopping early.
+        return_info: bool, defaults to False, set to True to also get how many iterations actually ran.
+        num_workers: int, defaults to None (one per cpu core), number of processes for the "parallel" engine.
+        downsample: int, defaults to 1. With 2 or 4, most iterations run on a grid downsampled by that much,
+            see create_map_with_ca_multires(). The caves come out with fewer, bigger rooms than running every iteration at full size.
+        refine_iterations: int, defaults to 2, number of full size iterations at the end when downsample > 1.
+    
+    Returns:
+        modified_grid, np matrix with cells changed after CA rules applied over iterations.
+        
+        If return_info is True, a List instead: [
+            modified_grid (idx 0),
+            iterations_run (idx 1): int, number of CA steps actually computed,
+            cycle_length (idx 2): int, 0 if all iterations ran, 1 if the grid became stable, else the cycle length
+        ]
+        For a stack of maps, iterations_run and cycle_length are np arrays with one value per map.
+    """
+    if downsample > 1:
+        ca_results = create_map_with_ca_multires(starting_grid, num_iterations, downsample, refine_iterations, engine, rule, stop_early, max_cycle_length, num_workers)
+        return ca_results if return_info else ca_results[0]
+
+    # compile the rule once (cached for rule strings), so each step is a single table lookup
+    lut = ca_rules.compile_rule(rule)
+
+    if starting_grid.ndim == 3 and engine != "numpy":
+        raise Exception("Only the 'numpy' CA engine supports a (batch, rows, cols) stack of maps.")
+
+    if engine == "loop":
+        if not np.array_equal(lut, ca_rules.compile_rule(ca_rules.DEFAULT_RULE)):
+            raise Exception("The 'loop' CA engine only supports the default rule, try engine = 'numpy'.")
+        ca_results = [create_map_with_ca_loop(starting_grid, num_iterations), num_iterations, 0]
+    elif engine == "bitboard":
+        ca_results = create_map_with_ca_bitboard(starting_grid, num_iterations, lut, stop_early, max_cycle_length)
+    elif engine == "frontier":
+        ca_results = frontier_ca.create_map_with_ca_frontier(starting_grid, num_iterations, lut)
+    elif engine == "parallel":
+        ca_results = parallel_ca.create_map_with_ca_parallel(starting_grid, num_iterations, lut, num_workers)
+    elif engine == "numpy":
+
+        # count neighboring walls for every cell, then apply CA rule to the whole grid at once
+        def ca_step(grid):
+            return ca_rules.apply_rule(grid, count_neighboring_walls(grid), lut)
+
+        # a (batch, rows, cols) stack of maps is smoothed all at once, each map stopping on its own
+        if starting_grid.ndim == 3:
+            ca_results = run_ca_iterations_batch(starting_grid, ca_step, num_iterations, stop_early, max_cycle_length)
+        else:
+            ca_results = run_ca_iterations(starting_grid, ca_step, num_iterations, stop_early, max_cycle_length)
+
+        # convert back to the starting grid's dtype (this also makes a copy if no iterations ran)
+        ca_results[0] = ca_results[0].astype(starting_grid.dtype)
+    else:
+        raise Exception(f"Unknown CA engine: {engine}. Try 'numpy', 'bitboard', 'frontier', 'parallel' or 'loop'.")
+
+    if return_info:
+        return ca_results
+    return ca_results[0]
+
+
+# coarse to fine version of the CA, for large maps
+def create_map_with_ca_multires(starting_grid, num_iterations, downsample=2, refine_iterations=2, engine="numpy", rule=ca_rules.DEFAULT_RULE, stop_early=True, max_cycle_length=2, num_workers=None):
+    """
+    This function settles the large scale shape of the caves on a smaller grid, then smooths it out at full size:
+        1. Every downsample-th cell of the noise (in both directions) makes a grid with downsample^2 times fewer cells,
+           with the same density, and all but refine_iterations iterations run on it.
+        2. Each coarse cell is repeated into a downsample x downsample block.
+        3. refine_iterations iterations run at full size on those blocks, rounding off their corners.
+
+    Args:
+        starting_grid: np matrix, with 0s / 1s to represent floors / walls (or a stack of them with the "numpy" engine)
+        num_iterations: int, total number of iterations (coarse + refine)
+        downsample: int, defaults to 2, how much smaller the coarse grid is along each side
+        refine_iterations: int, defaults to 2, number of the iterations to run at full size
+        engine, rule, stop_early, max_cycle_length, num_workers: see create_map_with_ca()
+
+    Returns:
+        List: with elements [
+            modified_grid (idx 0): np matrix, same shape and dtype as starting_grid,
+            iterations_run (idx 1): int, number of CA steps actually computed (coarse + full size),
+            cycle_length (idx 2): int, cycle length from the full size iterations, see create_map_with_ca()
+        ]
+
+    Note:
+        This does NOT make the same kind of caves as running every iteration at full size. The floor fraction
+        and the size of the biggest room come out close, but every feature is about downsample times bigger,
+        so there are fewer, bigger rooms and smoother walls (on 1000x1000 maps with downsample=2: about half as
+        many rooms over 35 cells, and half the wall edges). That's why downsample defaults to 1 in
+        create_map_with_ca(). benchmark_multires.py measures the speedup and how close the caves are.
+    """
+    refine_iterations = min(refine_iterations, num_iterations)
+    num_rows = starting_grid.shape[-2]
+    num_cols = starting_grid.shape[-1]
+
+    # run most iterations on every downsample-th cell of the noise
+    coarse_grid = np.ascontiguousarray(starting_grid[..., ::downsample, ::downsample])
+    coarse_grid, coarse_run, coarse_cycle = create_map_with_ca(coarse_grid, num_iterations - refine_iterations, engine, rule, stop_early, max_cycle_length, return_info = True, num_workers = num_workers)
+
+    # blow each coarse cell back up into a block, cropping any blocks past the edge of the map
+    def upsample(coarse):
+        return np.repeat(np.repeat(coarse, downsample, axis = -2), downsample, axis = -1)[..., :num_rows, :num_cols]
+
+    merged = upsample(coarse_grid).astype(starting_grid.dtype)
+
+    # smooth out the blocks with a few full size iterations
+    modified_grid, refine_run, cycle_length = create_map_with_ca(merged, refine_iterations, engine, rule, stop_early, max_cycle_length, return_info = True, num_workers = num_workers)
+    return [modified_grid, coarse_run + refine_run, cycle_length]
+
+
+# bitboard version of the CA, for maps too large to store one number per cell
+def create_map_with_ca_bitboard(starting_grid, num_iterations, rule=ca_rules.DEFAULT_RULE, stop_early=True, max_cycle_length=2):
+    """
+    This function applies the same CA rules as create_map_with_ca(), but on a bit-packed
+    copy of the walls (64 cells per machine word). The result is unpacked back into a 
+    dense grid with the same dtype as starting_grid. Only 2 state (wall / floor) rules are supported.
+
+    Args:
+        starting_grid: np matrix, with 0s / 1s to represent floors / walls.
+        num_iterations: int, how many time steps over which to apply the CA rules.
+        rule: string in B/S notation or a table from ca_rules.compile_rule(), defaults to the original map rule.
+        stop_early: bool, defaults to True, whether to stop once the grid is stable or cycling.
+        max_cycle_length: int, defaults to 2, the longest cycle to check for when stopping early.
+    
+    Returns:
+        List, [modified_grid, iterations_run, cycle_length], see run_ca_iterations()
+    
+    Note:
+        For maps that don't fit in memory as a dense grid, use bitboard.create_packed_noise_grid()
+        and bitboard.bitboard_ca_step() directly, and only unpack the parts that are needed.
+    """
+    # with no iterations, return an unchanged copy like the other engines
+    if num_iterations < 1:
+        return [starting_grid.copy(), 0, 0]
+
+    lut = ca_rules.compile_rule(rule)
+    if not ca_rules.is_two_state(lut):
+        raise Exception("The 'bitboard' CA engine only supports 2 state rules, try engine = 'numpy'.")
+    birth, survive = ca_rules.get_birth_survive_counts(lut)
+
+    num_cols = starting_grid.shape[1]
+
+    def ca_step(packed):
+        return bitboard.bitboard_ca_step(packed, num_cols, birth, survive)
+
+    ca_results = run_ca_iterations(bitboard.pack_grid(starting_grid), ca_step, num_iterations, stop_early, max_cycle_length)
+    ca_results[0] = bitboard.unpack_grid(ca_results[0], num_cols, dtype = starting_grid.dtype)
+    return ca_results
+
+
+# original loop version of the CA, kept for reference and for checking the faster engines
+def create_map_with_ca_loop(starting_grid, num_iterations):
     """
     This function uses Cellular Atomata (CA) rules to create a
-    more natural looking game map. 
+    more natural looking game map, checking each cell's neighbors one at a time.
 
     Args:
         starting_grid: np matrix, with 0s / 1s to represent floors / walls.
@@ -237,7 +1074,7 @@ def create_map_with_ca(starting_grid, num_iterations):
 
 
 # function to add more details to game map, including items and enemies
-def add_detail(starting_grid, prob_item, prob_enemy, animation_index, density, seed, animate_flag=True):
+def add_detail(starting_grid, prob_item, prob_enemy, animation_index, density, seed, animate_flag=True, rng=None, wall_counts=None, protected=None, diamonds=True):
     """
     This function adds detail to our game map, including items and enemies. Currently matrix states
     are represented as: 
@@ -260,6 +1097,13 @@ def add_detail(starting_grid, prob_item, prob_enemy, animation_index, density, s
         density: int, density of map being generated.. only used for plot title if animating
         seed: int, seed for random number generation, only used for plot title if animating
         animate_flag: bool, defaults to True, set to false to avoid full animation. 
+        rng: np.random.Generator, defaults to None to use numpy's global random state.
+        wall_counts: np matrix from count_neighboring_walls(starting_grid), defaults to None to count them here.
+            Pass it in if you already have it for this exact grid, e.g. create_complete_maps_batch() counts every map in
+            the stack in one call. Counts from the last CA step can't be reused, since connect_map() carves paths after it.
+        protected: np matrix of bools, defaults to None, cells set to True never get gold-nodes or diamonds 
+            (which block movement), e.g. the paths between rooms.
+        diamonds: bool, defaults to True, set to False to skip placing diamonds (and their random draws).
     
     Returns:
         List: a list containing the following elements:
@@ -267,87 +1111,60 @@ def add_detail(starting_grid, prob_item, prob_enemy, animation_index, density, s
             temp_grid (idx 0): np matrix with changed cells after item and enemy addition
             animation_index (idx 1): int, returns the animation index after fn is run for future fns that need it.
         ]
+    
+    Note:
+        Every cell's neighbor count comes from starting_grid, before any items are placed, so the counts are worked
+        out once per call and all the candidate cells can be picked at once with one batch of random numbers per kind of detail.
     """
-    # make a copy of the grid that will store our new items and enemies, then get row/col dims
+    # make a copy of the grid that will store our new items and enemies
     temp_grid = starting_grid.copy()
-    table_shape = temp_grid.shape
-    num_rows = table_shape[0]
-    num_cols = table_shape[1]
 
-    # double loop to check every cell in the table
-    for row in range(num_rows):
-        for col in range(num_cols):
-
-            # once again for each cell, we need to find number of neighboring walls (will control how items / enemies set)
-            num_neighboring_walls = 0
-
-            # double loop over this cell's Moore neighborhood
-            for m in range(row - 1, row + 2):
-                for n in range(col - 1, col + 2):
-
-                    # check if grid[m, n] is in bounds
-                    if in_bounds(m, n, table_shape):
-                        # we don't count the cell itself as a neighbor
-                        if (m != row) or (n != col):
-                            # if spot == 1, increment num walls
-                            if temp_grid[m, n] == 1:
-                                num_neighboring_walls += 1
-                    else:
-                        # if out of bounds, automatically consider a wall
-                        num_neighboring_walls += 1
-
-            # once outside of loop to check neighbors, we can apply CA like rules for items and enemies
-            if num_neighboring_walls > 4:
-
-                # if > 4 but < 6 neighboring walls, pick a random int according to probabilities, if
-                # this check passes, we'll add a gold node at this position (state 2)
-                if num_neighboring_walls < 6:
-                    spawn_item = np.random.choice([0, 1], p = [1 - prob_item, prob_item])
-                    if spawn_item == 1:
-                        temp_grid[row, col] = 2
-
-                        # if we successfully added a gold node and animating, increment idx and plot a new snapshot
-                        if animate_flag:
-                            animation_index += 1
-                            plot_complex_grid(
-                                temp_grid, 
-                                f"animation/{animation_index}_iteration",
-                                f"time = {animation_index} (Density: {density}, Seed: {seed})"
-                            )
-                
-                # we only want to spawn diamonds in places all surrounded by walls
-                # diamond probability hard coded to 1%
-                if num_neighboring_walls > 7:
-                    spawn_diamond = np.random.choice([0, 1], p = [0.99, 0.01])
-                    if spawn_diamond == 1:
-                        temp_grid[row, col] = 4
-
-                        # if diamond added and animating, increment then plot snapshot
-                        if animate_flag:
-                            animation_index += 1
-                            plot_complex_grid(
-                                temp_grid, 
-                                f"animation/{animation_index}_iteration",
-                                f"time = {animation_index} (Density: {density}, Seed: {seed})"
-                            )
-
-            # we only want to spawn enemies in open space w/ no walls
-            if num_neighboring_walls == 0:
-
-                # make a check against prob of spawning an enemy
-                spawn_enemy = np.random.choice([0, 1], p = [1 - prob_enemy, prob_enemy])
-
-                if spawn_enemy == 1:
-                    temp_grid[row, col] = 3
-
-                    # if we successfully added enemy, handle animation
-                    if animate_flag:
-                        animation_index += 1
-                        plot_complex_grid(
-                            temp_grid, 
-                            f"animation/{animation_index}_iteration",
-                            f"time = {animation_index} (Density: {density}, Seed: {seed})"
-                        )
+    # find the number of neighboring walls for every cell (controls how items / enemies are set)
+    if wall_counts is None:
+        wall_counts = count_neighboring_walls(starting_grid)
+
+    # blocking details can't go on protected cells, so count those cells as having no valid neighbor count
+    if protected is not None:
+        blockable_counts = np.where(protected, -1, wall_counts)
+    else:
+        blockable_counts = wall_counts
+
+    # np.random and a Generator both have random(), so either can be drawn from below
+    random = np.random if rng is None else rng
+
+    # gold nodes go where there are exactly 5 neighboring walls, diamonds where there are 8 
+    # (all surrounded by walls, probability hard coded to 1%), and enemies in open space w/ no walls.
+    # each kind gets one uniform draw per candidate cell, in row-major order.
+    item_cells = np.flatnonzero(blockable_counts == 5)
+    item_cells = item_cells[random.random(item_cells.size) < prob_item]
+
+    if diamonds:
+        diamond_cells = np.flatnonzero(blockable_counts == 8)
+        diamond_cells = diamond_cells[random.random(diamond_cells.size) < 0.01]
+    else:
+        diamond_cells = np.empty(0, dtype = np.int64)
+
+    enemy_cells = np.flatnonzero(wall_counts == 0)
+    enemy_cells = enemy_cells[random.random(enemy_cells.size) < prob_enemy]
+
+    # each cell has one neighbor count, so these never overlap
+    new_cells = np.concatenate([item_cells, diamond_cells, enemy_cells])
+    new_states = np.repeat(np.array([2, 4, 3], dtype = temp_grid.dtype), [item_cells.size, diamond_cells.size, enemy_cells.size])
+
+    if not animate_flag:
+        temp_grid.ravel()[new_cells] = new_states
+        return [temp_grid, animation_index]
+
+    # if animating, add the details one at a time in row-major order and plot a snapshot after each
+    placement_order = np.argsort(new_cells, kind = "stable")
+    for cell, state in zip(new_cells[placement_order].tolist(), new_states[placement_order].tolist()):
+        temp_grid.ravel()[cell] = state
+        animation_index += 1
+        plot_complex_grid(
+            temp_grid, 
+            f"animation/{animation_index}_iteration",
+            f"time = {animation_index} (Density: {density}, Seed: {seed})"
+        )
     
     # return final modified grid and the updated animation index
     return [temp_grid, animation_index]
@@ -410,6 +1227,8 @@ def create_adjacency_matrix(grid):
         would tell every neighbor of cell 0. E.g., if adj_mat[0, 999] = 1, this
         would mean that the cell at idx 999 was a neighbor w/ 1. However, we don't
         need to do this because we can just indices with boundary checking to find the neighbors. 
+
+        pathfinding.py does that: it runs A* / jump point search directly on the grid, for actual path queries.
     """
     # get grid's dimensions
     table_shape = grid.shape
@@ -446,10 +1265,9 @@ def create_adjacency_matrix(grid):
 # function to search for and categorize rooms within the map
 def find_room_coordinates(grid, animation_index, density, seed, animate_flag=True):
     """
-    This function uses a modified version of breadth first search (BFS) to search the
-    map and identify rooms. It additional keeps track of the min and max x, y coords
-    found within rooms, so that we can create and return a list of room midpoints. 
-    Additional args allow for animation of this room finding process. 
+    This function finds the rooms in the map (floor cells connected through their Moore neighborhood)
+    and keeps track of the min and max x, y coords found within rooms, so that we can create and 
+    return a list of room midpoints. Additional args allow for animation of this room finding process. 
 
     Args:
         grid: np matrix, map to search for rooms
@@ -465,107 +1283,40 @@ def find_room_coordinates(grid, animation_index, density, seed, animate_flag=Tru
         ]
     
     Note:
-        Writing this function is where I learned a handy trick about cell indices. We can 
-        find the row and column index from a given cell index using floor division and modulo. 
-
-        E.g., the cell in row 95, 4th col (idx 3) would have the index 9503. Given just 9503, we can find 
-        the row and col using:
-        row = 9503 // num_rows (100) = 95
-        col = 9503 % num_cols (100) = 3
-    """
-    # make a copy of input grid so we can modify it for animation, then
-    # get index matrix and dimension details. Create a new vis_mat 
-    # that will indicate whether or not cells have been visited, all start at 0 not seen.
-    grid_to_mod = grid.copy()
-    ind_mat = create_index_matrix(grid_to_mod)
-    grid_shape = grid_to_mod.shape 
-    num_rows = grid_shape[0]
-    num_cols = grid_shape[1]
-    vis_mat = np.zeros(shape=(num_rows, num_cols), dtype = int)
-
-    # create a dictionary w/ idx to store encountered rooms. 
+        This used to be a BFS over cell indices with queue.Queue, which checked whether each neighbor
+        was already in the queue by scanning the whole queue, so big rooms took quadratic time. It also
+        decoded cell indices with num_rows / num_cols in a way that only worked for square maps. 
+        labeling.label_rooms() now labels every room in one linear pass over runs of floor cells,
+        for any map shape, and finds rooms in the same order the BFS did.
+    """
+    labels, areas, bboxes, centroids = labeling.label_rooms(grid == 0)
+
+    # store each room as [min_x, max_x, min_y, max_y, area], in the order rooms were found
     room_dict = {}
-    idx = 0
+    for idx, (bbox, area) in enumerate(zip(bboxes.tolist(), areas.tolist())):
+        room_dict[idx] = bbox + [area]
 
-    # double loop over every cell in our modified grid
-    for row in range(num_rows):
-        for col in range(num_cols):
-
-            # get the current cell's value and index
-            cell_val = grid_to_mod[row, col]
-            cell_idx = ind_mat[row, col]
-
-            # if we encounter an unvisited blank floor space, start modified BFS to classify this room
-            if cell_val == 0 and vis_mat[cell_idx // num_rows, cell_idx % num_cols] == 0:
-
-                # because we are using BFS, initialize a queue to store cells that need to be visited
-                q = queue.Queue()
-                q.put(cell_idx) # add the current cell's index to queue
-
-                # initialize vars that will be used to track the min/max x, y encountered, and this room's area
-                min_x = row 
-                max_x = row 
-                min_y = col 
-                max_y = col
-                area = 0
-
-                # if animating, set this separate index
-                if animate_flag:
-                    m = 0
-
-                # next BFS step, as long as there are unvisited nodes in the queue...
-                while q.qsize() > 0:
-                    
-                    # dequeue the first cell
-                    u = q.get()
-
-                    # update vis_mat to show that we have visited this cell
-                    vis_mat[u // num_rows, u % num_cols] = 1
-
-                    # update symbol in grid for drawing as new color
-                    grid_to_mod[u // num_rows, u % num_cols] = 9
-
-                    # if animating, only plot state after each 50 additions to save on png space
-                    if animate_flag:
-                        m += 1
-                        if m % 50 == 0:
-                            animation_index += 1
-                            plot_complex_grid(
-                                grid_to_mod, 
-                                f"animation/{animation_index}_iteration",
-                                f"time = {animation_index} (Density: {density}, Seed: {seed})"
-                            )
-
-                    # check Moore neighborhood of this cell:
-                    for i in range((u // num_rows) - 1, (u // num_rows) + 2):
-                        for j in range((u % num_cols) - 1, (u % num_cols) + 2):
-
-                            # if the current cell is in bounds, and not equal to our starting cell
-                            if in_bounds(i, j, grid_shape):
-                                if (i != u // num_rows) or (j != u % num_cols):
-                                    # if open space, and not in the queue, add it to the queue
-                                    if (grid_to_mod[i, j] == 0) and (ind_mat[i, j] not in q.queue):
-                                        q.put(ind_mat[i, j])
-
-                    # increment the area, then use logical checks to update max and min 
-                    # if the current cell is above or below our previously seen max/min
-                    area += 1
-
-                    if (u // num_rows) < min_x:
-                        min_x = u // num_rows
-                    
-                    if (u // num_rows) > max_x:
-                        max_x = u // num_rows
-
-                    if (u % num_cols) < min_y: 
-                        min_y = u % num_cols
-
-                    if (u % num_cols) > max_y:
-                        max_y = u % num_cols
-
-                # once all neighbors have been visited and room classified, add info. about coords to room dict
-                room_dict[idx] = [min_x, max_x, min_y, max_y, area]
-                idx += 1
+    # if animating, color each room's cells in as a new state, plotting after each 50 cells of a room to save on png space
+    if animate_flag:
+        grid_to_mod = grid.copy()
+        flat_grid = grid_to_mod.ravel()
+
+        # floor cells grouped by room, row by row within each room
+        room_cells = np.flatnonzero(labels)
+        room_cells = room_cells[np.argsort(labels.ravel()[room_cells], kind = "stable")]
+        room_starts = np.concatenate([[0], np.cumsum(areas)])
+
+        for idx in range(areas.size):
+            cells = room_cells[room_starts[idx]:room_starts[idx + 1]]
+            for m in range(50, cells.size + 1, 50):
+                flat_grid[cells[m - 50:m]] = 9
+                animation_index += 1
+                plot_complex_grid(
+                    grid_to_mod, 
+                    f"animation/{animation_index}_iteration",
+                    f"time = {animation_index} (Density: {density}, Seed: {seed})"
+                )
+            flat_grid[cells] = 9
 
     # after all rooms classified, return dictionary of rooms and the animation index for future fns that animate
     return [room_dict, animation_index]
@@ -608,11 +1359,164 @@ def get_room_midpoints(room_dict):
     return midpoints_dict
 
 
+# one row of the room table: bbox is [min_x, max_x, min_y, max_y], midpoint is [x, y] like get_room_midpoints()
+# gives, and centroid is the average [x, y] of the room's cells. ids match the labels in the label grid minus 1.
+ROOM_DTYPE = np.dtype([
+    ("id", np.int32),
+    ("area", np.int32),
+    ("bbox", np.int32, (4,)),
+    ("midpoint", np.int32, (2,)),
+    ("centroid", np.float32, (2,)),
+])
+
+
+# function to create a table of every room on the map, and a grid of which room each cell is in
+def create_room_table(grid):
+    """
+    This function finds every room on the map (like find_room_coordinates()) and stores them
+    in a compact numpy structured array, along with a label grid that keeps each cell's room.
+
+    Args:
+        grid: np matrix, map to search for rooms
+    
+    Returns:
+        List: with elements [
+            room_table (idx 0): np structured array with dtype ROOM_DTYPE, one row per room in the order they were found,
+            room_labels (idx 1): np matrix of int32, room id + 1 for each floor cell, and 0 for every other cell
+        ]
+    """
+    room_labels, areas, bboxes, centroids = labeling.label_rooms(grid == 0)
+
+    room_table = np.zeros(shape = areas.size, dtype = ROOM_DTYPE)
+    room_table["id"] = np.arange(areas.size)
+    room_table["area"] = areas
+    room_table["bbox"] = bboxes
+    room_table["midpoint"][:, 0] = (bboxes[:, 0] + bboxes[:, 1]) // 2
+    room_table["midpoint"][:, 1] = (bboxes[:, 2] + bboxes[:, 3]) // 2
+    room_table["centroid"] = centroids
+
+    return [room_table, room_labels]
+
+
+# function to find which room a cell is in
+def get_room_at(room_labels, x, y):
+    """
+    This function looks up the room a cell belongs to in the label grid from create_room_table().
+
+    Args:
+        room_labels: np matrix from create_room_table()
+        x: int (or np array of ints), row of the cell
+        y: int (or np array of ints), col of the cell
+    
+    Returns:
+        int (or np array), the room's id (its row in the room table), or -1 if the cell isn't in a room
+    """
+    return room_labels[x, y] - 1
+
+
+# function to turn the room table into a list of room midpoints
+def get_rooms_list(room_table):
+    """
+    This function converts a room table into the [[x, y, area], ...] list format that 
+    get_room_midpoints() values are in, for code that works with lists of rooms.
+
+    Args:
+        room_table: np structured array from create_room_table()
+    
+    Returns:
+        List of Lists, [midpoint_x, midpoint_y, area] for each room
+    """
+    return np.column_stack([room_table["midpoint"], room_table["area"]]).tolist()
+
+
+# function to list every step of many paths at once
+def get_path_cells(starts, ends):
+    """
+    This function finds the center cell of every step of each path. Like the original make_path() loop,
+    a path moves diagonally until it lines up with the end on one axis, then moves straight, and 
+    it stops one step before the end (the last step's clearing covers the end when width > 0).
+
+    Args:
+        starts: np matrix of ints with an [x, y] row for the start of each path
+        ends: np matrix of ints with an [x, y] row for the end of each path
+    
+    Returns:
+        List: with elements [
+            path_x (idx 0): np array, x of each step, path by path,
+            path_y (idx 1): np array, y of each step, path by path,
+            num_steps (idx 2): np array, number of steps in each path
+        ]
+    """
+    starts = np.asarray(starts, dtype = np.int64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype = np.int64).reshape(-1, 2)
+    deltas = ends - starts
+
+    # each step moves at most 1 cell on each axis, so a path has as many steps as its longest axis
+    num_steps = np.abs(deltas).max(axis = 1) if len(deltas) > 0 else np.zeros(0, dtype = np.int64)
+    path_ids = np.repeat(np.arange(len(deltas)), num_steps)
+    steps = np.arange(path_ids.size) - np.repeat(np.cumsum(num_steps) - num_steps, num_steps)
+
+    # step t is t cells along each axis, until that axis reaches the end
+    moves = np.minimum(steps[:, None], np.abs(deltas[path_ids]))
+    cells = starts[path_ids] + np.sign(deltas[path_ids]) * moves
+    return [cells[:, 0], cells[:, 1], num_steps]
+
+
+# function to clear the squares around many path steps at once
+def carve_path_cells(grid, path_x, path_y, widths, carved=None):
+    """
+    This function sets every cell within widths[k] cells (a square) of each path step k to floor. 
+    Cells that would be out of bounds are skipped, instead of wrapping around to the other side of the map.
+
+    Args:
+        grid: np matrix of map, modified in place
+        path_x: np array, x of each step from get_path_cells()
+        path_y: np array, y of each step from get_path_cells()
+        widths: np array, the number of cells to clear on each side of each step
+        carved: np matrix of bools, defaults to None, if given every cleared cell is set to True
+    
+    Returns:
+        None, the grid is modified in place
+    """
+    for width in np.unique(widths).tolist():
+        at_width = widths == width
+        center_x = path_x[at_width]
+        center_y = path_y[at_width]
+
+        # every offset in the square, for every step with this width
+        offsets = np.arange(-width, width + 1)
+        cells_x = (center_x[:, None, None] + offsets[None, :, None]).repeat(offsets.size, axis = 2).ravel()
+        cells_y = (center_y[:, None, None] + offsets[None, None, :]).repeat(offsets.size, axis = 1).ravel()
+
+        inside = (cells_x >= 0) & (cells_x < grid.shape[0]) & (cells_y >= 0) & (cells_y < grid.shape[1])
+        grid[cells_x[inside], cells_y[inside]] = 0
+        if carved is not None:
+            carved[cells_x[inside], cells_y[inside]] = True
+
+
+# function to pick a random width for every path step at once
+def get_path_widths(num_cells, min_width, rng=None):
+    """
+    This function draws the clearing width for every path step in one batch.
+
+    Args:
+        num_cells: int, number of path steps
+        min_width: int, the smallest width, each width is min_width or min_width + 1
+        rng: np.random.Generator, defaults to None to use numpy's global random state.
+    
+    Returns:
+        np array of ints with one width per step
+    """
+    if rng is None:
+        return np.random.randint(min_width, min_width + 2, size = num_cells)
+    return rng.integers(min_width, min_width + 2, size = num_cells)
+
+
 # function to create a path between two rooms
-def make_path(grid, room1, room2, animation_index, density, seed, animate_flag):
+def make_path(grid, room1, room2, animation_index, density, seed, animate_flag, rng=None, min_width=0, carved=None):
     """
     This function makes a path between two rooms on the map. The path width
-    will be varied randomly between 1 - 2 pixels.
+    will be varied randomly between 1 - 2 pixels (3 - 5 pixels with min_width = 1).
 
     Args:
         grid: np matrix of map
@@ -622,97 +1526,97 @@ def make_path(grid, room1, room2, animation_index, density, seed, animate_flag):
         density: int, for plotting in animation frame
         seed: int, for plotting in animation frame
         animate_flag: bool, whether or not to animate, passed from connect_map()
+        rng: np.random.Generator, defaults to None to use numpy's global random state.
+        min_width: int, defaults to 0, the smallest number of cells cleared on each side of the path.
+            With 0, diagonal steps may only touch at corners, with 1 or more the path is always connected side to side.
+        carved: np matrix of bools, defaults to None, if given every cleared cell is set to True
     
     Returns:
         animation_index: int, for keeping track of anim progress. Otherwise map 
             path is modified in place.
     """
-    # hard-coding min/max range for path width
-    min_range = 0
-    max_range = 2
-
-    # store room coords in variables
-    start_x = room1[0]
-    start_y = room1[1]
-    end_x = room2[0]
-    end_y = room2[1]
+    path_x, path_y, num_steps = get_path_cells([room1[:2]], [room2[:2]])
+    widths = get_path_widths(path_x.size, min_width, rng)
 
-    # if animating, setup this idx
-    if animate_flag:
-        m = 0
-
-    # loop for as long as the starting point is not at end point, on x OR y dim. 
-    while (start_x != end_x) or (start_y != end_y):
-        
-        # randomly select the width of path for this position
-        clear_width = np.random.randint(min_range, max_range)
+    if not animate_flag:
+        carve_path_cells(grid, path_x, path_y, widths, carved)
+        return animation_index
 
-        # loop over the square in specified width, setting each spot on map to floor
-        for i in range(start_x - clear_width, start_x + clear_width + 1):
-            for j in range(start_y - clear_width, start_y + clear_width + 1):
-                grid[i, j] = 0
-
-        # increment if start_x <> end_x, or if start_y <> end_y
-        if start_x < end_x:
-            start_x += 1
-        
-        if start_x > end_x:
-            start_x -= 1
-        
-        if start_y < end_y:
-            start_y += 1
-        
-        if start_y > end_y:
-            start_y -= 1
-    
-        # path creating takes less steps, so we'll animate the update every 5 frames
-        if animate_flag:
-            m += 1
-            if m % 5 == 0:
-                plot_grid(grid, f"animation/{animation_index}_iteration", f"time = {animation_index} (Density: {density}, Seed: {seed})")
-                animation_index += 1
+    # path creating takes less steps, so we'll carve 5 steps at a time and animate the update after each 5
+    for m in range(0, path_x.size, 5):
+        carve_path_cells(grid, path_x[m:m + 5], path_y[m:m + 5], widths[m:m + 5], carved)
+        if m + 5 <= path_x.size:
+            plot_grid(grid, f"animation/{animation_index}_iteration", f"time = {animation_index} (Density: {density}, Seed: {seed})")
+            animation_index += 1
 
     return animation_index
 
 
 # function to connect rooms across the map
-def connect_map(grid, all_rooms, n_neighbors, animation_index, density, seed, animate_flag=True):
+def connect_map(grid, all_rooms, n_neighbors, animation_index, density, seed, animate_flag=True, rng=None, connect_mode="nearest", extra_edges=0, carved=None, batch_steps=65536):
     """
     This function looks at all the rooms on the map, and connects each one to its n nearest
-    neighbors, which is specified as an argument. 
+    neighbors (by manhattan distance between midpoints), which is specified as an argument. 
+    With connect_mode = "mst", rooms are instead connected with a minimum spanning tree plus
+    extra_edges extra loops, which always connects every room's midpoint to every other.
 
     Args:
         grid: np matrix of map to connect rooms within
-        all_rooms: list containing the midpoints of each room on the map
+        all_rooms: list containing the midpoints of each room on the map, or a room table from create_room_table()
         n_neighbors: int, will set how many nearest neighbors each room creates a path to
         animation_index: int, for keeping track of anim. order
         density: int, for plotting in animation frame
         seed: int, for plotting in animation frame
         animate_flag: bool, whether or not to animate
+        rng: np.random.Generator, defaults to None to use numpy's global random state.
+        connect_mode: string, defaults to "nearest", also accepts "mst", see room_graph.get_room_connections()
+        extra_edges: int, defaults to 0, number of extra loops to add with connect_mode = "mst"
+        carved: np matrix of bools, defaults to None, if given every cell cleared for a path is set to True
+        batch_steps: int, defaults to 65536, without animation paths are carved in batches of about this many steps
     
     Returns:
         animation_index: int, for keeping track of anim progress. Otherwise map 
             connections are modified in place.
+    
+    Note:
+        Each pair of rooms gets one path, even if both rooms picked each other as a nearest neighbor.
+        Without animation, the steps of many paths are found and carved at once, in batches of whole paths
+        with up to batch_steps steps (a longer path gets a batch to itself). That keeps the step and clearing
+        arrays the same size however long the corridors add up to, which out_of_core.py relies on for huge maps.
+        The widths are drawn in the same order either way, so the batch size doesn't change the map.
     """
-    # for each room...
-    for i in range(len(all_rooms)):
-        
-        # get the room we're currently on
-        room = all_rooms[i]
-
-        # make a copy of all_rooms for remaining so that OG isn't modified
-        remaining_rooms = all_rooms.copy()
+    if isinstance(all_rooms, np.ndarray):
+        all_rooms = get_rooms_list(all_rooms)
 
-        # get rid of the room we're currently on:
-        remaining_rooms.pop(i)
+    # pick which rooms to connect. For nearest neighbors, a grid hash over the midpoints finds
+    # each room's n nearest rooms without sorting the distances to every other room. If there are 
+    # fewer than n other rooms, each room is connected to all of them.
+    midpoints = [room[:2] for room in all_rooms]
+    connections = room_graph.get_room_connections(midpoints, connect_mode, n_neighbors, extra_edges)
 
-        # get the manhattan distances from this room to all remaining rooms. 
-        # NOTE: this will be returned by get_manhattan_distance() in order of nearest neighbors earliest in dict
-        manhattan_distances = get_manhattan_distance(room, remaining_rooms)
+    # paths in a spanning tree need to be connected side to side, since verify_path() doesn't move diagonally
+    min_width = 1 if connect_mode == "mst" else 0
 
-        # loop over the n nearest neighbors, and make a path between this room and each nearest neighbor. 
-        for j in range(n_neighbors):
-            animation_index = make_path(grid, room, list(manhattan_distances.values())[j], animation_index, density, seed, animate_flag)
+    # if animating, make each path one at a time so the frames show them being added in order
+    if animate_flag:
+        for i, j in connections.tolist():
+            animation_index = make_path(grid, all_rooms[i], all_rooms[j], animation_index, density, seed, animate_flag, rng, min_width, carved)
+        return animation_index
+
+    points = np.asarray(midpoints, dtype = np.int64).reshape(-1, 2)
+    starts = points[connections[:, 0]]
+    ends = points[connections[:, 1]]
+
+    # carve whole paths at a time, batch_steps steps at most (unless a single path is longer)
+    total_steps = np.cumsum(np.abs(ends - starts).max(axis = 1)) if len(connections) > 0 else np.zeros(0, dtype = np.int64)
+    first = 0
+    while first < len(connections):
+        steps_before = total_steps[first - 1] if first > 0 else 0
+        last = max(int(np.searchsorted(total_steps, steps_before + batch_steps, side = "right")), first + 1)
+
+        path_x, path_y, num_steps = get_path_cells(starts[first:last], ends[first:last])
+        carve_path_cells(grid, path_x, path_y, get_path_widths(path_x.size, min_width, rng), carved)
+        first = last
     
     return animation_index
 
@@ -724,7 +1628,7 @@ def find_specific_room(rooms_list, min_area, grid_shape, target_x="low", target_
     and level exit can be on opposite corners of the map, incentivizing exploration. 
 
     Args:
-        rooms_list: a list of all rooms on the map. 
+        rooms_list: a list of all rooms on the map, or a room table from create_room_table()
         min_area: int, the minimum area acceptable for the spawn and level exit points
         grid_shape: tuple, dimensions of game map
         target_x: string, x coord corner of the map to search for, defaults to "low", also accepts "high"
@@ -738,6 +1642,10 @@ def find_specific_room(rooms_list, min_area, grid_shape, target_x="low", target_
         E.g., target_x = "low" and target_y = "low" will find the bottom-left corner of the map
               target_x = "low" and target_y = "high" will find the top-left corner of the map. 
     """
+    # a room table can be filtered and searched with whole-array operations
+    if isinstance(rooms_list, np.ndarray):
+        return find_specific_room_in_table(rooms_list, min_area, grid_shape, target_x, target_y)
+
     # use list comprehension to filter out rooms which aren't above the min allowable area
     valid_rooms_list = [i for i in rooms_list if i[2] > min_area]
 
@@ -791,7 +1699,69 @@ def find_specific_room(rooms_list, min_area, grid_shape, target_x="low", target_
     return valid_rooms_list[room_index]
 
 
-# function that uses BFS to verify whether or not a path exists from start point to end point
+# function to find a specific corner room in a room table
+def find_specific_room_in_table(room_table, min_area, grid_shape, target_x="low", target_y="low"):
+    """
+    This function does the same search as find_specific_room(), for a room table.
+
+    Args:
+        room_table: np structured array from create_room_table()
+        min_area: int, the minimum area acceptable for the spawn and level exit points
+        grid_shape: tuple, dimensions of game map
+        target_x: string, x coord corner of the map to search for, defaults to "low", also accepts "high"
+        target_y: string, y coord corner of the map to search for, defaults to "low", also accepts "high"
+    
+    Returns:
+        list: [midpoint_x, midpoint_y, area] of the room closest to the specified corner of the map
+    """
+    valid_rooms = room_table[room_table["area"] > min_area]
+
+    if valid_rooms.size == 0:
+        raise Exception("Unable to find rooms: for this map there were no rooms above the specified min_area. Try lowering the map density or the min_area.")
+
+    corner_x = 0 if target_x == "low" else grid_shape[0] - 1
+    corner_y = 0 if target_y == "low" else grid_shape[1] - 1
+    # squared distances are exact ints and sort the same as euclidean distances
+    dx = valid_rooms["midpoint"][:, 0].astype(np.int64) - corner_x
+    dy = valid_rooms["midpoint"][:, 1].astype(np.int64) - corner_y
+
+    # argmin picks the first of any tied rooms, like the loop in find_specific_room()
+    room = valid_rooms[np.argmin(dx ** 2 + dy ** 2)]
+    return [int(room["midpoint"][0]), int(room["midpoint"][1]), int(room["area"])]
+
+
+# function to pick a connected spawn and exit room by walking distance
+def find_spawn_exit_pair(grid, room_table, min_area, target_path_length=None):
+    """
+    This function picks spawn and level exit points among the midpoints of rooms above min_area,
+    using distance fields (see distance_fields.py) instead of corner distances plus a separate path check.
+    Spawn candidates are tried starting with the room closest to the same corner find_specific_room() 
+    uses for the spawn, and the exit is the connected room whose walking distance is closest to target_path_length.
+
+    Args:
+        grid: np matrix w/ game map
+        room_table: np structured array from create_room_table()
+        min_area: int, the minimum area acceptable for the spawn and level exit rooms
+        target_path_length: int, defaults to None to pick the farthest connected room
+    
+    Returns:
+        List: [spawn [x, y], exit [x, y], distance (int)], or None if no two candidate rooms are connected
+    """
+    valid_rooms = room_table[room_table["area"] > min_area]
+
+    if valid_rooms.size == 0:
+        raise Exception("Unable to find rooms: for this map there were no rooms above the specified min_area. Try lowering the map density or the min_area.")
+
+    # only midpoints that can be stood on, closest to the spawn corner first
+    midpoints = valid_rooms["midpoint"].astype(np.int64)
+    midpoints = midpoints[reachability.get_walkable_mask(grid[midpoints[:, 0], midpoints[:, 1]])]
+    corner_distances = (midpoints[:, 0] - (grid.shape[0] - 1)) ** 2 + midpoints[:, 1] ** 2
+    candidates = midpoints[np.argsort(corner_distances, kind = "stable")]
+
+    return distance_fields.find_spawn_exit(distance_fields.create_distance_cache(grid), candidates, target_path_length)
+
+
+# function to verify whether or not a path exists from start point to end point
 def verify_path(grid, start, finish):
     """
     This function verifies whether or not there is a path from a specified start point
@@ -804,69 +1774,15 @@ def verify_path(grid, start, finish):
     
     Returns:
         bool: True if a valid path exists from start to finish, False otherwise
+    
+    Note:
+        Moves go through the von Neumann neighborhood (to avoid cutting past corner walls), over floors (0)
+        and enemies (3). This used to be a BFS with queue.Queue that scanned the queue before adding each
+        neighbor, and only worked on square maps. reachability.find_reachable_targets() labels every 
+        walkable region in one linear pass instead, and to check many points against the same start, 
+        call it directly with all of them.
     """
-    # create an index matrix for the grid
-    ind_mat = create_index_matrix(grid)
-
-    # get dimensions of the grid, and create a vis_mat to keep track of 
-    # which cells have been visited in the BFS
-    grid_shape = grid.shape
-    num_rows = grid_shape[0]
-    num_cols = grid_shape[1]
-    vis_mat = np.zeros(shape = (num_rows, num_cols), dtype = int)
-
-    # get starting cell index
-    cell_idx = ind_mat[start[0], start[1]]
-
-    # start BFS
-    q = queue.Queue()
-    q.put(cell_idx) # starting cell is 1st in queue
-
-    # as long as unvisited cells remain in the queue...
-    while q.qsize() > 0:
-
-        # dequeue first cell in queue
-        u = q.get()
-
-        # get its current indices
-        current_x = u // num_rows 
-        current_y = u % num_cols 
-
-        # note in vis_mat that this cell has been visited
-        vis_mat[current_x, current_y] = 1
-
-        # if we are at the desired end point, return True because we have found a valid path
-        if (current_x == finish[0]) and (current_y == finish[1]):
-            return True
-
-        # ------------------------ Check von Neumann neighborhood to avoid blocking corner wall ------------------------ #
-        """
-        For each cell in von Neumann neighborhood, we will first check if it is in bounds, and unvisited. 
-        If so, if the grid's state is 0 for floor, or 3 for enemy, we will consider it a valid cell in
-        the room and enqueue it, else it will not be enqueued because it is a blocking wall or other kind of ore. 
-        """
-        # left (x - 1, y)
-        if in_bounds(current_x - 1, current_y, grid_shape) and vis_mat[current_x - 1, current_y] == 0:
-            if (grid[current_x - 1, current_y] in [0, 3]) and (ind_mat[current_x - 1, current_y] not in q.queue):
-                q.put(ind_mat[current_x - 1, current_y])
-
-        # right (x + 1, y)
-        if in_bounds(current_x + 1, current_y, grid_shape) and vis_mat[current_x + 1, current_y] == 0:
-            if (grid[current_x + 1, current_y] in [0, 3]) and (ind_mat[current_x + 1, current_y] not in q.queue):
-                q.put(ind_mat[current_x + 1, current_y])
-
-        # up (x, y + 1)
-        if in_bounds(current_x, current_y + 1, grid_shape) and vis_mat[current_x, current_y + 1] == 0:
-            if (grid[current_x, current_y + 1] in [0, 3]) and (ind_mat[current_x, current_y + 1] not in q.queue):
-                q.put(ind_mat[current_x, current_y + 1])
-
-        # down (x, y - 1)
-        if in_bounds(current_x, current_y - 1, grid_shape) and vis_mat[current_x, current_y - 1] == 0:
-            if (grid[current_x, current_y - 1] in [0, 3]) and (ind_mat[current_x, current_y - 1] not in q.queue):
-                q.put(ind_mat[current_x, current_y - 1])
-
-    # if BFS explored as far as possible without returning True, return False as no valid path exists.
-    return False
+    return bool(reachability.find_reachable_targets(grid, start, [finish])[0])
 
 
 
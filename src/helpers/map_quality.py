@@ -0,0 +1,129 @@
+"""
+This file contains a cheap quality score for a map right after CA smoothing, so maps that
+can't turn out well are thrown away before the expensive stages (finding and connecting
+rooms, adding details, checking the path from spawn to exit).
+
+The score can be worked out on a block-downsampled copy of the map: each block of
+downsample x downsample cells becomes one cell, which is floor if at least half the block
+is floor. That's downsample^2 times fewer cells to label, at the cost of merging or
+dropping rooms that are narrower than a block. At full size, labeling costs about as much
+as create_room_table(), so the early check pays off the most with downsample = 2 or 4.
+
+Maps fail at both ends: sparse maps run together into one big room, and dense maps have no
+room big enough for spawn and exit. So the default bounds ask for at least 2 rooms over the
+spawn area, and at least 2% floor.
+"""
+
+
+import numpy as np # for downsampling and the stats.
+from . import labeling # room labeling on the (downsampled) floor.
+
+
+# bounds to reject maps with, as [min, max] (None for no limit)
+DEFAULT_QUALITY_BOUNDS = {
+    "floor_fraction": [0.02, None],
+    "room_count": [2, None],
+}
+
+
+# function to shrink a map into blocks
+def downsample_floor(grid, downsample):
+    """
+    This function finds the fraction of floor cells in every downsample x downsample block of the map.
+    Rows and cols that don't fill a whole block at the bottom / right edge are left out.
+
+    Args:
+        grid: np matrix, map after CA smoothing
+        downsample: int, number of rows and cols in a block (1 to keep every cell)
+
+    Returns:
+        np matrix of floats with shape (rows // downsample, cols // downsample), fraction of floor in each block
+    """
+    num_rows = grid.shape[0] // downsample * downsample
+    num_cols = grid.shape[1] // downsample * downsample
+    floor = (grid[:num_rows, :num_cols] == 0).astype(np.float32)
+    return floor.reshape(num_rows // downsample, downsample, num_cols // downsample, downsample).mean(axis = (1, 3))
+
+
+# function to score a map right after CA smoothing
+def score_map_quality(grid, downsample=1, min_room_area=35):
+    """
+    This function estimates the stats that decide whether a map is worth finishing.
+
+    Args:
+        grid: np matrix, map after CA smoothing
+        downsample: int, defaults to 1 to score the full map, or the block size to score a downsampled copy
+        min_room_area: int, defaults to 35, a room needs more than this many (full size) cells to count,
+            the same as the min_area find_specific_room() uses for spawn and exit rooms
+
+    Returns:
+        dict with:
+            "floor_fraction": float, fraction of the map that's floor,
+            "largest_share": float, fraction of the floor in the largest room (0 if there's no floor),
+            "room_count": int, number of rooms with more than min_room_area cells
+    """
+    if downsample > 1:
+        blocks = downsample_floor(grid, downsample)
+        floor_fraction = float(blocks.mean()) if blocks.size > 0 else 0.0
+        floor_mask = blocks >= 0.5
+    else:
+        floor_mask = grid == 0
+        floor_fraction = float(floor_mask.mean())
+
+    # rooms are 8-connected floor, like find_room_coordinates(), and each block stands for downsample^2 cells
+    room_labels, areas, bboxes, centroids = labeling.label_rooms(floor_mask)
+    areas = areas * downsample * downsample
+
+    return {
+        "floor_fraction": floor_fraction,
+        "largest_share": float(areas.max() / areas.sum()) if areas.size > 0 else 0.0,
+        "room_count": int((areas > min_room_area).sum()),
+    }
+
+
+# function to check a map's scores against bounds
+def check_map_quality(scores, bounds=DEFAULT_QUALITY_BOUNDS):
+    """
+    This function checks whether every score is inside its bounds.
+
+    Args:
+        scores: dict from score_map_quality()
+        bounds: dict mapping score names to [min, max], where None means no limit, defaults to DEFAULT_QUALITY_BOUNDS
+
+    Returns:
+        bool, True if the map is worth finishing
+    """
+    for name, (low, high) in bounds.items():
+        if low is not None and scores[name] < low:
+            return False
+        if high is not None and scores[name] > high:
+            return False
+    return True
+
+
+# function to pick which way to move the density after a map is rejected
+def get_density_step(scores, bounds=DEFAULT_QUALITY_BOUNDS):
+    """
+    This function guesses whether a rejected map needs more or fewer walls. Too few rooms can mean
+    either one big room (too sparse) or no room big enough (too dense), so the floor fraction decides.
+
+    Args:
+        scores: dict from score_map_quality()
+        bounds: dict of [min, max] bounds the map was checked against, defaults to DEFAULT_QUALITY_BOUNDS
+
+    Returns:
+        int, +1 to raise the density (the map has too much floor), or -1 to lower it
+    """
+    floor_low, floor_high = bounds.get("floor_fraction", [None, None])
+    if floor_high is not None and scores["floor_fraction"] > floor_high:
+        return 1
+    if floor_low is not None and scores["floor_fraction"] < floor_low:
+        return -1
+
+    # one room holding (nearly) all the floor means the caves ran together
+    share_high = bounds.get("largest_share", [None, None])[1]
+    if share_high is not None and scores["largest_share"] > share_high:
+        return 1
+
+    return 1 if scores["floor_fraction"] >= 0.5 else -1
+
@@ -0,0 +1,329 @@
+"""
+This file contains an out-of-core version of the map generation pipeline, for maps
+too large to fit in memory (e.g. 64k x 64k).
+
+Every stage (noise, Cellular Automata smoothing, room labeling, and detail placement)
+works on memory-mapped grids stored on disk, one band of rows (plus a one row halo
+on each side when neighbors are needed) at a time. Peak memory is then bounded by the
+band size instead of the map size. Only the per-room stats and the list of room
+midpoints are kept in memory.
+"""
+
+
+import os # for file paths in the working folder.
+import numpy as np # for memory-mapped grids and random number generation.
+from . import map_helpers as maps # CA neighbor counts, room connection, and detail placement.
+from . import ca_rules # lookup tables for CA rules.
+from . import labeling # run based room labeling for each band.
+
+
+# function to create a memory-mapped grid on disk
+def create_disk_grid(folder, name, shape, dtype=np.uint8):
+    """
+    This function creates a new grid stored in a file, that numpy reads and writes
+    a piece at a time instead of loading the whole thing into memory.
+
+    Args:
+        folder: string, folder to store the file in
+        name: string, file name
+        shape: tuple, (num_rows, num_cols)
+        dtype: numpy dtype, defaults to uint8
+
+    Returns:
+        np.memmap of the given shape
+    """
+    return np.lib.format.open_memmap(os.path.join(folder, name), mode = "w+", dtype = dtype, shape = shape)
+
+
+# helper function to get the start and stop row of each band
+def get_bands(num_rows, band_rows):
+    """
+    This function splits the rows of a map into bands.
+
+    Args:
+        num_rows: int, number of rows in the map
+        band_rows: int, max number of rows per band
+
+    Returns:
+        List of [start, stop] row pairs
+    """
+    return [[start, min(start + band_rows, num_rows)] for start in range(0, num_rows, band_rows)]
+
+
+# helper function to read a band with one halo row above and below (where they exist)
+def read_band_with_halo(grid, start, stop):
+    """
+    This function reads a band of rows plus the rows just above and below it, which are
+    needed to count neighbors at the band's edges. At the top and bottom of the map there is
+    no halo row, and the neighbor counting treats those as out of bounds walls like usual.
+
+    Args:
+        grid: np.memmap to read from
+        start: int, first row of the band
+        stop: int, one past the last row of the band
+
+    Returns:
+        List, [np matrix of the band with halo rows, index of the band's first row within it]
+    """
+    halo_start = max(start - 1, 0)
+    halo_stop = min(stop + 1, grid.shape[0])
+    return [np.array(grid[halo_start:halo_stop]), start - halo_start]
+
+
+# function to generate the noise grid a band at a time
+def create_noise_on_disk(folder, num_rows, num_cols, desired_density, rng_seed, band_rows, rng=None):
+    """
+    This function makes the same noise grid as map_helpers.create_noise_grid(), written to disk a band at a time.
+
+    Args:
+        folder: string, folder to store the grid in
+        num_rows: int, how many rows to include in matrix
+        num_cols: int, how many columns to include in matrix
+        desired_density: int, a number between 0 - 100, how densely filled with walls the map should be.
+        rng_seed: int, controls random number generation.
+        band_rows: int, number of rows to generate at a time
+        rng: np.random.Generator, defaults to None to seed and use numpy's global random state with rng_seed.
+
+    Returns:
+        np.memmap of uint8 with 0s / 1s
+
+    Note:
+        choice() draws one uniform number per cell in order, so drawing
+        band by band gives exactly the same grid as drawing it all at once.
+    """
+    desired_density = min(max(desired_density, 0), 100)
+    prob_one = desired_density / 100
+
+    if rng is None:
+        np.random.seed(rng_seed)
+        rng = np.random
+    grid = create_disk_grid(folder, "noise.npy", (num_rows, num_cols))
+
+    for start, stop in get_bands(num_rows, band_rows):
+        grid[start:stop] = rng.choice([0, 1], size = (stop - start, num_cols), p = [1 - prob_one, prob_one])
+
+    return grid
+
+
+# function to run the CA over a grid on disk a band at a time
+def run_ca_on_disk(folder, noise_grid, num_iterations, band_rows, rule=ca_rules.DEFAULT_RULE):
+    """
+    This function applies the CA rules from map_helpers.create_map_with_ca() to a grid on disk.
+    Each iteration reads the current grid one band (plus halo rows) at a time and writes the
+    new band to a second grid on disk, then the two grids swap. Stops early once nothing changes.
+
+    Args:
+        folder: string, folder to store the grids in
+        noise_grid: np.memmap, the starting grid (it is not modified)
+        num_iterations: int, how many time steps over which to apply the CA rules.
+        band_rows: int, number of rows to update at a time
+        rule: string in B/S notation or a table from ca_rules.compile_rule(), defaults to the original map rule.
+
+    Returns:
+        List: with elements [
+            np.memmap (idx 0): the smoothed grid,
+            iterations_run (idx 1): int, number of CA steps actually computed
+        ]
+    """
+    lut = ca_rules.compile_rule(rule)
+    shape = noise_grid.shape
+    grids = [create_disk_grid(folder, "ca_0.npy", shape), create_disk_grid(folder, "ca_1.npy", shape)]
+
+    # start from a copy so the noise grid stays as it was
+    for start, stop in get_bands(shape[0], band_rows):
+        grids[0][start:stop] = noise_grid[start:stop]
+
+    iterations_run = 0
+    for i in range(1, num_iterations + 1):
+
+        print(f"Starting iteration {i}...")
+        current = grids[(i - 1) % 2]
+        new = grids[i % 2]
+        changed = False
+
+        for start, stop in get_bands(shape[0], band_rows):
+            band, offset = read_band_with_halo(current, start, stop)
+            num_neighboring_walls = maps.count_neighboring_walls(band)
+            new_band = ca_rules.apply_rule(band, num_neighboring_walls, lut)[offset:offset + stop - start]
+
+            changed = changed or not np.array_equal(new_band, band[offset:offset + stop - start])
+            new[start:stop] = new_band
+
+        iterations_run = i
+        if not changed:
+            break
+
+    # keep the final grid, and delete the other one to free up disk space
+    final_grid = grids[iterations_run % 2]
+    other_grid = grids[(iterations_run + 1) % 2]
+    other_path = other_grid.filename
+    grids = current = new = other_grid = None
+    os.remove(other_path)
+
+    return [final_grid, iterations_run]
+
+
+# function to find the rooms of a grid on disk a band at a time
+def find_rooms_on_disk(folder, grid, band_rows):
+    """
+    This function labels the rooms (Moore-connected floor areas) of a grid on disk. Each band
+    is labeled on its own with labeling.py, then rooms that touch across a band edge are
+    merged, and a second pass rewrites the label grid with the final room numbers.
+    Rooms are numbered in the same order as map_helpers.find_room_coordinates() finds them.
+
+    Args:
+        folder: string, folder to store the label grid in
+        grid: np.memmap, the map to find rooms in (floors are 0)
+        band_rows: int, number of rows to label at a time
+
+    Returns:
+        List: with elements [
+            np.memmap (idx 0): label grid, 0 for non-floor cells and room number + 1 for floor cells,
+            dict (idx 1): per room stats from labeling.summarize_runs(), with rooms merged across bands
+        ]
+    """
+    num_rows = grid.shape[0]
+    num_cols = grid.shape[1]
+    labels = create_disk_grid(folder, "labels.npy", grid.shape, dtype = np.int64)
+
+    band_stats = []
+    edge_a = []
+    edge_b = []
+    num_labels = 0
+
+    for start, stop in get_bands(num_rows, band_rows):
+        floor_mask = np.array(grid[start:stop]) == 0
+        runs, run_rooms, num_rooms = labeling.label_runs(floor_mask)
+        runs[0] = runs[0] + start
+
+        # give each band's rooms their own range of label numbers
+        band_labels = labeling.paint_labels(floor_mask, runs, run_rooms).astype(np.int64)
+        band_labels[band_labels > 0] += num_labels
+        labels[start:stop] = band_labels
+        band_stats.append(labeling.summarize_runs(runs, run_rooms, num_rooms))
+
+        # rooms that touch across the edge between the last band and this one get merged later
+        if start > 0:
+            edge_rows = np.array(labels[start - 1:start + 1])
+            edge_runs = labeling.find_runs(edge_rows > 0)
+            touching_a, touching_b = labeling.find_run_edges(edge_runs[0], edge_runs[1], edge_runs[2], num_cols)
+            edge_a.append(edge_rows[0, edge_runs[1][touching_a]] - 1)
+            edge_b.append(edge_rows[1, edge_runs[1][touching_b]] - 1)
+
+        num_labels += num_rooms
+
+    # merge rooms across bands, then renumber them by their first cell like the in-memory version
+    if len(edge_a) > 0:
+        roots = labeling.merge_labels(num_labels, np.concatenate(edge_a), np.concatenate(edge_b))
+    else:
+        roots = np.arange(num_labels)
+    is_root = roots == np.arange(num_labels)
+    final_room = (np.cumsum(is_root) - 1)[roots]
+    num_rooms = int(is_root.sum())
+
+    # combine the stats of rooms that were merged
+    stats = {}
+    for key in ["area", "row_sum", "col_sum"]:
+        stats[key] = np.bincount(final_room, weights = np.concatenate([s[key] for s in band_stats]), minlength = num_rooms)
+    stats["area"] = stats["area"].astype(np.int64)
+    for key, combine, fill in [["min_row", np.minimum, np.iinfo(np.int64).max], ["max_row", np.maximum, -1],
+                               ["min_col", np.minimum, np.iinfo(np.int64).max], ["max_col", np.maximum, -1]]:
+        stats[key] = np.full(num_rooms, fill)
+        combine.at(stats[key], final_room, np.concatenate([s[key] for s in band_stats]))
+
+    # second pass to write the final room numbers into the label grid
+    relabel = np.concatenate([[0], final_room + 1])
+    for start, stop in get_bands(num_rows, band_rows):
+        labels[start:stop] = relabel[labels[start:stop]]
+
+    return [labels, stats]
+
+
+# function to add items and enemies to a grid on disk a band at a time
+def add_detail_on_disk(folder, grid, prob_item, prob_enemy, band_rows, rng=None):
+    """
+    This function runs map_helpers.add_detail() on each band of the map (with its halo rows,
+    so the neighbor counts at the band edges are right) and writes the band to the final map.
+
+    Args:
+        folder: string, folder to store the final map in
+        grid: np.memmap, the connected map
+        prob_item: float, desired probability of spawning gold nodes
+        prob_enemy: float, desired probability of spawning enemies
+        band_rows: int, number of rows to update at a time
+        rng: np.random.Generator, defaults to None to use numpy's global random state.
+
+    Returns:
+        np.memmap with the final map
+
+    Note:
+        Cells in the halo rows are also given a chance to spawn items while their band is
+        processed, but only the band's own rows are kept, so each cell is written once.
+    """
+    final_map = create_disk_grid(folder, "map.npy", grid.shape)
+
+    for start, stop in get_bands(grid.shape[0], band_rows):
+        band, offset = read_band_with_halo(grid, start, stop)
+        detailed_band = maps.add_detail(band, prob_item, prob_enemy, 0, -1, -1, animate_flag = False, rng = rng)[0]
+        final_map[start:stop] = detailed_band[offset:offset + stop - start]
+
+    return final_map
+
+
+# function to run the whole map pipeline on disk
+def create_map_out_of_core(folder, height, width, density, seed, iterations, prob_item, prob_enemy, band_rows=1024):
+    """
+    This function creates a connected map with items and enemies, like map_helpers.create_complete_map()
+    but without spawn / exit points, keeping every grid on disk. Memory use is bounded by
+    band_rows x width (plus the list of rooms), so maps larger than RAM can be made.
+
+    Args:
+        folder: string, folder to store the grids in (created if it doesn't exist)
+        height: int, the height of the desired map
+        width: int, the width of the desired map
+        density: int, between 0 - 100 for density of black pixels / walls.
+        seed: int, to control random number generation
+        iterations: int, number of iterations over which to apply Cellular Automata (CA) rules.
+        prob_item: float, probability of spawning a gold-node
+        prob_enemy: float, probability of spawning an enemy.
+        band_rows: int, defaults to 1024, number of rows to hold in memory at a time
+
+    Returns:
+        List: with elements [
+            final_map (idx 0): np.memmap of the final map, saved as map.npy in folder,
+            all_rooms (idx 1): list of room midpoints [x, y, area] like get_room_midpoints() gives,
+            labels (idx 2): np.memmap of room labels before rooms were connected, saved as labels.npy,
+            iterations_run (idx 3): int, number of CA steps actually computed
+        ]
+    """
+    os.makedirs(folder, exist_ok = True)
+
+    # same per-stage generators as map_helpers.create_complete_map()
+    rngs = maps.spawn_map_rngs(seed)
+
+    # noise, then CA smoothing (the noise file isn't needed after that)
+    noise_grid = create_noise_on_disk(folder, height, width, density, seed, band_rows, rng = rngs["noise"])
+    ca_grid, iterations_run = run_ca_on_disk(folder, noise_grid, iterations, band_rows)
+    noise_path = noise_grid.filename
+    del noise_grid
+    os.remove(noise_path)
+
+    # label rooms and get their midpoints
+    labels, stats = find_rooms_on_disk(folder, ca_grid, band_rows)
+    all_rooms = [
+        [(min_x + max_x) // 2, (min_y + max_y) // 2, area]
+        for min_x, max_x, min_y, max_y, area in zip(
+            stats["min_row"].tolist(), stats["max_row"].tolist(),
+            stats["min_col"].tolist(), stats["max_col"].tolist(), stats["area"].tolist()
+        )
+    ]
+
+    # connect rooms (paths are carved straight into the memory-mapped grid, a batch of paths at a time), then add details
+    maps.connect_map(ca_grid, all_rooms, 3, -1, density, seed, animate_flag = False, rng = rngs["connect"])
+    final_map = add_detail_on_disk(folder, ca_grid, prob_item, prob_enemy, band_rows, rng = rngs["detail"])
+
+    ca_path = ca_grid.filename
+    del ca_grid
+    os.remove(ca_path)
+
+    return [final_map, all_rooms, labels, iterations_run]
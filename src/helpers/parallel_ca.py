@@ -0,0 +1,173 @@
+"""
+This file contains a multi-core version of the Cellular Automata (CA) for very large maps.
+
+The grid is split into bands of rows, and each worker process updates its own band.
+Both the current grid and the next grid live in shared memory, so a worker can read
+the one row above and below its band (its halo) straight from its neighbors' bands
+after every iteration, without copying anything between processes. A barrier makes sure
+every band is finished before anyone starts the next iteration, and then the two grids swap roles.
+"""
+
+
+import os # for counting cpu cores.
+import multiprocessing as mp # for worker processes and the barrier between iterations.
+from multiprocessing import shared_memory # for the grids shared by all workers.
+import numpy as np # for the CA step on each band.
+from . import ca_rules # lookup tables for CA rules.
+
+
+# function for each worker process to update its band of rows
+def update_band(grid_names, flags_name, grid_shape, num_workers, worker_idx, first_row, last_row, lut, num_iterations, barrier):
+    """
+    This function runs in a worker process. Each iteration it reads its band (plus one halo
+    row on each side) from the current shared grid, writes the new band into the other shared
+    grid, and waits at the barrier for the other workers. If no band changed, the grid is
+    stable, so every worker stops after the same iteration.
+
+    Args:
+        grid_names: list of the 2 shared memory names holding the padded grids
+        flags_name: string, name of the shared memory holding each worker's "changed" flags
+        grid_shape: tuple, shape of the padded grids
+        num_workers: int, total number of workers
+        worker_idx: int, index of this worker
+        first_row: int, first padded row index in this worker's band
+        last_row: int, one past the last padded row index in this worker's band
+        lut: np matrix from ca_rules.compile_rule()
+        num_iterations: int, the max number of iterations to run
+        barrier: multiprocessing Barrier shared by all workers
+
+    Returns:
+        None, but the shared grids are updated in place
+    """
+    memory = [shared_memory.SharedMemory(name = name) for name in grid_names]
+    flags_memory = shared_memory.SharedMemory(name = flags_name)
+
+    try:
+        grids = [np.ndarray(grid_shape, dtype = np.uint8, buffer = m.buf) for m in memory]
+
+        # flags[parity, worker] is 1 if the worker's band changed on an iteration, and
+        # flags[2, 0] holds the number of iterations run. Alternating rows by parity means
+        # nobody overwrites a flag that a slower worker could still be reading.
+        flags = np.ndarray((3, num_workers), dtype = np.int64, buffer = flags_memory.buf)
+        num_rows = last_row - first_row
+        num_cols = grid_shape[1] - 2
+
+        for i in range(1, num_iterations + 1):
+            current = grids[(i - 1) % 2]
+            new = grids[i % 2]
+
+            # count walls using the band plus its halo rows (border rows are walls already)
+            walls = current[first_row - 1:last_row + 1] == 1
+            num_neighboring_walls = np.zeros(shape = (num_rows, num_cols), dtype = np.uint8)
+            for row_offset in range(3):
+                for col_offset in range(3):
+                    if row_offset == 1 and col_offset == 1:
+                        continue
+                    num_neighboring_walls += walls[row_offset:row_offset + num_rows, col_offset:col_offset + num_cols]
+
+            old_band = current[first_row:last_row, 1:-1]
+            new_band = lut[old_band, num_neighboring_walls]
+            new[first_row:last_row, 1:-1] = new_band
+            flags[i % 2, worker_idx] = int(not np.array_equal(new_band, old_band))
+
+            # wait for every band to finish before reading halos or flags for the next iteration
+            barrier.wait()
+
+            if worker_idx == 0:
+                flags[2, 0] = i
+            if not flags[i % 2].any():
+                break
+    finally:
+        # drop the numpy views before closing, or the shared memory can't be released
+        grids = flags = current = new = old_band = None
+        for m in memory:
+            m.close()
+        flags_memory.close()
+
+
+# function to run the CA across several worker processes
+def create_map_with_ca_parallel(starting_grid, num_iterations, rule=ca_rules.DEFAULT_RULE, num_workers=None):
+    """
+    This function applies the same CA rules as map_helpers.create_map_with_ca(), split across
+    worker processes that each update a band of rows in shared memory. The result is exactly
+    the same as the single process engines. Stops early once the grid is stable.
+
+    Args:
+        starting_grid: np matrix, with 0s / 1s to represent floors / walls.
+        num_iterations: int, how many time steps over which to apply the CA rules.
+        rule: string in B/S notation or a table from ca_rules.compile_rule(), defaults to the original map rule.
+        num_workers: int, defaults to None to use one worker per cpu core.
+
+    Returns:
+        List: with elements [
+            modified_grid (idx 0): np matrix after the CA rules are applied, same dtype as starting_grid,
+            iterations_run (idx 1): int, number of CA steps actually computed,
+            cycle_length (idx 2): int, 1 if the grid became stable, else 0
+        ]
+    """
+    if num_iterations < 1:
+        return [starting_grid.copy(), 0, 0]
+
+    lut = ca_rules.compile_rule(rule)
+    num_rows = starting_grid.shape[0]
+    num_cols = starting_grid.shape[1]
+
+    # no point in having more workers than rows
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, num_rows))
+
+    # create both padded grids in shared memory, with a border of walls
+    grid_shape = (num_rows + 2, num_cols + 2)
+    memory = [shared_memory.SharedMemory(create = True, size = grid_shape[0] * grid_shape[1]) for _ in range(2)]
+    flags_memory = shared_memory.SharedMemory(create = True, size = 3 * num_workers * 8)
+
+    try:
+        grids = [np.ndarray(grid_shape, dtype = np.uint8, buffer = m.buf) for m in memory]
+        for grid in grids:
+            grid[...] = 1
+            grid[1:-1, 1:-1] = ca_rules.get_cell_states(starting_grid, lut)
+        flags = np.ndarray((3, num_workers), dtype = np.int64, buffer = flags_memory.buf)
+        flags[...] = 0
+
+        # split rows into bands of (almost) equal size, in padded row indices
+        band_edges = np.linspace(1, num_rows + 1, num_workers + 1).astype(int)
+
+        context = mp.get_context()
+        barrier = context.Barrier(num_workers)
+        workers = []
+        for worker_idx in range(num_workers):
+            worker = context.Process(
+                target = update_band,
+                args = (
+                    [m.name for m in memory], flags_memory.name, grid_shape, num_workers, worker_idx,
+                    band_edges[worker_idx], band_edges[worker_idx + 1], lut, num_iterations, barrier
+                )
+            )
+            worker.start()
+            workers.append(worker)
+
+        # wait for the workers, and if any of them fails, break the barrier so the rest don't wait forever
+        failed = False
+        while any(w.is_alive() for w in workers):
+            for w in workers:
+                w.join(timeout = 0.1)
+                if w.exitcode not in (None, 0) and not failed:
+                    failed = True
+                    barrier.abort()
+        if failed or any(w.exitcode != 0 for w in workers):
+            raise Exception("A parallel CA worker failed, try engine = 'numpy'.")
+
+        iterations_run = int(flags[2, 0])
+        cycle_length = 1 if iterations_run < num_iterations else 0
+        modified_grid = grids[iterations_run % 2][1:-1, 1:-1].astype(starting_grid.dtype)
+    finally:
+        # drop the numpy views before closing, or the shared memory can't be released
+        grids = flags = grid = None
+        for m in memory:
+            m.close()
+            m.unlink()
+        flags_memory.close()
+        flags_memory.unlink()
+
+    return [modified_grid, iterations_run, cycle_length]
@@ -0,0 +1,158 @@
+"""
+This file contains a table of how well each set of map params has worked before, so map
+creation can start from params that are likely to give a valid map on the first try.
+
+The table is keyed by (height, width, density, iterations). For each key it counts how many
+maps were made and how many were valid, and adds up the room counts and creation times, so
+averages can be worked out at any point. It's stored as a JSON file, so it carries over between
+runs of the game, and it can be filled in offline from a batch of maps with build_param_table.py.
+Every map made with create_complete_map(..., param_table = table) is also recorded as it goes.
+"""
+
+
+import json # for saving and loading the table.
+import os # for checking whether the table file exists.
+
+
+# function to get the table key for a set of params
+def get_param_key(height, width, density, iterations):
+    """
+    This function makes the key for a set of params. JSON objects need string keys, so it's a string.
+
+    Args:
+        height: int, the height of the map
+        width: int, the width of the map
+        density: int, density of the noise grid
+        iterations: int, number of CA iterations
+
+    Returns:
+        string, e.g. "100,100,63,15"
+    """
+    return f"{height},{width},{density},{iterations}"
+
+
+# function to load the table from a JSON file
+def load_param_table(path):
+    """
+    This function loads a table saved with save_param_table().
+
+    Args:
+        path: string, path to the JSON file
+
+    Returns:
+        dict, the table (empty if the file doesn't exist yet)
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+# function to save the table to a JSON file
+def save_param_table(param_table, path):
+    """
+    This function saves the table, replacing the file in one step so a crash never leaves half a table.
+
+    Args:
+        param_table: dict from load_param_table()
+        path: string, path to the JSON file
+
+    Returns:
+        None
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(param_table, f, indent = 1, sort_keys = True)
+    os.replace(temp_path, path)
+
+
+# function to record how a map with a set of params turned out
+def record_generation(param_table, height, width, density, iterations, success, num_rooms=None, gen_time=None):
+    """
+    This function adds one map to the table.
+
+    Args:
+        param_table: dict from load_param_table()
+        height, width, density, iterations: ints, the params the map was made with
+        success: bool, whether the map was valid
+        num_rooms: int, defaults to None if unknown, number of rooms on the map
+        gen_time: float, defaults to None if unknown, seconds it took to make the map
+
+    Returns:
+        None, param_table is updated in place
+    """
+    entry = param_table.setdefault(get_param_key(height, width, density, iterations), {
+        "attempts": 0, "successes": 0, "room_samples": 0, "total_rooms": 0, "time_samples": 0, "total_time": 0.0
+    })
+
+    entry["attempts"] += 1
+    entry["successes"] += int(bool(success))
+    if num_rooms is not None:
+        entry["room_samples"] += 1
+        entry["total_rooms"] += int(num_rooms)
+    if gen_time is not None:
+        entry["time_samples"] += 1
+        entry["total_time"] += float(gen_time)
+
+
+# function to get the averages for a set of params
+def get_param_stats(param_table, height, width, density, iterations):
+    """
+    This function works out the success rate, average room count and average creation time for a set of params.
+
+    Args:
+        param_table: dict from load_param_table()
+        height, width, density, iterations: ints, the params to look up
+
+    Returns:
+        dict with "attempts", "success_rate", "avg_rooms" and "avg_time" (None if there aren't any samples),
+        or None if these params were never recorded
+    """
+    entry = param_table.get(get_param_key(height, width, density, iterations))
+    if entry is None or entry["attempts"] == 0:
+        return None
+
+    return {
+        "attempts": entry["attempts"],
+        "success_rate": entry["successes"] / entry["attempts"],
+        "avg_rooms": entry["total_rooms"] / entry["room_samples"] if entry["room_samples"] > 0 else None,
+        "avg_time": entry["total_time"] / entry["time_samples"] if entry["time_samples"] > 0 else None,
+    }
+
+
+# function to suggest params that are likely to give a valid map
+def suggest_parameters(param_table, height, width, density, iterations, max_offset=3, min_attempts=5):
+    """
+    This function looks at the recorded params for this map size near the requested density and iterations,
+    and picks the ones with the best success rate. Ties go to the params closest to the request, then to the fastest.
+    Params with fewer than min_attempts maps are skipped, since a couple of lucky maps don't say much.
+
+    Args:
+        param_table: dict from load_param_table()
+        height: int, the height of the map
+        width: int, the width of the map
+        density: int, the requested density
+        iterations: int, the requested number of CA iterations
+        max_offset: int, defaults to 3, how far density and iterations can each move from the request
+        min_attempts: int, defaults to 5, the fewest recorded maps for params to be considered
+
+    Returns:
+        List, [density, iterations] to use, the request itself if nothing near it has been recorded enough
+    """
+    best = None
+
+    for d in range(density - max_offset, density + max_offset + 1):
+        for i in range(max(iterations - max_offset, 1), iterations + max_offset + 1):
+            stats = get_param_stats(param_table, height, width, d, i)
+            if stats is None or stats["attempts"] < min_attempts:
+                continue
+
+            # higher success rate first, then closer to the request, then faster
+            avg_time = stats["avg_time"] if stats["avg_time"] is not None else float("inf")
+            rank = (-stats["success_rate"], abs(d - density) + abs(i - iterations), avg_time)
+            if best is None or rank < best[0]:
+                best = [rank, d, i]
+
+    if best is None:
+        return [density, iterations]
+    return [best[1], best[2]]
@@ -0,0 +1,514 @@
+"""
+This file contains functions to find paths between two cells of the map, with A* or
+jump point search (JPS), moving through either the von Neumann neighborhood (4 directions)
+or the Moore neighborhood (8 directions).
+
+Both search the grid itself, so nothing like create_adjacency_matrix() is ever built. A path
+finder is created once per map, and it holds every buffer the searches need: the walkable
+cells (with a border of walls around the map, so there's no bounds checking), and the cost,
+parent and visited buffers for every cell. Instead of clearing those buffers before each
+query, each query gets a new number, and a cell's buffers only count for a query if the cell
+was stamped with that query's number. So a query only costs as much as the cells it touches,
+however big the map is.
+
+With 8 directions, a diagonal move is only allowed if both cells beside it can be walked on,
+so paths never cut past the corner of a wall. JPS finds the same path costs as A*, but skips
+over runs of open cells that A* would add to its queue one at a time. That pays off in large open
+areas, but the rough walls of a CA cave force a jump point every few cells, and each jump scans
+ahead, so on cave maps plain A* is usually faster and is the default.
+
+The searches run one cell at a time in plain Python, so the buffers are Python lists and a
+bytearray instead of np arrays, since those are much faster to read one element at a time.
+"""
+
+
+import heapq # priority queue for the open list.
+import math # for sqrt(2), the cost of a diagonal move.
+from . import reachability # the walkable states.
+
+
+# cost of a diagonal move
+DIAGONAL_COST = math.sqrt(2)
+
+
+# function to create a path finder for a map
+def create_path_finder(grid, connectivity=4):
+    """
+    This function sets up everything the path searches need for a map. It only needs to be made once per map,
+    and tiles should then be changed with set_tile() so the finder stays up to date.
+
+    Args:
+        grid: np matrix w/ game map
+        connectivity: int, defaults to 4 to move up, down, left and right. 8 also allows diagonal moves.
+
+    Returns:
+        dict with:
+            "grid": the map,
+            "connectivity": int, 4 or 8,
+            "cols": int, number of cols including the border,
+            "walkable": bytearray, 1 for each walkable cell, with a border of 0s around the map,
+            "g": list, cost of the best path found to each cell,
+            "parent": list, flat index of the cell each cell was reached from,
+            "seen": list, number of the last query that reached each cell,
+            "closed": list, number of the last query that expanded each cell,
+            "query": int, number of the last query
+    """
+    if connectivity not in (4, 8):
+        raise Exception(f"Unable to create path finder: connectivity must be 4 or 8, not {connectivity}.")
+
+    num_rows = grid.shape[0] + 2
+    num_cols = grid.shape[1] + 2
+    num_cells = num_rows * num_cols
+
+    walkable = bytearray(num_cells)
+    mask = reachability.get_walkable_mask(grid)
+    for x in range(grid.shape[0]):
+        start = (x + 1) * num_cols + 1
+        walkable[start:start + grid.shape[1]] = mask[x].tobytes()
+
+    return {
+        "grid": grid,
+        "connectivity": connectivity,
+        "cols": num_cols,
+        "walkable": walkable,
+        "g": [0.0] * num_cells,
+        "parent": [-1] * num_cells,
+        "seen": [0] * num_cells,
+        "closed": [0] * num_cells,
+        "query": 0,
+    }
+
+
+# function to change a tile and keep the path finder up to date
+def set_tile(finder, x, y, state):
+    """
+    This function sets one tile of the map, and updates whether it can be walked on.
+
+    Args:
+        finder: dict from create_path_finder()
+        x: int, row of the tile
+        y: int, col of the tile
+        state: int, the tile's new state
+
+    Returns:
+        None, the grid and finder are updated in place
+    """
+    finder["grid"][x, y] = state
+    finder["walkable"][(x + 1) * finder["cols"] + y + 1] = state in reachability.WALKABLE_STATES
+
+
+# function to get the flat index of a cell
+def get_index(finder, cell):
+    """
+    This function turns an [x, y] cell of the map into its index in the finder's buffers.
+
+    Args:
+        finder: dict from create_path_finder()
+        cell: [x, y] of the cell
+
+    Returns:
+        int, the flat index
+    """
+    return (int(cell[0]) + 1) * finder["cols"] + int(cell[1]) + 1
+
+
+# function to get the [x, y] of a flat index
+def get_cell(finder, idx):
+    """
+    This function turns an index in the finder's buffers back into an [x, y] cell of the map.
+
+    Args:
+        finder: dict from create_path_finder()
+        idx: int, the flat index
+
+    Returns:
+        List, [x, y] of the cell
+    """
+    x, y = divmod(idx, finder["cols"])
+    return [x - 1, y - 1]
+
+
+# function to get the cost of moving between two cells in a straight or diagonal line
+def get_line_cost(finder, idx1, idx2):
+    """
+    This function finds the cost of the cheapest moves between two cells, if nothing was in the way:
+    the manhattan distance with 4 directions, or the octile distance with 8 directions.
+    It's used both as the A* heuristic and as the cost between two jump points.
+
+    Args:
+        finder: dict from create_path_finder()
+        idx1: int, flat index of the first cell
+        idx2: int, flat index of the second cell
+
+    Returns:
+        float, the cost
+    """
+    x1, y1 = divmod(idx1, finder["cols"])
+    x2, y2 = divmod(idx2, finder["cols"])
+    dx = abs(x1 - x2)
+    dy = abs(y1 - y2)
+
+    if finder["connectivity"] == 4:
+        return float(dx + dy)
+    return max(dx, dy) + (DIAGONAL_COST - 1) * min(dx, dy)
+
+
+# function to start a new query
+def begin_query(finder):
+    """
+    This function gives the next query its number. Buffers stamped with older numbers are ignored,
+    so nothing needs to be cleared between queries.
+
+    Args:
+        finder: dict from create_path_finder()
+
+    Returns:
+        int, the new query's number
+    """
+    finder["query"] += 1
+    return finder["query"]
+
+
+# function to get the path found by the last query
+def build_path(finder, goal_idx):
+    """
+    This function follows the parents from the goal back to the start, and fills in every cell
+    between consecutive cells of the chain (JPS parents can be many cells apart, always in a straight
+    or diagonal line).
+
+    Args:
+        finder: dict from create_path_finder()
+        goal_idx: int, flat index of the goal
+
+    Returns:
+        List, [x, y] of every cell on the path, from the start to the goal
+    """
+    cols = finder["cols"]
+    parent = finder["parent"]
+    chain = [goal_idx]
+    while parent[chain[-1]] >= 0:
+        chain.append(parent[chain[-1]])
+    chain.reverse()
+
+    path = [get_cell(finder, chain[0])]
+    for prev_idx, idx in zip(chain[:-1], chain[1:]):
+        x1, y1 = divmod(prev_idx, cols)
+        x2, y2 = divmod(idx, cols)
+        step_x = (x2 > x1) - (x2 < x1)
+        step_y = (y2 > y1) - (y2 < y1)
+        for s in range(1, max(abs(x2 - x1), abs(y2 - y1)) + 1):
+            path.append([x1 + s * step_x - 1, y1 + s * step_y - 1])
+
+    return path
+
+
+# function to get the cost of a path
+def get_path_cost(path):
+    """
+    This function adds up the cost of every move along a path from find_path(): 1 for each
+    straight move and sqrt(2) for each diagonal move.
+
+    Args:
+        path: list of [x, y] cells
+
+    Returns:
+        float, the total cost
+    """
+    cost = 0.0
+    for (x1, y1), (x2, y2) in zip(path[:-1], path[1:]):
+        cost += DIAGONAL_COST if x1 != x2 and y1 != y2 else 1.0
+    return cost
+
+
+# function to find a path with A*
+def find_path_astar(finder, start, goal, regions=None, allowed_regions=None):
+    """
+    This function finds a cheapest path from start to goal with A*.
+
+    Args:
+        finder: dict from create_path_finder()
+        start: [x, y] of the start cell
+        goal: [x, y] of the goal cell
+        regions: defaults to None, or a region id for every flat index (like the "region_flat" of a
+            hierarchical_paths planner), to only search the cells in allowed_regions
+        allowed_regions: set of region ids the path may go through, only used with regions
+
+    Returns:
+        List, [x, y] of every cell on the path from start to goal, or None if there isn't one
+        (including when start or goal can't be walked on). With regions, it's the cheapest path
+        that stays inside allowed_regions.
+    """
+    cols = finder["cols"]
+    walkable = finder["walkable"]
+    g = finder["g"]
+    parent = finder["parent"]
+    seen = finder["seen"]
+    closed = finder["closed"]
+    start_idx = get_index(finder, start)
+    goal_idx = get_index(finder, goal)
+
+    if not walkable[start_idx] or not walkable[goal_idx]:
+        return None
+
+    # each move is (step, cost, side_a, side_b). A diagonal move needs both sides open,
+    # and a straight move checks its own cell (side 0) twice, which is already known to be open.
+    moves = [(-cols, 1.0, 0, 0), (cols, 1.0, 0, 0), (-1, 1.0, 0, 0), (1, 1.0, 0, 0)]
+    if finder["connectivity"] == 8:
+        moves += [(d_x + d_y, DIAGONAL_COST, d_x, d_y) for d_x in (-cols, cols) for d_y in (-1, 1)]
+
+    goal_x, goal_y = divmod(goal_idx, cols)
+    octile = finder["connectivity"] == 8
+    restricted = regions is not None
+    query = begin_query(finder)
+
+    g[start_idx] = 0.0
+    parent[start_idx] = -1
+    seen[start_idx] = query
+    h = get_line_cost(finder, start_idx, goal_idx)
+    open_list = [(h, h, start_idx)]
+
+    while open_list:
+        f, h, idx = heapq.heappop(open_list)
+        if closed[idx] == query:
+            continue
+        if idx == goal_idx:
+            return build_path(finder, goal_idx)
+        closed[idx] = query
+        g_idx = g[idx]
+
+        for step, cost, side_a, side_b in moves:
+            n = idx + step
+            if not walkable[n] or closed[n] == query or not walkable[idx + side_a] or not walkable[idx + side_b]:
+                continue
+            if restricted and regions[n] not in allowed_regions:
+                continue
+
+            new_g = g_idx + cost
+            if seen[n] != query or new_g < g[n]:
+                seen[n] = query
+                g[n] = new_g
+                parent[n] = idx
+
+                # heuristic inlined, since this is the hottest loop
+                n_x, n_y = divmod(n, cols)
+                dx = abs(n_x - goal_x)
+                dy = abs(n_y - goal_y)
+                h = max(dx, dy) + (DIAGONAL_COST - 1) * min(dx, dy) if octile else dx + dy
+                heapq.heappush(open_list, (new_g + h, h, n))
+
+    return None
+
+
+# function to jump in a straight line
+def jump_straight(walkable, idx, step, side, goal_idx):
+    """
+    This function moves from idx in a straight line until it finds a jump point: the goal, or a
+    cell with a forced neighbor (an open cell beside it whose cell behind is a wall, which
+    can't be reached any better than through this cell).
+
+    Args:
+        walkable: bytearray from create_path_finder()
+        idx: int, flat index to jump from
+        step: int, flat offset of one move in the jump's direction
+        side: int, flat offset of one move at a right angle to step
+        goal_idx: int, flat index of the goal
+
+    Returns:
+        int, flat index of the jump point, or -1 if the line runs into a wall first
+    """
+    while True:
+        idx += step
+        if not walkable[idx]:
+            return -1
+        if idx == goal_idx:
+            return idx
+        if (walkable[idx + side] and not walkable[idx - step + side]) or (walkable[idx - side] and not walkable[idx - step - side]):
+            return idx
+
+
+# function to jump in any direction
+def jump(finder, idx, d_x, d_y, goal_idx):
+    """
+    This function moves from idx in direction (d_x, d_y) until it finds a jump point.
+    With 8 directions, diagonal jumps stop wherever a straight jump along either of their parts would find one.
+    With 4 directions, jumps along x stop wherever a jump along y would find one.
+    All the jumps are loops, so they never run into the recursion limit, even on very open maps.
+
+    Args:
+        finder: dict from create_path_finder()
+        idx: int, flat index to jump from
+        d_x: int, -1, 0 or 1, row direction
+        d_y: int, -1, 0 or 1, col direction
+        goal_idx: int, flat index of the goal
+
+    Returns:
+        int, flat index of the jump point, or -1 if there isn't one
+    """
+    cols = finder["cols"]
+    walkable = finder["walkable"]
+    step_x = d_x * cols
+
+    # diagonal jump (only with 8 directions)
+    if d_x != 0 and d_y != 0:
+        while True:
+            if not walkable[idx + step_x] or not walkable[idx + d_y]:
+                return -1
+            idx += step_x + d_y
+            if not walkable[idx]:
+                return -1
+            if idx == goal_idx:
+                return idx
+            if jump_straight(walkable, idx, step_x, 1, goal_idx) >= 0 or jump_straight(walkable, idx, d_y, cols, goal_idx) >= 0:
+                return idx
+
+    # along y, or along x with 8 directions
+    if d_x == 0:
+        return jump_straight(walkable, idx, d_y, cols, goal_idx)
+    if finder["connectivity"] == 8:
+        return jump_straight(walkable, idx, step_x, 1, goal_idx)
+
+    # along x with 4 directions, the only way to turn onto y is at a jump point
+    while True:
+        idx += step_x
+        if not walkable[idx]:
+            return -1
+        if idx == goal_idx:
+            return idx
+        if (walkable[idx + 1] and not walkable[idx - step_x + 1]) or (walkable[idx - 1] and not walkable[idx - step_x - 1]):
+            return idx
+        if jump_straight(walkable, idx, 1, cols, goal_idx) >= 0 or jump_straight(walkable, idx, -1, cols, goal_idx) >= 0:
+            return idx
+
+
+# function to find which directions to jump in from a jump point
+def get_jump_directions(finder, idx, parent_idx):
+    """
+    This function prunes the directions to search from idx, given the direction it was reached from.
+    Every other neighbor can be reached at least as cheaply without going through idx.
+
+    Args:
+        finder: dict from create_path_finder()
+        idx: int, flat index of the jump point
+        parent_idx: int, flat index of the cell idx was jumped to from, or -1 for the start
+
+    Returns:
+        List of (d_x, d_y) directions
+    """
+    cols = finder["cols"]
+    walkable = finder["walkable"]
+
+    if parent_idx < 0:
+        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        if finder["connectivity"] == 8:
+            directions += [(d_x, d_y) for d_x in (-1, 1) for d_y in (-1, 1) if walkable[idx + d_x * cols] and walkable[idx + d_y]]
+        return directions
+
+    x, y = divmod(idx, cols)
+    parent_x, parent_y = divmod(parent_idx, cols)
+    d_x = (x > parent_x) - (x < parent_x)
+    d_y = (y > parent_y) - (y < parent_y)
+
+    if finder["connectivity"] == 4:
+        if d_x != 0:
+            return [(d_x, 0), (0, -1), (0, 1)]
+        return [(0, d_y), (-1, 0), (1, 0)]
+
+    # with 8 directions, keep going straight / diagonally, plus any turns a wall could have forced
+    if d_x != 0 and d_y != 0:
+        directions = [(d_x, 0), (0, d_y)]
+        if walkable[idx + d_x * cols] and walkable[idx + d_y]:
+            directions.append((d_x, d_y))
+        return directions
+
+    if d_x != 0:
+        sides = [(0, s) for s in (-1, 1) if walkable[idx + s]]
+        ahead_open = walkable[idx + d_x * cols]
+    else:
+        sides = [(s, 0) for s in (-1, 1) if walkable[idx + s * cols]]
+        ahead_open = walkable[idx + d_y]
+
+    directions = list(sides)
+    if ahead_open:
+        directions.append((d_x, d_y))
+        directions += [(d_x + s_x, d_y + s_y) for s_x, s_y in sides]
+    return directions
+
+
+# function to find a path with jump point search
+def find_path_jps(finder, start, goal):
+    """
+    This function finds a cheapest path from start to goal with jump point search. It's A* where each
+    step jumps ahead to the next cell where the path might need to turn, instead of to a neighbor.
+
+    Args:
+        finder: dict from create_path_finder()
+        start: [x, y] of the start cell
+        goal: [x, y] of the goal cell
+
+    Returns:
+        List, [x, y] of every cell on the path from start to goal, or None if there isn't one
+        (including when start or goal can't be walked on)
+    """
+    walkable = finder["walkable"]
+    g = finder["g"]
+    parent = finder["parent"]
+    seen = finder["seen"]
+    closed = finder["closed"]
+    start_idx = get_index(finder, start)
+    goal_idx = get_index(finder, goal)
+
+    if not walkable[start_idx] or not walkable[goal_idx]:
+        return None
+
+    query = begin_query(finder)
+    g[start_idx] = 0.0
+    parent[start_idx] = -1
+    seen[start_idx] = query
+    h = get_line_cost(finder, start_idx, goal_idx)
+    open_list = [(h, h, start_idx)]
+
+    while open_list:
+        f, h, idx = heapq.heappop(open_list)
+        if closed[idx] == query:
+            continue
+        if idx == goal_idx:
+            return build_path(finder, goal_idx)
+        closed[idx] = query
+
+        for d_x, d_y in get_jump_directions(finder, idx, parent[idx]):
+            n = jump(finder, idx, d_x, d_y, goal_idx)
+            if n < 0 or closed[n] == query:
+                continue
+
+            new_g = g[idx] + get_line_cost(finder, idx, n)
+            if seen[n] != query or new_g < g[n]:
+                seen[n] = query
+                g[n] = new_g
+                parent[n] = idx
+                h = get_line_cost(finder, n, goal_idx)
+                heapq.heappush(open_list, (new_g + h, h, n))
+
+    return None
+
+
+# function to find a path with either search
+def find_path(finder, start, goal, method="astar"):
+    """
+    This function finds a cheapest path from start to goal. Both methods find paths with the same cost,
+    but not always the same path when there are ties.
+
+    Args:
+        finder: dict from create_path_finder()
+        start: [x, y] of the start cell
+        goal: [x, y] of the goal cell
+        method: string, defaults to "astar" for A*, or "jps" for jump point search
+
+    Returns:
+        List, [x, y] of every cell on the path from start to goal, or None if there isn't one
+    """
+    if method == "astar":
+        return find_path_astar(finder, start, goal)
+    if method == "jps":
+        return find_path_jps(finder, start, goal)
+
+    raise Exception(f"Unable to find path: unknown method '{method}', use 'astar' or 'jps'.")
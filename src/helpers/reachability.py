@@ -0,0 +1,122 @@
+"""
+This file contains functions to find which cells of a map can be walked to from a start cell.
+
+The player (and enemies) move through the von Neumann neighborhood (up, down, left, right),
+and can only walk on floors (0) and enemy cells (3). Instead of a BFS that visits one cell
+at a time, every walkable region is labeled at once with the run-based union-find in
+labeling.py, set to 4-connectivity. That takes linear time however winding the map is, and
+after one labeling, checking whether any number of targets can be reached is a single array read.
+"""
+
+
+import numpy as np # for the walkable mask and reading labels.
+from . import labeling # linear time labeling of connected regions.
+
+
+# states that can be walked on: floors and enemies
+WALKABLE_STATES = [0, 3]
+
+
+# function to find which cells can be walked on
+def get_walkable_mask(grid):
+    """
+    This function finds the cells that can be walked on.
+
+    Args:
+        grid: np matrix w/ game map
+
+    Returns:
+        np matrix of bools, True for cells in WALKABLE_STATES
+    """
+    return np.isin(grid, WALKABLE_STATES)
+
+
+# function to label every walkable region of the map
+def label_walkable_regions(grid, start=None):
+    """
+    This function labels every region of walkable cells that are connected through the
+    von Neumann neighborhood. Two cells can be walked between if and only if they have
+    the same (non-zero) label.
+
+    Args:
+        grid: np matrix w/ game map
+        start: list with [x, y] of a cell to treat as walkable even if it isn't, defaults to None.
+            Like the BFS in the original verify_path(), a search can always leave its start cell.
+
+    Returns:
+        np matrix of int32, 0 for cells that can't be walked on, and region index + 1 otherwise
+    """
+    walkable = get_walkable_mask(grid)
+    if start is not None:
+        walkable[start[0], start[1]] = True
+
+    runs, run_regions, num_regions = labeling.label_runs(walkable, connectivity = 4)
+    return labeling.paint_labels(walkable, runs, run_regions)
+
+
+# function to find every cell that can be reached from a start cell
+def find_reachable(grid, start):
+    """
+    This function finds every cell that can be walked to from the start cell, in one pass over the map.
+    Works for maps of any shape.
+
+    Args:
+        grid: np matrix w/ game map
+        start: list with the [x, y] coordinates of the start cell
+
+    Returns:
+        np matrix of bools, True for every reachable cell (including the start cell)
+    """
+    labels = label_walkable_regions(grid, start)
+    return labels == labels[start[0], start[1]]
+
+
+# function to check which of many targets can be reached from a start cell
+def find_reachable_targets(grid, start, targets):
+    """
+    This function checks many targets against one start cell with a single labeling of the map,
+    e.g. to test every spawn / exit candidate at once.
+
+    Args:
+        grid: np matrix w/ game map
+        start: list with the [x, y] coordinates of the start cell
+        targets: list or np matrix with an [x, y] row for each target
+
+    Returns:
+        np array of bools, True for each target that can be reached from start
+    """
+    labels = label_walkable_regions(grid, start)
+    targets = np.asarray(targets, dtype = np.int64).reshape(-1, 2)
+    return labels[targets[:, 0], targets[:, 1]] == labels[start[0], start[1]]
+
+
+# function to check one start / target pair on each map in a stack
+def find_reachable_pairs(grids, starts, targets):
+    """
+    This function checks whether each map's target can be reached from its start, with a single labeling
+    for the whole stack. The maps are laid on top of each other with a row of walls between them, so no
+    region can run from one map into the next.
+
+    Args:
+        grids: np array with shape (num_maps, rows, cols), a stack of game maps
+        starts: list or np matrix with an [x, y] row for each map's start cell
+        targets: list or np matrix with an [x, y] row for each map's target cell
+
+    Returns:
+        np array of bools, True for each map whose target can be reached from its start
+    """
+    num_maps, num_rows, num_cols = grids.shape
+    starts = np.asarray(starts, dtype = np.int64).reshape(-1, 2)
+    targets = np.asarray(targets, dtype = np.int64).reshape(-1, 2)
+
+    # one tall map, with a wall row under each map
+    walkable = np.zeros(shape = (num_maps, num_rows + 1, num_cols), dtype = bool)
+    walkable[:, :num_rows] = get_walkable_mask(grids)
+    walkable[np.arange(num_maps), starts[:, 0], starts[:, 1]] = True
+    walkable = walkable.reshape(num_maps * (num_rows + 1), num_cols)
+
+    runs, run_regions, num_regions = labeling.label_runs(walkable, connectivity = 4)
+    labels = labeling.paint_labels(walkable, runs, run_regions)
+
+    row_offsets = np.arange(num_maps) * (num_rows + 1)
+    return labels[starts[:, 0] + row_offsets, starts[:, 1]] == labels[targets[:, 0] + row_offsets, targets[:, 1]]
@@ -0,0 +1,282 @@
+"""
+This file contains functions to choose which rooms get connected by corridors.
+
+Connecting each room to its n nearest neighbors can leave groups of rooms that only
+connect to each other. A minimum spanning tree (MST) over the room midpoints always
+connects every room, with the shortest total corridor length. For large maps the tree
+is built from each room's nearest neighbors, so it doesn't measure every pair of rooms. A few extra edges are
+then added back from the nearest neighbor candidates, so the map still has some loops
+instead of being a pure tree.
+"""
+
+
+import numpy as np # for distances and picking edges.
+from . import labeling # union-find for the groups the tree candidates leave.
+from . import spatial_index # nearest neighbors for the tree candidates and extra edges.
+
+
+# rooms up to this many get the exact MST over every pair of rooms, more than this use nearest neighbor candidates
+DENSE_MST_MAX_ROOMS = 256
+
+
+# function to find the minimum spanning tree over every pair of rooms
+def find_dense_minimum_spanning_tree(midpoints):
+    """
+    This function uses Prim's algorithm to find the minimum spanning tree of the complete
+    graph over the rooms, where each edge costs the manhattan distance between midpoints.
+    It measures every pair of rooms, so it's only used for small maps (see find_minimum_spanning_tree()).
+
+    Args:
+        midpoints: list or np matrix with an [x, y] (or [x, y, area]) row for each room
+
+    Returns:
+        np matrix of ints with shape (num_rooms - 1, 2), the [room_a, room_b] of each
+        tree edge, in the order they were added to the tree (starting from room 0)
+    """
+    points = spatial_index.get_points(midpoints)
+    num_rooms = len(points)
+    edges = np.zeros(shape = (max(num_rooms - 1, 0), 2), dtype = np.int64)
+    if num_rooms < 2:
+        return edges
+
+    # for each room outside the tree, the cheapest edge into the tree so far
+    in_tree = np.zeros(shape = num_rooms, dtype = bool)
+    best_cost = np.full(shape = num_rooms, fill_value = np.iinfo(np.int64).max)
+    best_parent = np.zeros(shape = num_rooms, dtype = np.int64)
+
+    newest = 0
+    in_tree[0] = True
+
+    for e in range(num_rooms - 1):
+
+        # the newest room in the tree might give some rooms a cheaper edge
+        costs = np.abs(points - points[newest]).sum(axis = 1)
+        cheaper = (costs < best_cost) & ~in_tree
+        best_cost[cheaper] = costs[cheaper]
+        best_parent[cheaper] = newest
+
+        # add the room with the cheapest edge (ties go to the lowest room index)
+        newest = int(np.argmin(np.where(in_tree, np.iinfo(np.int64).max, best_cost)))
+        in_tree[newest] = True
+        edges[e] = [best_parent[newest], newest]
+
+    return edges
+
+
+# function to find a room's root in the union-find
+def find_root(parent, room):
+    """
+    This function follows parent links up to the root of a room's group, halving the path as it goes.
+
+    Args:
+        parent: list of ints, parent of each room (roots are their own parent)
+        room: int, the room to look up
+
+    Returns:
+        int, the root room of the group
+    """
+    while parent[room] != room:
+        parent[room] = parent[parent[room]]
+        room = parent[room]
+    return room
+
+
+# function to add the candidate edges that join two groups, shortest first
+def add_kruskal_edges(points, candidates, parent, tree_edges):
+    """
+    This function runs Kruskal's algorithm over some candidate edges: going from shortest to longest,
+    an edge is added to the tree if its rooms are still in different groups, and the groups are merged.
+
+    Args:
+        points: np matrix with an [x, y] row for each room
+        candidates: np matrix of ints with a [room_a, room_b] row for each candidate edge
+        parent: list of ints from earlier calls (or list(range(num_rooms)) to start), updated in place
+        tree_edges: list of [room_a, room_b] tree edges, added to in place
+
+    Returns:
+        None
+    """
+    if len(candidates) == 0:
+        return
+
+    # shortest first, ties broken by room indices
+    lengths = np.abs(points[candidates[:, 0]] - points[candidates[:, 1]]).sum(axis = 1)
+    order = np.lexsort((candidates[:, 1], candidates[:, 0], lengths))
+
+    for room_a, room_b in candidates[order].tolist():
+        root_a = find_root(parent, room_a)
+        root_b = find_root(parent, room_b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+            tree_edges.append([room_a, room_b])
+
+
+# function to find the shortest edge out of each group of rooms
+def find_component_links(points, components, chunk_size=64):
+    """
+    This function finds, for every group of rooms except the largest, the shortest edge from
+    one of its rooms to a room outside the group. It measures every room in the group against
+    every room outside it, but it only runs when the nearest neighbor candidates left more than
+    one group, which are usually a few small, far away clusters.
+
+    Args:
+        points: np matrix with an [x, y] row for each room
+        components: np array, group label of each room (e.g. from labeling.merge_labels())
+        chunk_size: int, defaults to 64, rooms measured at once, to keep the distance matrices small
+
+    Returns:
+        np matrix of ints with a [room_a, room_b] row for each link
+    """
+    labels, sizes = np.unique(components, return_counts = True)
+    largest = labels[np.argmax(sizes)]
+    links = []
+
+    for label in labels:
+        if label == largest:
+            continue
+
+        inside = np.flatnonzero(components == label)
+        outside = np.flatnonzero(components != label)
+        best = None
+
+        for start in range(0, len(inside), chunk_size):
+            chunk = inside[start:start + chunk_size]
+            distances = np.abs(points[chunk][:, None, :] - points[outside][None, :, :]).sum(axis = 2)
+            i, j = np.unravel_index(np.argmin(distances), distances.shape)
+            if best is None or distances[i, j] < best[0]:
+                best = [distances[i, j], chunk[i], outside[j]]
+
+        links.append([best[1], best[2]])
+
+    return np.array(links, dtype = np.int64).reshape(-1, 2)
+
+
+# function to find the minimum spanning tree over the room midpoints
+def find_minimum_spanning_tree(midpoints, n_candidates=8):
+    """
+    This function finds a minimum spanning tree over the rooms, where each edge costs the manhattan distance between midpoints.
+    Up to DENSE_MST_MAX_ROOMS rooms, it's the exact tree over every pair of rooms (find_dense_minimum_spanning_tree()).
+    For more rooms, measuring every pair grows with the square of the number of rooms, so instead:
+        1. Each room's n_candidates nearest rooms (from the grid hash in spatial_index.py) are the candidate edges.
+        2. Kruskal's algorithm picks the tree edges out of the candidates.
+        3. If the candidates left the rooms in more than one group, the shortest edge out of each group joins them,
+           repeating until every room is connected.
+
+    Args:
+        midpoints: list or np matrix with an [x, y] (or [x, y, area]) row for each room
+        n_candidates: int, defaults to 8, number of nearest rooms per room to use as candidate edges
+
+    Returns:
+        np matrix of ints with shape (num_rooms - 1, 2), the [room_a, room_b] of each tree edge
+
+    Note:
+        Tree edges almost always join near neighbors, so with 8 candidates the tree nearly always has the same
+        length as the exact one. Edges come out shortest first, instead of in the order the dense version adds them.
+    """
+    points = spatial_index.get_points(midpoints)
+    num_rooms = len(points)
+    if num_rooms <= DENSE_MST_MAX_ROOMS:
+        return find_dense_minimum_spanning_tree(points)
+
+    # every nearest neighbor pair, stored once as (smaller index, larger index)
+    nearest_rooms = spatial_index.find_nearest_rooms(points, n_candidates)
+    room_a = np.repeat(np.arange(num_rooms), nearest_rooms.shape[1])
+    room_b = nearest_rooms.ravel()
+    candidates = np.unique(np.stack([np.minimum(room_a, room_b), np.maximum(room_a, room_b)], axis = 1), axis = 0)
+
+    parent = list(range(num_rooms))
+    tree_edges = []
+    add_kruskal_edges(points, candidates, parent, tree_edges)
+
+    # join any groups the candidates couldn't reach
+    while len(tree_edges) < num_rooms - 1:
+        edges = np.array(tree_edges, dtype = np.int64).reshape(-1, 2)
+        components = labeling.merge_labels(num_rooms, edges[:, 0], edges[:, 1])
+        add_kruskal_edges(points, find_component_links(points, components), parent, tree_edges)
+
+    return np.array(tree_edges, dtype = np.int64).reshape(-1, 2)
+
+
+# function to pick the extra loop edges to add on top of the tree
+def find_extra_edges(midpoints, tree_edges, n_neighbors, num_extra):
+    """
+    This function picks the shortest nearest-neighbor edges that aren't already in the tree.
+    Each one closes a loop in the room graph.
+
+    Args:
+        midpoints: list or np matrix with an [x, y] (or [x, y, area]) row for each room
+        tree_edges: np matrix from find_minimum_spanning_tree()
+        n_neighbors: int, candidate edges come from each room's n nearest neighbors
+        num_extra: int, how many extra edges to add (fewer if there aren't enough candidates)
+
+    Returns:
+        np matrix of ints with shape (<= num_extra, 2), the [room_a, room_b] of each extra edge, shortest first
+    """
+    points = spatial_index.get_points(midpoints)
+    num_rooms = len(points)
+    if num_extra <= 0 or num_rooms < 3:
+        return np.zeros(shape = (0, 2), dtype = np.int64)
+
+    # every nearest neighbor pair, stored once as (smaller index, larger index)
+    nearest_rooms = spatial_index.find_nearest_rooms(points, n_neighbors)
+    room_a = np.repeat(np.arange(num_rooms), nearest_rooms.shape[1])
+    room_b = nearest_rooms.ravel()
+    candidates = np.unique(np.stack([np.minimum(room_a, room_b), np.maximum(room_a, room_b)], axis = 1), axis = 0)
+
+    # drop the pairs that are already tree edges
+    tree_keys = np.minimum(tree_edges[:, 0], tree_edges[:, 1]) * num_rooms + np.maximum(tree_edges[:, 0], tree_edges[:, 1])
+    candidates = candidates[~np.isin(candidates[:, 0] * num_rooms + candidates[:, 1], tree_keys)]
+
+    # shortest first, ties broken by room indices
+    lengths = np.abs(points[candidates[:, 0]] - points[candidates[:, 1]]).sum(axis = 1)
+    order = np.lexsort((candidates[:, 1], candidates[:, 0], lengths))
+    return candidates[order[:num_extra]]
+
+
+# function to remove repeated connections between the same two rooms
+def dedupe_connections(connections):
+    """
+    This function keeps only the first connection between each pair of rooms, in whichever
+    direction it was first listed. E.g. if two rooms are each other's nearest neighbors, 
+    only one path is made between them instead of two.
+
+    Args:
+        connections: np matrix of ints with a [room_a, room_b] row for each connection
+
+    Returns:
+        np matrix of ints, the unique connections in their original order
+    """
+    if len(connections) == 0:
+        return connections
+
+    pairs = np.sort(connections, axis = 1)
+    first_idx = np.unique(pairs, axis = 0, return_index = True)[1]
+    return connections[np.sort(first_idx)]
+
+
+# function to get every corridor to carve for a connection mode
+def get_room_connections(midpoints, connect_mode="nearest", n_neighbors=3, extra_edges=0):
+    """
+    This function lists the pairs of rooms that should be joined by a corridor.
+
+    Args:
+        midpoints: list or np matrix with an [x, y] (or [x, y, area]) row for each room
+        connect_mode: string, defaults to "nearest" to connect every room to its n_neighbors nearest rooms.
+            "mst" connects the rooms with a minimum spanning tree plus extra_edges loops, so every room is reachable.
+        n_neighbors: int, defaults to 3, number of nearest neighbors per room ("nearest"), or of candidates for extra edges ("mst")
+        extra_edges: int, defaults to 0, number of extra loop edges on top of the tree (only used by "mst")
+
+    Returns:
+        np matrix of ints with a [room_a, room_b] row for each corridor, in the order to carve them.
+        Each pair of rooms is only listed once.
+    """
+    if connect_mode == "nearest":
+        nearest_rooms = spatial_index.find_nearest_rooms(midpoints, n_neighbors)
+        room_a = np.repeat(np.arange(len(nearest_rooms)), nearest_rooms.shape[1])
+        return dedupe_connections(np.stack([room_a, nearest_rooms.ravel()], axis = 1))
+
+    if connect_mode == "mst":
+        tree_edges = find_minimum_spanning_tree(midpoints)
+        return np.concatenate([tree_edges, find_extra_edges(midpoints, tree_edges, n_neighbors, extra_edges)])
+
+    raise Exception(f"Unable to connect rooms: unknown connect_mode '{connect_mode}', use 'nearest' or 'mst'.")
@@ -0,0 +1,160 @@
+"""
+This file contains a uniform grid hash over room midpoints, used to find each room's
+nearest neighbors without measuring the distance to every other room.
+
+The map is split into square buckets, and each midpoint is stored in the bucket it falls in.
+To find a room's k nearest neighbors, we look through rings of buckets around the room's
+own bucket, moving outward one ring at a time. Any room outside the first r rings is more
+than r * bucket_size away, so once the k-th closest room found so far is at most that far,
+no unseen room can be closer and we can stop. With a couple of rooms per bucket, each search
+only looks at a handful of buckets.
+"""
+
+
+import math # for ceil() and sqrt() when sizing the buckets.
+import numpy as np # for storing the buckets and measuring distances.
+
+
+# function to get the [x, y] of each room as an array
+def get_points(midpoints):
+    """
+    This function turns a list of room midpoints into an array of their [x, y] coordinates.
+
+    Args:
+        midpoints: list or np matrix with an [x, y] (or [x, y, area]) row for each room
+
+    Returns:
+        np matrix of int64 with shape (num_rooms, 2)
+    """
+    if len(midpoints) == 0:
+        return np.zeros(shape = (0, 2), dtype = np.int64)
+    return np.asarray(midpoints, dtype = np.int64).reshape(len(midpoints), -1)[:, :2]
+
+
+# function to build the grid hash over a set of points
+def build_grid_index(points, rooms_per_bucket=2):
+    """
+    This function sorts points into square buckets, sized so that each bucket
+    holds about rooms_per_bucket points on average.
+
+    Args:
+        points: np matrix of ints with an [x, y] row for each point
+        rooms_per_bucket: int, defaults to 2, the average number of points per bucket to aim for
+
+    Returns:
+        dict with:
+            "points": np matrix of the points,
+            "bucket_size": int, number of cells along each side of a bucket,
+            "origin": np array, the smallest [x, y] over all points,
+            "num_buckets": tuple, number of buckets along x and y,
+            "order": np array, point indices sorted by bucket (and by index within a bucket),
+            "starts": np array, where each bucket's points start in order (with one extra entry at the end)
+    """
+    points = np.asarray(points, dtype = np.int64).reshape(-1, 2)
+    origin = points.min(axis = 0) if points.size > 0 else np.zeros(2, dtype = np.int64)
+    extent = (points.max(axis = 0) - origin + 1) if points.size > 0 else np.ones(2, dtype = np.int64)
+
+    # choose the bucket size so the whole area holds about rooms_per_bucket points per bucket
+    bucket_size = max(1, math.ceil(math.sqrt(int(extent[0]) * int(extent[1]) * rooms_per_bucket / max(len(points), 1))))
+    num_buckets = (int(extent[0] - 1) // bucket_size + 1, int(extent[1] - 1) // bucket_size + 1)
+
+    bucket_xy = (points - origin) // bucket_size
+    bucket_ids = bucket_xy[:, 0] * num_buckets[1] + bucket_xy[:, 1]
+    order = np.argsort(bucket_ids, kind = "stable")
+    starts = np.searchsorted(bucket_ids[order], np.arange(num_buckets[0] * num_buckets[1] + 1))
+
+    return {
+        "points": points,
+        "bucket_size": bucket_size,
+        "origin": origin,
+        "num_buckets": num_buckets,
+        "order": order,
+        "starts": starts,
+    }
+
+
+# function to get the points in one ring of buckets around a bucket
+def get_ring_points(grid_index, bucket_x, bucket_y, ring):
+    """
+    This function finds every point stored in the buckets that are exactly ring buckets away
+    (in the Chebyshev sense) from bucket (bucket_x, bucket_y). Ring 0 is just the bucket itself.
+
+    Args:
+        grid_index: dict from build_grid_index()
+        bucket_x: int, x of the center bucket
+        bucket_y: int, y of the center bucket
+        ring: int, how many buckets away from the center
+
+    Returns:
+        np array of point indices
+    """
+    num_x, num_y = grid_index["num_buckets"]
+    order = grid_index["order"]
+    starts = grid_index["starts"]
+    found = []
+
+    for x in range(max(bucket_x - ring, 0), min(bucket_x + ring, num_x - 1) + 1):
+
+        # on the top and bottom rows of the ring we need every bucket, otherwise just the two sides
+        if abs(x - bucket_x) == ring:
+            ys = range(max(bucket_y - ring, 0), min(bucket_y + ring, num_y - 1) + 1)
+        else:
+            ys = [y for y in (bucket_y - ring, bucket_y + ring) if 0 <= y < num_y]
+
+        for y in ys:
+            bucket = x * num_y + y
+            if starts[bucket + 1] > starts[bucket]:
+                found.append(order[starts[bucket]:starts[bucket + 1]])
+
+    if len(found) == 0:
+        return np.empty(0, dtype = np.int64)
+    return np.concatenate(found)
+
+
+# function to find the k nearest rooms to every room
+def find_nearest_rooms(midpoints, k):
+    """
+    This function finds each room's k nearest other rooms by manhattan distance between midpoints.
+    It gives the same neighbors, in the same order, as sorting get_manhattan_distance() for each room:
+    closest first, with ties going to the room that comes first in midpoints.
+
+    Args:
+        midpoints: list or np matrix with an [x, y] (or [x, y, area]) row for each room
+        k: int, how many neighbors to find for each room (capped at the number of other rooms)
+
+    Returns:
+        np matrix of ints with shape (num_rooms, k), the indices of each room's nearest rooms, closest first
+    """
+    points = get_points(midpoints)
+    num_rooms = len(points)
+    k = max(0, min(k, num_rooms - 1))
+    neighbors = np.zeros(shape = (num_rooms, k), dtype = np.int64)
+    if k == 0:
+        return neighbors
+
+    grid_index = build_grid_index(points)
+    bucket_size = grid_index["bucket_size"]
+    bucket_xy = (points - grid_index["origin"]) // bucket_size
+    max_ring = max(grid_index["num_buckets"])
+
+    for i in range(num_rooms):
+        bucket_x, bucket_y = int(bucket_xy[i, 0]), int(bucket_xy[i, 1])
+        candidates = np.empty(0, dtype = np.int64)
+        ring = 0
+
+        while True:
+            candidates = np.concatenate([candidates, get_ring_points(grid_index, bucket_x, bucket_y, ring)])
+            others = candidates[candidates != i]
+
+            # any room outside the rings searched so far is more than ring * bucket_size away
+            if others.size >= k:
+                distances = np.abs(points[others] - points[i]).sum(axis = 1)
+                if np.partition(distances, k - 1)[k - 1] <= ring * bucket_size or ring >= max_ring:
+                    break
+            ring += 1
+
+        # closest first, ties broken by room index
+        nearest = np.lexsort((others, distances))[:k]
+        neighbors[i] = others[nearest]
+
+    return neighbors
@@ -8,6 +8,8 @@ import sys
 import argparse # for program params
 import pygame # for game rendering
 from helpers import map_helpers as maps # custom helper functions for generating game maps w/ CAs
+from helpers import param_cache # table of which map params have worked before
+from helpers import map_quality # bounds for rejecting candidate maps right after smoothing
 
 # constant for base block width
 BLOCK_WIDTH = 32
@@ -55,25 +57,30 @@ def main():
     parser.add_argument("--seed", type = int, help = "Seed for random number generation")
     parser.add_argument("--prob_item", type = float, help = "probability of spawning an item")
     parser.add_argument("--prob_enemy", type = float, help = "probability of spawning an enemy")
+    parser.add_argument("--extra_edges", type = int, default = 10, help = "number of extra loops to add between rooms")
+    parser.add_argument("--param_table", type = str, default = None, help = "JSON file of past map params, used to pick params likely to work")
     args = parser.parse_args()
 
-    # use helper function to randomly generate a map using CAs and other algos, store the map and spawn/exit positions
-    starting_map_info = maps.create_complete_map(args.height, args.width, args.density, args.seed, args.iterations, args.prob_item, args.prob_enemy)
+    # use helper function to randomly generate a map using CAs and other algos, store the map and spawn/exit positions.
+    # rooms are connected with a spanning tree, so the map always has a path from spawn to exit. If the map is too sparse,
+    # the player spawn and level exit can end up in the same spot, so a few denser candidate maps are made in parallel
+    # and the first one (in order) with separate spawn / exit positions is used.
+    # if there's a table of past maps, start from the params near the requested ones that have worked best.
+    # candidates with fewer than 2 rooms big enough for spawn / exit, or under 2% floor, are thrown out right after smoothing.
+    density, iterations = args.density, args.iterations
+    param_table = None
+    if args.param_table is not None:
+        param_table = param_cache.load_param_table(args.param_table)
+        density, iterations = param_cache.suggest_parameters(param_table, args.height, args.width, density, iterations)
+
+    starting_map_info = maps.create_complete_map_speculative(args.height, args.width, density, args.seed, iterations, args.prob_item, args.prob_enemy, "mst", args.extra_edges, density_step = 1, param_table = param_table, quality_bounds = map_quality.DEFAULT_QUALITY_BOUNDS)
+
+    if param_table is not None:
+        param_cache.save_param_table(param_table, args.param_table)
     game_map = starting_map_info[0]
     player_pos = starting_map_info[1]
     level_exit_pos = starting_map_info[2]
 
-    # if map is too sparse and the player spawn / level exit are the same position, generate a new map with higher density and try again. 
-    i = 1
-
-    while player_pos == level_exit_pos:
-        print("Changing map for the i-th time:", i)
-        i += 1
-        starting_map_info = maps.create_complete_map(args.height, args.width, args.density + 1, args.seed, args.iterations - 1, args.prob_item, args.prob_enemy)
-        game_map = starting_map_info[0]
-        player_pos = starting_map_info[1]
-        level_exit_pos = starting_map_info[2]
-
     # setup a clock to limit FPS, and then initialize various pygame attributes like screen, captions, etc.
     clock = pygame.time.Clock()
     pygame.init()